@@ -0,0 +1,51 @@
+# Copyright 2020 enviPath UG & Co. KG
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+"""
+Measures the time needed to turn listings into objects, as done by get_objects() for every collection.
+Listings are generated in memory, no instance is needed.
+
+    python benchmarks/bench_construction.py [number of objects]
+"""
+import sys
+import timeit
+
+from enviPath_python.enums import Endpoint
+from enviPath_python.enviPath import enviPathRequester
+
+PACKAGE_ID = 'http://localhost:8080/package/p'
+RULE_TYPES = [Endpoint.SIMPLERULE, Endpoint.SEQUENTIALCOMPOSITERULE, Endpoint.PARALLELCOMPOSITERULE]
+
+
+def listing(endpoint: Endpoint, n: int) -> list:
+    items = []
+    for i in range(n):
+        item = {'id': '{}/{}/{}'.format(PACKAGE_ID, endpoint.value, i), 'name': '{} {}'.format(endpoint.value, i),
+                'reviewStatus': 'reviewed'}
+        if endpoint == Endpoint.RULE:
+            item['identifier'] = RULE_TYPES[i % 3].value
+        items.append(item)
+    return items
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    requester = enviPathRequester()
+    for endpoint in (Endpoint.COMPOUND, Endpoint.RULE):
+        items = listing(endpoint, n)
+        best = min(timeit.repeat(lambda: requester._create_objects(endpoint, items), number=1, repeat=5))
+        print('{:<10} {} objects: {:.1f} ms, {:.0f} ns per object'.format(endpoint.value, n, best * 1e3,
+                                                                            best / n * 1e9))
@@ -0,0 +1,77 @@
+# Copyright 2020 enviPath UG & Co. KG
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+"""
+Compares the JSON decoders available to enviPathRequester on a package export.
+Pass the path of a recorded export, e.g. of EAWAG-BBD written by Package.export_to_file(). Without a path an export
+of similar shape and size is generated in memory, no instance is needed.
+
+    python benchmarks/bench_decoders.py [path of export]
+"""
+import json
+import sys
+import timeit
+
+from enviPath_python.decoding import DECODERS
+
+PACKAGE_ID = 'http://localhost:8080/package/p'
+
+
+def generate_export(n_compounds=1400, n_reactions=1500, n_rules=250, n_pathways=220) -> bytes:
+    def ref(kind, i):
+        return {'id': '{}/{}/{}'.format(PACKAGE_ID, kind, i), 'name': '{} {}'.format(kind, i)}
+
+    compounds = [dict(ref('compound', i), description='Compound {} of a generated export'.format(i),
+                      reviewStatus='reviewed',
+                      structures=[dict(ref('compound/{}/structure'.format(i), 0), smiles='C' * (i % 20 + 1) + 'O',
+                                       InChI='InChI=1S/C{}H{}O'.format(i % 20 + 1, 2 * (i % 20) + 4),
+                                       charge=0.0, mass=12.011 * (i % 20 + 1) + 18.015, isDefaultStructure=True)])
+                 for i in range(n_compounds)]
+    reactions = [dict(ref('reaction', i), smirks='C{}O>>C{}=O'.format('C' * (i % 5), 'C' * (i % 5)),
+                      multistep='false', ecNumbers=[{'ecNumber': '1.1.1.{}'.format(i % 300), 'ecName': 'ec'}],
+                      rules=[ref('simple-rule', i % n_rules)])
+                 for i in range(n_reactions)]
+    rules = [dict(ref('simple-rule', i), identifier='simple-rule', smirks='[C:1][OH:2]>>[C:1]=[O:2]',
+                  reactantFilterSmarts='', productFilterSmarts='', description='bt{:04d}'.format(i))
+             for i in range(n_rules)]
+    pathways = []
+    for i in range(n_pathways):
+        nodes = [dict(ref('pathway/{}/node'.format(i), j), depth=j, smiles='C' * (j + 1),
+                      defaultStructure=ref('compound/{}/structure'.format((i + j) % n_compounds), 0))
+                 for j in range(12)]
+        links = [dict(ref('pathway/{}/edge'.format(i), j), startNodes=[nodes[j]['id']], endNodes=[nodes[j + 1]['id']],
+                      reactionURI=ref('reaction', (i + j) % n_reactions)['id'], reactionName='r')
+                 for j in range(11)]
+        pathways.append(dict(ref('pathway', i), nodes=nodes, links=links))
+    export = {'id': PACKAGE_ID, 'name': 'Generated export', 'compounds': compounds, 'reactions': reactions,
+              'rules': rules, 'pathways': pathways}
+    return json.dumps(export, indent=1).encode()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'rb') as f:
+            body = f.read()
+    else:
+        body = generate_export()
+    print('export of {:.1f} MB'.format(len(body) / 1e6))
+
+    candidates = [('json via text (response.json())', lambda b: json.loads(b.decode('utf-8')))]
+    candidates.extend(('{} from bytes'.format(name), decoder) for name, decoder in sorted(DECODERS.items()))
+    for name, decoder in candidates:
+        best = min(timeit.repeat(lambda: decoder(body), number=1, repeat=5))
+        print('{:<32} {:8.1f} ms {:8.1f} MB/s'.format(name, best * 1e3, len(body) / best / 1e6))
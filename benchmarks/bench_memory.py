@@ -0,0 +1,91 @@
+# Copyright 2020 enviPath UG & Co. KG
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+"""
+Measures the memory held per enviPathObject for a crawl of a large package, i.e. many compounds that were
+listed (id and name only) and then loaded completely. The JSON is served from memory, no instance is needed.
+
+    python benchmarks/bench_memory.py [number of objects]
+"""
+import gc
+import json
+import sys
+import tracemalloc
+
+from enviPath_python.enviPath import enviPathRequester
+from enviPath_python.objects import Compound
+
+PACKAGE_ID = 'http://localhost:8080/package/p'
+
+
+def compound_json(i: int) -> bytes:
+    cid = '{}/compound/{}'.format(PACKAGE_ID, i)
+    return json.dumps({
+        'id': cid,
+        'name': 'compound {}'.format(i),
+        'description': 'no description',
+        'reviewStatus': 'reviewed',
+        'aliases': ['alias {}'.format(i)],
+        'scenarios': [],
+        'externalReferences': [],
+        'structures': [{'id': '{}/structure/{}'.format(cid, j), 'name': 'structure {}'.format(j),
+                        'smiles': 'CC(=O)O' * (j + 1)} for j in range(2)],
+        'pathways': [{'id': '{}/pathway/{}'.format(PACKAGE_ID, j), 'name': 'pathway {}'.format(j)} for j in range(3)],
+        'reactions': [{'id': '{}/reaction/{}'.format(PACKAGE_ID, j), 'name': 'reaction {}'.format(j)}
+                      for j in range(3)],
+    }).encode()
+
+
+def measure(n: int, load: bool) -> float:
+    payloads = {'{}/compound/{}'.format(PACKAGE_ID, i): compound_json(i) for i in range(n)}
+    requester = enviPathRequester(identity_map_size=n)
+    requester.get_json = lambda envipath_id: json.loads(payloads[envipath_id])
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [Compound(requester, id=cid, name='c') for cid in payloads]
+    if load:
+        for obj in objects:
+            obj.get_description()
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / n
+
+
+def json_only(n: int) -> float:
+    payloads = [compound_json(i) for i in range(n)]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    decoded = [json.loads(p) for p in payloads]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del decoded
+    return used / n
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    data = json_only(n)
+    listed = measure(n, load=False)
+    loaded = measure(n, load=True)
+    print('objects:                        {}'.format(n))
+    print('bytes per listed object:        {:.0f}'.format(listed))
+    print('bytes per loaded object:        {:.0f}'.format(loaded))
+    print('decoded JSON per object:        {:.0f}'.format(data))
+    print('overhead per loaded object:     {:.0f}'.format(loaded - data))
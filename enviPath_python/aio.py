@@ -0,0 +1,447 @@
+# Copyright 2020 enviPath UG & Co. KG
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import asyncio
+import logging
+from typing import Dict, List
+
+from enviPath_python.decoding import get_decoder
+from enviPath_python.enviPath import enviPathRequester
+from enviPath_python.objects import *
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - optional dependency
+    aiohttp = None
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncObjectError(RuntimeError):
+    """
+    Raised if an object bound to an AsyncEnviPathRequester would perform a request itself, i.e. lazily load a field
+    or modify data. Such objects are read-only and have to be loaded upfront.
+    """
+
+
+_READ_ONLY = "Objects bound to an AsyncEnviPathRequester can not perform requests themselves. They are read-only " \
+             "and have to be loaded upfront via `await requester.aload(obj)` or `await requester.ahydrate(objs)`."
+
+
+class AsyncEnviPath(object):
+    """
+    Asyncio counterpart of enviPath. All methods performing requests are coroutines.
+    Objects returned are the regular enviPathObjects bound to an AsyncEnviPathRequester. As their getters are
+    synchronous, objects have to be hydrated via `await requester.aload(obj)` or `await requester.ahydrate(objs)`
+    before fields other than 'id' and 'name' can be accessed.
+    """
+
+    def __init__(self, base_url, proxy=None, concurrency=10, decoder=None):
+        """
+        Constructor with instance specification.
+        :param base_url: The url of the enviPath instance.
+        :param proxy: Optional proxy url used for all requests.
+        :param concurrency: Maximum number of requests in flight at the same time.
+        :param decoder: Function or name of the library decoding response bodies, see decoding.get_decoder().
+        """
+        self.BASE_URL = base_url if base_url.endswith('/') else base_url + '/'
+        self.requester = AsyncEnviPathRequester(proxy=proxy, concurrency=concurrency, decoder=decoder)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self) -> None:
+        """
+        Closes the underlying http session.
+        :return: None
+        """
+        await self.requester.close()
+
+    def get_base_url(self):
+        return self.BASE_URL
+
+    async def login(self, username, password) -> None:
+        """
+        Performs login.
+        :param username: The username.
+        :param password: The corresponding password.
+        :return: None
+        """
+        await self.requester.login(self.BASE_URL, username, password)
+
+    async def logout(self) -> None:
+        """
+        Performs logout.
+        :return: None
+        """
+        await self.requester.logout(self.BASE_URL)
+
+    async def who_am_i(self) -> User:
+        """
+        Method to get the currently logged in user.
+        :return: User object.
+        """
+        params = {
+            'whoami': 'true',
+        }
+        url = self.BASE_URL + Endpoint.USER.value
+        user_data = (await self.requester.aget_json(url, params=params))[Endpoint.USER.value][0]
+        return User(self.requester, **user_data)
+
+    async def get_package(self, package_id: str) -> Package:
+        return Package(self.requester, **(await self.requester.aget_json(package_id)))
+
+    async def get_packages(self) -> List['Package']:
+        """
+        Gets all packages the logged in user has at least read permissions on.
+        :return: List of Package objects.
+        """
+        return await self.requester.aget_objects(self.BASE_URL, Endpoint.PACKAGE)
+
+    async def get_compound(self, compound_id) -> Compound:
+        return Compound(self.requester, **(await self.requester.aget_json(compound_id)))
+
+    async def get_compounds(self, package: Package = None) -> List['Compound']:
+        """
+        Gets all compounds the logged in user has at least read permissions on.
+        :param package: If given only the compounds of this package are returned.
+        :return: List of Compound objects.
+        """
+        return await self.requester.aget_objects(self._scope(package), Endpoint.COMPOUND)
+
+    async def get_reaction(self, reaction_id) -> Reaction:
+        return Reaction(self.requester, **(await self.requester.aget_json(reaction_id)))
+
+    async def get_reactions(self, package: Package = None) -> List['Reaction']:
+        """
+        Gets all reactions the logged in user has at least read permissions on.
+        :param package: If given only the reactions of this package are returned.
+        :return: List of Reaction objects.
+        """
+        return await self.requester.aget_objects(self._scope(package), Endpoint.REACTION)
+
+    async def get_rule(self, rule_id) -> Rule:
+        rule_data = await self.requester.aget_json(rule_id)
+        return Rule.get_rule_type(rule_data)(self.requester, **rule_data)
+
+    async def get_rules(self, package: Package = None) -> List['Rule']:
+        """
+        Gets all rules the logged in user has at least read permissions on.
+        :param package: If given only the rules of this package are returned.
+        :return: List of Rule objects.
+        """
+        return await self.requester.aget_objects(self._scope(package), Endpoint.RULE)
+
+    async def get_pathway(self, pathway_id) -> Pathway:
+        return Pathway(self.requester, **(await self.requester.aget_json(pathway_id)))
+
+    async def get_pathways(self, package: Package = None) -> List['Pathway']:
+        """
+        Gets all pathways the logged in user has at least read permissions on.
+        :param package: If given only the pathways of this package are returned.
+        :return: List of Pathway objects.
+        """
+        return await self.requester.aget_objects(self._scope(package), Endpoint.PATHWAY)
+
+    async def get_scenarios(self, package: Package = None) -> List['Scenario']:
+        """
+        Gets all scenarios the logged in user has at least read permissions on.
+        :param package: If given only the scenarios of this package are returned.
+        :return: List of Scenario objects.
+        """
+        return await self.requester.aget_objects(self._scope(package), Endpoint.SCENARIO)
+
+    async def get_users(self) -> List['User']:
+        """
+        Gets all users the logged in user has at least read permissions on.
+        :return: List of User objects.
+        """
+        return await self.requester.aget_objects(self.BASE_URL, Endpoint.USER)
+
+    async def get_groups(self) -> List['Group']:
+        """
+        Gets all groups the logged in user has at least read permissions on.
+        :return: List of Group objects.
+        """
+        return await self.requester.aget_objects(self.BASE_URL, Endpoint.GROUP)
+
+    def _scope(self, package: Package = None) -> str:
+        return package.get_id() + '/' if package is not None else self.BASE_URL
+
+
+class AsyncEnviPathRequester(object):
+    """
+    Class performing all requests to the enviPath instance on top of aiohttp.
+    The number of concurrent requests is bounded by a semaphore.
+    The coroutines are prefixed with 'a', e.g. aget_json(). The synchronous methods of enviPathRequester that
+    enviPathObjects call, e.g. get_json(), raise AsyncObjectError instead of returning a coroutine never awaited.
+    """
+    header = enviPathRequester.header
+
+    ENDPOINT_OBJECT_MAPPING = enviPathRequester.ENDPOINT_OBJECT_MAPPING
+    _create_objects = enviPathRequester._create_objects
+
+    def __init__(self, proxy=None, concurrency=10, decoder=None):
+        """
+        Setup of the request limits. The aiohttp session itself is created lazily as it has to be created
+        within a running event loop.
+        :param proxy: Optional proxy url used for all requests.
+        :param concurrency: Maximum number of requests in flight at the same time.
+        :param decoder: Function or name of the library decoding response bodies, see decoding.get_decoder().
+        """
+        if aiohttp is None:
+            raise ImportError("AsyncEnviPathRequester requires aiohttp. Install it via 'pip install aiohttp'.")
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1!")
+        self.proxy = proxy
+        self.concurrency = concurrency
+        self.decoder = get_decoder(decoder)
+        self.session = None
+        self._semaphore = None
+
+    def _get_session(self):
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.concurrency)
+            # unsafe=True allows cookies of instances addressed by ip, e.g. http://localhost:8080/
+            self.session = aiohttp.ClientSession(connector=connector, headers=self.header,
+                                                 cookie_jar=aiohttp.CookieJar(unsafe=True))
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self.session
+
+    async def close(self) -> None:
+        """
+        Closes the underlying aiohttp session.
+        :return: None
+        """
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def aget_request(self, url, params=None, payload=None, **kwargs):
+        """
+        Convenient method to perform GET request to given url with optional query parameters and data.
+        :param url: The url to retrieve data from.
+        :param params: Dictionary containing query parameters as key, value.
+        :param payload: Data send within the body.
+        :return: response object with the body already read.
+        """
+        return await self._request('GET', url, params, payload, **kwargs)
+
+    async def apost_request(self, url, params=None, payload=None, **kwargs):
+        """
+        Convenient method to perform POST request to given url with optional query parameters and data.
+        :param url: The url for object creation, object manipulation.
+        :param params: Dictionary containing query parameters as key, value.
+        :param payload: Data send within the body.
+        :return: response object with the body already read.
+        """
+        return await self._request('POST', url, params, payload, **kwargs)
+
+    async def adelete_request(self, url, params=None, payload=None, **kwargs):
+        """
+        Convenient method to perform DELETE request to given url with optional query parameters and data.
+        :param url: The url for object creation, object manipulation.
+        :param params: Dictionary containing query parameters as key, value.
+        :param payload: Data send within the body.
+        :return: response object with the body already read.
+        """
+        return await self._request('DELETE', url, params, payload, **kwargs)
+
+    async def _request(self, method, url, params=None, payload=None, **kwargs):
+        """
+        Method performing the actual request. Waits for a free slot if `concurrency` requests are already running.
+        :param method: HTTP method.
+        :param url: url for request.
+        :param params: parameters to send.
+        :param payload: data to send.
+        :return: aiohttp response object with the body already read.
+        """
+        response, _ = await self._fetch(method, url, params, payload, **kwargs)
+        return response
+
+    async def _fetch(self, method, url, params=None, payload=None, **kwargs):
+        """
+        Same as _request(), but additionally returns the raw body. Once the response is released aiohttp refuses to
+        hand out the body again, hence it is returned alongside.
+        :return: (aiohttp response object, body as bytes)
+        """
+        session = self._get_session()
+        if payload is not None:
+            payload = self._form_fields(payload)
+        async with self._semaphore:
+            async with session.request(method, url, params=params, data=payload, proxy=self.proxy,
+                                       **kwargs) as response:
+                body = await response.read()
+                response.raise_for_status()
+                return response, body
+
+    @staticmethod
+    def _form_fields(payload: dict) -> list:
+        """
+        Flattens list values into repeated form fields, as requests does for the synchronous requester.
+        """
+        fields = []
+        for k, v in payload.items():
+            if isinstance(v, (list, tuple)):
+                fields.extend((k, str(x)) for x in v)
+            else:
+                fields.append((k, str(v)))
+        return fields
+
+    async def aget_json(self, envipath_id: str, params=None):
+        """
+        Fetches the plain JSON of the given id.
+        :param envipath_id: The id (url) of the object.
+        :param params: Optional query parameters.
+        :return: The decoded JSON.
+        """
+        _, body = await self._fetch('GET', envipath_id, params=params)
+        return self.decoder(body)
+
+    async def login(self, url, username, password):
+        """
+        Performs login,
+        :param url: Can be any valid enviPath url.
+        :param username: The username.
+        :param password: The corresponding password.
+        :return: None
+        """
+        data = {
+            'hiddenMethod': 'login',
+            'loginusername': username,
+            'loginpassword': password,
+        }
+        await self.apost_request(url, payload=data)
+
+    async def logout(self, url):
+        """
+        Performs logout.
+        :param url: Can be any valid enviPath url.
+        :return: None
+        """
+        data = {
+            'hiddenMethod': 'logout',
+        }
+        await self.apost_request(url, payload=data)
+
+    async def aget_objects(self, base_url, endpoint):
+        """
+        Generic get method to retrieve objects.
+        :param base_url: The url the endpoint is appended to, either the instance or a package url.
+        :param endpoint: Enum of Endpoint.
+        :return: List of objects denoted by endpoint.
+        """
+        url = base_url + endpoint.value
+        objs = await self.aget_json(url)
+
+        if endpoint.value not in objs:
+            logger.warning("Response of %s does not contain %s: %s", url, endpoint.value, objs)
+            return []
+
+        return self._create_objects(endpoint, objs[endpoint.value])
+
+    def get_request(self, url, *args, **kwargs):
+        """
+        Called by enviPathObjects, use `await requester.aget_request()` instead.
+        :raises AsyncObjectError: Always.
+        """
+        raise AsyncObjectError(_READ_ONLY)
+
+    def post_request(self, url, *args, **kwargs):
+        """
+        Called by enviPathObjects modifying data.
+        :raises AsyncObjectError: Always, objects are read-only.
+        """
+        raise AsyncObjectError(_READ_ONLY)
+
+    def delete_request(self, url, *args, **kwargs):
+        """
+        Called by enviPathObjects deleting data.
+        :raises AsyncObjectError: Always, objects are read-only.
+        """
+        raise AsyncObjectError(_READ_ONLY)
+
+    def get_json(self, envipath_id: str, *args, **kwargs):
+        """
+        Called by enviPathObject.get_json(), use `await requester.aget_json()` instead.
+        :raises AsyncObjectError: Always.
+        """
+        raise AsyncObjectError(_READ_ONLY)
+
+    def get_objects(self, base_url, endpoint, *args, **kwargs):
+        """
+        Called by Package.get_*(), use `await requester.aget_objects()` instead.
+        :raises AsyncObjectError: Always.
+        """
+        raise AsyncObjectError(_READ_ONLY)
+
+    def hydrate(self, objs, *args, **kwargs):
+        """
+        Called by Package.get_*(hydrate=True) and utilities such as MultiGenUtils, use
+        `await requester.ahydrate(objs)` instead.
+        :raises AsyncObjectError: Always.
+        """
+        raise AsyncObjectError(_READ_ONLY)
+
+    def load_json(self, envipath_id: str):
+        """
+        Called by enviPathObjects accessing a field that is not loaded yet.
+        :raises AsyncObjectError: Always, objects have to be loaded upfront.
+        """
+        raise AsyncObjectError("{} is not loaded. {}".format(envipath_id, _READ_ONLY))
+
+    def iter_objects(self, base_url, endpoint, *args, **kwargs):
+        """
+        Called by Package.iter_*(), use `await requester.aget_objects()` instead.
+        :raises AsyncObjectError: Always.
+        """
+        raise AsyncObjectError(_READ_ONLY)
+
+    def prefetch(self, objs, *paths, **kwargs):
+        """
+        Called by enviPathObject.prefetch(), use `await requester.ahydrate(objs)` instead.
+        :raises AsyncObjectError: Always.
+        """
+        raise AsyncObjectError(_READ_ONLY)
+
+    def invalidate(self, *envipath_ids: str) -> None:
+        """
+        Called by enviPathObjects after modifying data.
+        :raises AsyncObjectError: Always, objects are read-only.
+        """
+        raise AsyncObjectError(_READ_ONLY)
+
+    async def aload(self, obj: enviPathObject) -> enviPathObject:
+        """
+        Async counterpart of enviPathObject._load(). Fetches the full JSON of the object and sets its fields.
+        :param obj: The object to hydrate.
+        :return: The hydrated object.
+        """
+        obj._update(await self.aget_json(obj.get_id()))
+        return obj
+
+    async def ahydrate(self, objs: List[enviPathObject]) -> Dict[str, Exception]:
+        """
+        Concurrently hydrates all given objects, bounded by `concurrency`.
+        Objects that could not be loaded are left untouched.
+        :param objs: The objects to hydrate.
+        :return: Dictionary mapping the id of each object that failed to the raised exception.
+        """
+        results = await asyncio.gather(*[self.aload(obj) for obj in objs], return_exceptions=True)
+        return {obj.get_id(): res for obj, res in zip(objs, results) if isinstance(res, Exception)}
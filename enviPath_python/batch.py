@@ -0,0 +1,398 @@
+# Copyright 2020 enviPath UG & Co. KG
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import time
+from array import array
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from enviPath_python.objects import Package, Pathway, Rule, Setting, enviPathObject
+
+BulkResult = namedtuple('BulkResult', 'ids, errors')
+
+
+class _PredictionJob(object):
+    """
+    State of a single prediction within a PredictionBatch.
+    """
+
+    def __init__(self, index: int, smiles: str, name: str, description: str, root_node_only: bool):
+        self.index = index
+        self.smiles = smiles
+        self.name = name
+        self.description = description
+        self.root_node_only = root_node_only
+        self.pathway = None
+        self.interval = None
+        self.deadline = None
+
+
+class PredictionBatch(object):
+    """
+    Submits pathway predictions for many SMILES and polls them until they are completed.
+    At most `max_in_flight` predictions are submitted but not yet finished at any time. Pending predictions are
+    polled via Pathway.refresh(), the interval between two polls of the same prediction starts at
+    `poll_interval` and grows by `backoff` up to `max_poll_interval`, so long running predictions cause little load.
+    Usage:
+        batch = PredictionBatch(package, setting)
+        for smiles in smiles_list:
+            batch.submit(smiles)
+        for pathway in batch.as_completed():
+            ...
+    """
+
+    def __init__(self, package: Package, setting: Setting = None, max_in_flight: int = 10,
+                 poll_interval: float = 1, max_poll_interval: float = 30, backoff: float = 1.5,
+                 timeout: float = None):
+        """
+        :param package: The package the predicted pathways are stored in.
+        :param setting: The setting used for prediction. None uses the default setting of the user.
+        :param max_in_flight: Maximum number of predictions running at the same time.
+        :param poll_interval: Seconds between submission and the first poll of a prediction.
+        :param max_poll_interval: Upper bound of the seconds between two polls of a prediction.
+        :param backoff: Factor the poll interval of a prediction grows with after each unfinished poll.
+        :param timeout: Maximum number of seconds a single prediction may take, None waits forever.
+        """
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be positive!")
+        self.package = package
+        self.setting = setting
+        self.max_in_flight = max_in_flight
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.backoff = backoff
+        self.timeout = timeout
+        # Pathway per submission index, None until submitted
+        self.pathways: List[Optional[Pathway]] = []
+        # Pathway id -> submission index
+        self.indices: Dict[str, int] = {}
+        # Submission index -> exception for predictions that could not be submitted or timed out
+        self.errors: Dict[int, Exception] = {}
+        self._queue = deque()
+
+    def submit(self, smiles: str, name: str = None, description: str = None, root_node_only: bool = False) -> int:
+        """
+        Adds a prediction to the batch. It is sent to the server by as_completed().
+        :param smiles: The SMILES of the root node.
+        :param name: Optional name of the pathway.
+        :param description: Optional description of the pathway.
+        :param root_node_only: If True only the root node is created.
+        :return: The index of the submission.
+        """
+        index = len(self.pathways)
+        self.pathways.append(None)
+        self._queue.append(_PredictionJob(index, smiles, name, description, root_node_only))
+        return index
+
+    def _submit(self, job: _PredictionJob) -> bool:
+        job.pathway = self.package.predict(job.smiles, job.name, job.description, job.root_node_only, self.setting)
+        job.interval = self.poll_interval
+        job.deadline = time.monotonic() + self.timeout if self.timeout is not None else None
+        return False
+
+    def _poll(self, job: _PredictionJob) -> bool:
+        pathway = job.pathway
+        # Conditional request, cheap as long as the prediction did not progress
+        pathway.refresh()
+        if pathway.is_completed() or pathway.has_failed():
+            return True
+        if job.deadline is not None and time.monotonic() >= job.deadline:
+            raise TimeoutError("Prediction {} did not complete within {}s!".format(pathway.id, self.timeout))
+        job.interval = min(self.max_poll_interval, job.interval * self.backoff)
+        return False
+
+    def as_completed(self) -> Iterator[Pathway]:
+        """
+        Submits all queued predictions, bounded by max_in_flight, and polls them until they are finished.
+        Predictions that could not be submitted or timed out are recorded in `errors` and not yielded.
+        :return: Iterator of the Pathway objects in the order they finish, either completed or failed
+         (see Pathway.has_failed()).
+        """
+        active = {}
+        scheduled = []
+        in_flight = 0
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            while self._queue or active or scheduled:
+                while self._queue and in_flight < self.max_in_flight:
+                    job = self._queue.popleft()
+                    active[executor.submit(self._submit, job)] = job
+                    in_flight += 1
+
+                now = time.monotonic()
+                while scheduled and scheduled[0][0] <= now:
+                    _, _, job = heapq.heappop(scheduled)
+                    active[executor.submit(self._poll, job)] = job
+                delay = max(0.0, scheduled[0][0] - now) if scheduled else None
+
+                if not active:
+                    time.sleep(delay)
+                    continue
+
+                done, _ = wait(active, timeout=delay, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = active.pop(future)
+                    try:
+                        finished = future.result()
+                    except Exception as e:
+                        self.errors[job.index] = e
+                        in_flight -= 1
+                        continue
+                    if job.pathway.id not in self.indices:
+                        self.pathways[job.index] = job.pathway
+                        self.indices[job.pathway.id] = job.index
+                    if finished:
+                        in_flight -= 1
+                        yield job.pathway
+                    else:
+                        heapq.heappush(scheduled, (time.monotonic() + job.interval, job.index, job))
+
+
+class RuleApplicationMatrix(object):
+    """
+    Sparse compound x rule matrix holding the products of applying each rule to each SMILES.
+    Row i corresponds to smiles[i], column j to rules[j]. Only non empty cells are stored, as compressed sparse
+    rows: the columns of row i are columns[indptr[i]:indptr[i + 1]] and products[k] are the products of the cell
+    stored at position k. Identical product tuples are shared between cells.
+    """
+
+    def __init__(self, smiles: List[str], rules: List[Rule], cells: Dict[Tuple[int, int], Tuple[str, ...]],
+                 errors: Dict[Tuple[int, int], Exception] = None):
+        """
+        :param smiles: The SMILES of the rows.
+        :param rules: The rules of the columns.
+        :param cells: Products per (row, column), empty cells may be omitted.
+        :param errors: Exception per (row, column) for applications that failed.
+        """
+        self.smiles = list(smiles)
+        self.rules = list(rules)
+        self.rule_index = {rule.get_id(): j for j, rule in enumerate(self.rules)}
+        self.errors = errors or {}
+        self.indptr = array('i', [0])
+        self.columns = array('i')
+        self.products = []
+        rows = [[] for _ in self.smiles]
+        for (i, j), products in cells.items():
+            if products:
+                rows[i].append((j, products))
+        for row in rows:
+            for j, products in sorted(row):
+                self.columns.append(j)
+                self.products.append(products)
+            self.indptr.append(len(self.columns))
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self.smiles), len(self.rules)
+
+    def get(self, i: int, j: int) -> Tuple[str, ...]:
+        """
+        :param i: Row index, i.e. position of the SMILES.
+        :param j: Column index, i.e. position of the rule.
+        :return: The products of applying rule j to SMILES i, empty if the rule does not apply.
+        """
+        start, end = self.indptr[i], self.indptr[i + 1]
+        for k in range(start, end):
+            if self.columns[k] == j:
+                return self.products[k]
+        return ()
+
+    def row(self, i: int) -> Dict[str, Tuple[str, ...]]:
+        """
+        :param i: Row index, i.e. position of the SMILES.
+        :return: Rule id -> products for all rules applicable to SMILES i.
+        """
+        return {self.rules[self.columns[k]].get_id(): self.products[k]
+                for k in range(self.indptr[i], self.indptr[i + 1])}
+
+    def row_items(self, i: int) -> List[Tuple[int, Tuple[str, ...]]]:
+        """
+        :param i: Row index, i.e. position of the SMILES.
+        :return: (column index, products) for all non empty cells of row i, ordered by column.
+        """
+        return [(self.columns[k], self.products[k]) for k in range(self.indptr[i], self.indptr[i + 1])]
+
+    def column(self, rule_id: str) -> Dict[int, Tuple[str, ...]]:
+        """
+        :param rule_id: Id of the rule.
+        :return: Row index -> products for all SMILES the rule applies to.
+        """
+        j = self.rule_index[rule_id]
+        return {i: products for i, k, products in self._cells() if k == j}
+
+    def _cells(self) -> Iterator[Tuple[int, int, Tuple[str, ...]]]:
+        for i in range(len(self.smiles)):
+            for k in range(self.indptr[i], self.indptr[i + 1]):
+                yield i, self.columns[k], self.products[k]
+
+    def __iter__(self) -> Iterator[Tuple[str, str, Tuple[str, ...]]]:
+        """
+        :return: Iterator of (SMILES, rule id, products) for all non empty cells, row by row.
+        """
+        for i, j, products in self._cells():
+            yield self.smiles[i], self.rules[j].get_id(), products
+
+    def __len__(self):
+        return len(self.products)
+
+
+def canonical_smiles(smiles: str) -> str:
+    """
+    Key used to detect identical inputs. Without a cheminformatics toolkit only surrounding whitespace is removed,
+    identical molecules written differently are therefore applied twice.
+    """
+    return smiles.strip()
+
+
+# Number of rule applications submitted per worker at once by apply_rules()
+APPLY_WINDOW = 4
+
+
+def apply_rules(rules: Sequence[Rule], smiles_list: Sequence[str], max_workers: int = None) -> RuleApplicationMatrix:
+    """
+    Applies every rule to every SMILES concurrently. Each distinct (rule, SMILES) pair is sent only once.
+    :param rules: The rules to apply.
+    :param smiles_list: The SMILES to apply the rules to.
+    :param max_workers: Number of concurrent requests. Defaults to the pool size of the requester.
+    :return: RuleApplicationMatrix with one row per SMILES and one column per rule. Failed applications are
+     recorded in its `errors`.
+    """
+    rules = list(rules)
+    smiles_list = list(smiles_list)
+    rows = {}
+    for i, smiles in enumerate(smiles_list):
+        rows.setdefault(canonical_smiles(smiles), []).append(i)
+    columns = {}
+    for j, rule in enumerate(rules):
+        columns.setdefault(rule.get_id(), []).append(j)
+
+    cells, errors = {}, {}
+    if rules and smiles_list:
+        requester = rules[0].requester
+        max_workers = max_workers or getattr(requester, 'pool_maxsize', 10)
+        pairs = ((rule_id, smiles) for rule_id in columns for smiles in rows)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Only a bounded number of applications is submitted at once, independent of the size of the matrix
+            futures = {}
+            while True:
+                for rule_id, smiles in itertools.islice(pairs, max_workers * APPLY_WINDOW - len(futures)):
+                    futures[executor.submit(rules[columns[rule_id][0]].apply_to_smiles, smiles)] = (smiles, rule_id)
+                if not futures:
+                    break
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    smiles, rule_id = futures.pop(future)
+                    try:
+                        products, error = tuple(future.result()), None
+                    except Exception as e:
+                        products, error = (), e
+                    if error is None and not products:
+                        continue
+                    for i in rows[smiles]:
+                        for j in columns[rule_id]:
+                            if error is None:
+                                cells[(i, j)] = products
+                            else:
+                                errors[(i, j)] = error
+    return RuleApplicationMatrix(smiles_list, rules, cells, errors)
+
+
+def _fingerprint(record) -> str:
+    """
+    :return: Hash identifying the content of a record, independent of the order of its keys.
+    """
+    return hashlib.sha1(json.dumps(record, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _read_checkpoint(path: str, kind: Optional[str]) -> Dict[int, Tuple[str, str]]:
+    """
+    Reads the fingerprints and ids of the records of kind created in a previous run. Entries of other kinds and a
+    truncated last line, e.g. after a crash, are ignored.
+    """
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get('kind') == kind and 'fingerprint' in entry:
+                done[entry['index']] = (entry['fingerprint'], entry['id'])
+    return done
+
+
+def bulk_create(create: Callable[[dict], enviPathObject], records: Iterable[dict], max_workers: int = 10,
+                chunk_size: int = 100, checkpoint: str = None, kind: str = None) -> BulkResult:
+    """
+    Creates objects for many records concurrently.
+    Records are consumed chunk by chunk, so records may be a generator over a large file. If a checkpoint file is
+    given, the index, a fingerprint of the content and the id of every created record are appended to it. When the
+    import is started again, e.g. after a crash, records listed in it with the same kind and fingerprint are
+    skipped, all others are created.
+    :param create: Function creating the object for a single record, e.g. lambda r: Compound.create(package, **r).
+    :param records: The records in input order.
+    :param max_workers: Number of concurrent create requests.
+    :param chunk_size: Number of records submitted at once, the checkpoint is flushed after each chunk.
+    :param checkpoint: Optional path of the checkpoint file.
+    :param kind: Identifies the created objects within the checkpoint, e.g. the url of the collection.
+    :return: BulkResult with the id of each record in input order (None if it failed) and the exception per
+     index of the failed records.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive!")
+    done = _read_checkpoint(checkpoint, kind) if checkpoint is not None else {}
+    ids, errors = [], {}
+    log = open(checkpoint, 'a+') if checkpoint is not None else None
+    try:
+        if log is not None and log.tell() > 0:
+            # Terminate a line truncated by a crash, otherwise the next entry would be lost as well
+            log.seek(log.tell() - 1)
+            if log.read(1) != '\n':
+                log.write('\n')
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            records = enumerate(records)
+            while True:
+                chunk = list(itertools.islice(records, chunk_size))
+                if not chunk:
+                    break
+                fingerprints = {i: _fingerprint(record) for i, record in chunk}
+                for i, _ in chunk:
+                    fingerprint, created_id = done.get(i, (None, None))
+                    ids.append(created_id if fingerprint == fingerprints[i] else None)
+                futures = {executor.submit(create, record): i for i, record in chunk if ids[i] is None}
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        ids[i] = future.result().get_id()
+                    except Exception as e:
+                        errors[i] = e
+                        continue
+                    if log is not None:
+                        log.write(json.dumps({'index': i, 'kind': kind, 'fingerprint': fingerprints[i],
+                                              'id': ids[i]}) + '\n')
+                if log is not None:
+                    log.flush()
+    finally:
+        if log is not None:
+            log.close()
+    return BulkResult(ids, errors)
@@ -0,0 +1,359 @@
+# Copyright 2020 enviPath UG & Co. KG
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import json
+import sqlite3
+import time
+from collections import OrderedDict, namedtuple
+from threading import Lock
+from typing import Optional, Tuple
+from urllib.parse import urlencode
+
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+
+class LRUCache(object):
+    """
+    Thread safe mapping bounded in size. If full, the least recently used entry is evicted.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        """
+        :param maxsize: Maximum number of entries. A maxsize of 0 disables the cache.
+        """
+        if maxsize < 0:
+            raise ValueError("maxsize must not be negative!")
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        """
+        Gets the value stored for key and marks it as most recently used.
+        :param key: The key of interest.
+        :param default: Returned if the key is not present.
+        :return: The stored value or default.
+        """
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def put(self, key, value) -> None:
+        """
+        Stores value for key and evicts the least recently used entries if the cache is full.
+        :param key: The key.
+        :param value: The value.
+        :return: None
+        """
+        if self.maxsize == 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key) -> None:
+        """
+        Removes the entry for key if present.
+        :param key: The key to remove.
+        :return: None
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class ResponseCache(object):
+    """
+    Persistent cache for responses of GET requests backed by a SQLite database, keyed by url and query parameters.
+    Responses may depend on the logged in user, hence entries are additionally keyed by a scope, e.g. the username.
+    Responses carrying an ETag or Last-Modified header are revalidated with a conditional request, responses
+    without such validators are served from the cache until they are older than `ttl` seconds.
+    """
+    TRANSFER_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding')
+
+    def __init__(self, path: str, ttl: float = 3600):
+        """
+        :param path: File of the SQLite database. Created if not existing.
+        :param ttl: Seconds a response without ETag/Last-Modified is considered fresh.
+        """
+        self.path = path
+        self.ttl = ttl
+        self._lock = Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute('CREATE TABLE IF NOT EXISTS responses ('
+                               'key TEXT PRIMARY KEY, url TEXT NOT NULL, headers TEXT NOT NULL, body BLOB NOT NULL, '
+                               'etag TEXT, last_modified TEXT, stored_at REAL NOT NULL)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS responses_url ON responses (url)')
+
+    @staticmethod
+    def key(url: str, params: dict = None, scope: str = '') -> str:
+        key = url
+        if params:
+            key = '{}?{}'.format(url, urlencode(sorted(params.items()), doseq=True))
+        if scope:
+            key = '{} {}'.format(scope, key)
+        return key
+
+    def get(self, url: str, params: dict = None, scope: str = '') -> Optional['CachedResponse']:
+        """
+        Looks up the stored response for url and params.
+        :param url: The requested url.
+        :param params: The query parameters of the request.
+        :param scope: The scope the response was stored for, '' for anonymous requests.
+        :return: CachedResponse or None if nothing is stored.
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT url, headers, body, etag, last_modified, stored_at FROM responses '
+                                     'WHERE key = ?', (self.key(url, params, scope),)).fetchone()
+        if row is None:
+            return None
+        return CachedResponse(row[0], json.loads(row[1]), row[2], row[3], row[4], row[5])
+
+    def put(self, url: str, params: dict, response: Response, scope: str = '') -> None:
+        """
+        Stores the body and headers of a successful response.
+        :param url: The requested url.
+        :param params: The query parameters of the request.
+        :param response: The response to store.
+        :param scope: The scope the response belongs to, '' for anonymous requests.
+        :return: None
+        """
+        # The body is stored decoded, hence headers describing the transfer do not apply anymore
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in self.TRANSFER_HEADERS}
+        with self._lock, self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)',
+                               (self.key(url, params, scope), url, json.dumps(headers), response.content,
+                                response.headers.get('ETag'), response.headers.get('Last-Modified'), time.time()))
+
+    def touch(self, url: str, params: dict = None, scope: str = '') -> None:
+        """
+        Marks the stored response as just validated.
+        """
+        with self._lock, self._conn:
+            self._conn.execute('UPDATE responses SET stored_at = ? WHERE key = ?',
+                               (time.time(), self.key(url, params, scope)))
+
+    def is_fresh(self, entry: 'CachedResponse') -> bool:
+        """
+        Checks whether entry can be served without contacting the server.
+        :param entry: The stored response.
+        :return: True if entry has no validators and is younger than ttl.
+        """
+        return not entry.etag and not entry.last_modified and time.time() - entry.stored_at < self.ttl
+
+    def invalidate(self, url: str) -> None:
+        """
+        Removes all stored responses of url and of all urls below it, e.g. the collections of a package, regardless
+        of their query parameters and scope.
+        :param url: The url to remove.
+        :return: None
+        """
+        prefix = url.rstrip('/') + '/'
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM responses WHERE url = ? OR substr(url, 1, ?) = ?',
+                               (url, len(prefix), prefix))
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM responses')
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+
+CacheStats = namedtuple('CacheStats', 'hits, misses, size')
+
+
+class RuleApplicationCache(object):
+    """
+    Memoizes the products of applying a rule to a SMILES. Entries are keyed by rule id, rule revision (e.g. its
+    lastModified or SMIRKS) and SMILES, hence a modified rule does not hit entries of its former revision.
+    The most recently used `maxsize` entries are kept in memory. If a path is given, all entries are additionally
+    stored in a SQLite database and survive the process.
+    """
+
+    def __init__(self, maxsize: int = 100000, path: str = None):
+        """
+        :param maxsize: Maximum number of entries kept in memory.
+        :param path: Optional file of the SQLite database. Created if not existing.
+        """
+        if maxsize < 0:
+            raise ValueError("maxsize must not be negative!")
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        # rule id -> keys of its entries in _data
+        self._by_rule = {}
+        self._lock = Lock()
+        self._conn = None
+        if path is not None:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            with self._conn:
+                self._conn.execute('CREATE TABLE IF NOT EXISTS rule_applications ('
+                                   'rule_id TEXT NOT NULL, revision TEXT NOT NULL, smiles TEXT NOT NULL, '
+                                   'products TEXT NOT NULL, PRIMARY KEY (rule_id, revision, smiles))')
+
+    def _remember(self, key: tuple, products: Tuple[str, ...]) -> None:
+        if self.maxsize == 0:
+            return
+        self._data[key] = products
+        self._data.move_to_end(key)
+        self._by_rule.setdefault(key[0], set()).add(key)
+        while len(self._data) > self.maxsize:
+            evicted, _ = self._data.popitem(last=False)
+            keys = self._by_rule[evicted[0]]
+            keys.discard(evicted)
+            if not keys:
+                del self._by_rule[evicted[0]]
+
+    def get(self, rule_id: str, revision: str, smiles: str) -> Optional[Tuple[str, ...]]:
+        """
+        Looks up the products of applying the rule to smiles and counts the hit or miss.
+        :param rule_id: The id of the rule.
+        :param revision: The revision of the rule.
+        :param smiles: The SMILES the rule is applied to.
+        :return: The products or None if not stored.
+        """
+        key = (rule_id, revision, smiles)
+        with self._lock:
+            products = self._data.get(key)
+            if products is not None:
+                self._data.move_to_end(key)
+            elif self._conn is not None:
+                row = self._conn.execute('SELECT products FROM rule_applications WHERE rule_id = ? AND revision = ? '
+                                         'AND smiles = ?', key).fetchone()
+                if row is not None:
+                    products = tuple(row[0].split())
+                    self._remember(key, products)
+            if products is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return products
+
+    def put(self, rule_id: str, revision: str, smiles: str, products) -> None:
+        """
+        Stores the products of applying the rule to smiles.
+        :param rule_id: The id of the rule.
+        :param revision: The revision of the rule.
+        :param smiles: The SMILES the rule is applied to.
+        :param products: The products.
+        :return: None
+        """
+        key = (rule_id, revision, smiles)
+        products = tuple(products)
+        with self._lock:
+            self._remember(key, products)
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute('INSERT OR REPLACE INTO rule_applications VALUES (?, ?, ?, ?)',
+                                       key + (' '.join(products),))
+
+    def invalidate(self, rule_id: str) -> None:
+        """
+        Removes all entries of the rule, regardless of their revision.
+        :param rule_id: The id of the rule.
+        :return: None
+        """
+        with self._lock:
+            for key in self._by_rule.pop(rule_id, ()):
+                del self._data[key]
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute('DELETE FROM rule_applications WHERE rule_id = ?', (rule_id,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._by_rule.clear()
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute('DELETE FROM rule_applications')
+
+    def stats(self) -> CacheStats:
+        """
+        :return: Number of hits and misses since creation and number of entries in memory.
+        """
+        with self._lock:
+            return CacheStats(self.hits, self.misses, len(self._data))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class CachedResponse(namedtuple('CachedResponse', 'url, headers, body, etag, last_modified, stored_at')):
+    """
+    A response stored in the ResponseCache.
+    """
+    __slots__ = ()
+
+    def conditional_headers(self) -> dict:
+        """
+        :return: The headers required to revalidate this response.
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def to_response(self) -> Response:
+        """
+        Rebuilds a requests Response object from the stored data. Its attribute `from_cache` is set to True.
+        :return: The response.
+        """
+        response = Response()
+        response.status_code = 200
+        response.url = self.url
+        response.headers = CaseInsensitiveDict(self.headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = self.body
+        response.from_cache = True
+        return response
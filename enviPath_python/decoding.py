@@ -0,0 +1,58 @@
+# Copyright 2020 enviPath UG & Co. KG
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import json
+from typing import Callable, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+# Functions decoding a JSON document given as bytes, by name
+DECODERS = {'json': json.loads}
+if ujson is not None:
+    DECODERS['ujson'] = ujson.loads
+if orjson is not None:
+    DECODERS['orjson'] = orjson.loads
+
+# Names of the decoders in order of preference
+PREFERENCE = ('orjson', 'ujson', 'json')
+
+
+def get_decoder(decoder: Union[str, Callable[[bytes], object]] = None) -> Callable[[bytes], object]:
+    """
+    Resolves the function used to decode response bodies. All decoders take the raw bytes, hence the body does not
+    have to be decoded to text first.
+    :param decoder: Either a callable, the name of an installed decoder ('orjson', 'ujson' or 'json') or None for
+     the fastest one installed.
+    :return: Function decoding bytes to JSON.
+    """
+    if callable(decoder):
+        return decoder
+    if decoder is None:
+        return next(DECODERS[name] for name in PREFERENCE if name in DECODERS)
+    try:
+        return DECODERS[decoder]
+    except KeyError:
+        raise ValueError("Unknown or not installed JSON decoder {}, available are {}".format(
+            decoder, ', '.join(sorted(DECODERS))))
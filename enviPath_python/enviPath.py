@@ -14,24 +14,43 @@
 # CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
+import logging
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import Lock
+from typing import Callable, Dict, Iterator, List, Union
+
 from requests import Session
 from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, Timeout
 
+from enviPath_python.cache import LRUCache, ResponseCache, RuleApplicationCache
+from enviPath_python.decoding import get_decoder
+from enviPath_python.instrumentation import RequestEvent, current_origin, payload_size, request_origin, url_template
+from enviPath_python.retry import RetryPolicy, TokenBucket
+from enviPath_python.streaming import iter_json_array_items
 from enviPath_python.objects import *
 
+logger = logging.getLogger(__name__)
+
 
 class enviPath(object):
     """
     Object representing enviPath functionality.
     """
 
-    def __init__(self, base_url, proxies=None):
+    def __init__(self, base_url, proxies=None, requester: 'BaseRequester' = None, **kwargs):
         """
         Constructor with instance specification.
         :param base_url: The url of the enviPath instance.
+        :param proxies: Optional proxies passed to the underlying session.
+        :param requester: Optional requester to use instead of a new enviPathRequester, e.g. a SnapshotRequester
+         to work offline.
+        :param kwargs: Additional options passed to enviPathRequester.
         """
         self.BASE_URL = base_url if base_url.endswith('/') else base_url + '/'
-        self.requester = enviPathRequester(proxies)
+        self.requester = requester if requester is not None else enviPathRequester(proxies, **kwargs)
 
     def get_base_url(self):
         return self.BASE_URL
@@ -61,7 +80,8 @@ class enviPath(object):
             'whoami': 'true',
         }
         url = self.BASE_URL + Endpoint.USER.value
-        user_data = self.requester.get_request(url, params=params).json()[Endpoint.USER.value][0]
+        response = self.requester.get_request(url, params=params, use_cache=False)
+        user_data = self.requester.decode(response)[Endpoint.USER.value][0]
         return User(self.requester, **user_data)
 
     def get_package(self, package_id: str):
@@ -94,6 +114,14 @@ class enviPath(object):
         """
         return self.requester.get_objects(self.BASE_URL, Endpoint.COMPOUND)
 
+    def iter_compounds(self, page_size: int = None) -> Iterator['Compound']:
+        """
+        Lazy variant of get_compounds(), see enviPathRequester.iter_objects().
+        :param page_size: Number of objects fetched per request, None streams all objects in one request.
+        :return: Iterator of Compound objects.
+        """
+        return self.requester.iter_objects(self.BASE_URL, Endpoint.COMPOUND, page_size=page_size)
+
     def get_reaction(self, reaction_id):
         """
 
@@ -109,6 +137,14 @@ class enviPath(object):
         """
         return self.requester.get_objects(self.BASE_URL, Endpoint.REACTION)
 
+    def iter_reactions(self, page_size: int = None) -> Iterator['Reaction']:
+        """
+        Lazy variant of get_reactions(), see enviPathRequester.iter_objects().
+        :param page_size: Number of objects fetched per request, None streams all objects in one request.
+        :return: Iterator of Reaction objects.
+        """
+        return self.requester.iter_objects(self.BASE_URL, Endpoint.REACTION, page_size=page_size)
+
     def get_rule(self, rule_id):
         """
 
@@ -124,6 +160,14 @@ class enviPath(object):
         """
         return self.requester.get_objects(self.BASE_URL, Endpoint.RULE)
 
+    def iter_rules(self, page_size: int = None) -> Iterator['Rule']:
+        """
+        Lazy variant of get_rules(), see enviPathRequester.iter_objects().
+        :param page_size: Number of objects fetched per request, None streams all objects in one request.
+        :return: Iterator of Rule objects.
+        """
+        return self.requester.iter_objects(self.BASE_URL, Endpoint.RULE, page_size=page_size)
+
     def get_pathway(self, pathway_id):
         """
 
@@ -139,6 +183,14 @@ class enviPath(object):
         """
         return self.requester.get_objects(self.BASE_URL, Endpoint.PATHWAY)
 
+    def iter_pathways(self, page_size: int = None) -> Iterator['Pathway']:
+        """
+        Lazy variant of get_pathways(), see enviPathRequester.iter_objects().
+        :param page_size: Number of objects fetched per request, None streams all objects in one request.
+        :return: Iterator of Pathway objects.
+        """
+        return self.requester.iter_objects(self.BASE_URL, Endpoint.PATHWAY, page_size=page_size)
+
     def get_scenario(self, scenario_id):
         """
 
@@ -179,12 +231,12 @@ class enviPath(object):
         return Package.create(self, group, name=name, description=description)
 
 
-class enviPathRequester(object):
+class BaseRequester(object):
     """
-    Class performing all requests to the enviPath instance.
+    Backend the enviPathObjects fetch their data from. Subclasses provide the transport, i.e. get_json(),
+    get_objects(), iter_objects() and the *_request() methods, while the identity map, hydrate() and prefetch()
+    are shared. See enviPathRequester for enviPath instances and snapshot.SnapshotRequester for package exports.
     """
-    header = {'Accept': 'application/json'}
-
     ENDPOINT_OBJECT_MAPPING = {
         Endpoint.USER: User,
         Endpoint.PACKAGE: Package,
@@ -204,15 +256,288 @@ class enviPathRequester(object):
         Endpoint.RELATIVEREASONING: RelativeReasoning,
     }
 
-    def __init__(self, proxies=None):
+    # Default number of threads used by hydrate() and prefetch()
+    pool_maxsize = 10
+
+    def __init__(self, identity_map_size=10000, rule_cache: RuleApplicationCache = None,
+                 decoder: Union[str, Callable[[bytes], object]] = None):
         """
-        Setup session for cookies as well as avoiding unnecessary ssl-handshakes.
+        :param identity_map_size: Maximum number of loaded objects kept in the identity map. 0 disables it.
+        :param rule_cache: Optional RuleApplicationCache memoizing the results of Rule.apply_to_smiles().
+        :param decoder: Function or name of the library decoding response bodies, see decoding.get_decoder().
+         Defaults to orjson or ujson if installed, the json module otherwise.
+        """
+        self.rule_cache = rule_cache
+        self.decoder = get_decoder(decoder)
+        # Maps the id of an object to its loaded json, shared by all objects with that id
+        self.identity_map = LRUCache(identity_map_size)
+
+    def get_request(self, url, params=None, payload=None, **kwargs):
+        """
+        Performs a GET request, see enviPathRequester.get_request().
+        """
+        raise NotImplementedError
+
+    def post_request(self, url, params=None, payload=None, **kwargs):
+        """
+        Performs a POST request, see enviPathRequester.post_request().
+        """
+        raise NotImplementedError
+
+    def delete_request(self, url, params=None, payload=None, **kwargs):
+        """
+        Performs a DELETE request, see enviPathRequester.delete_request().
         """
+        raise NotImplementedError
+
+    def get_json(self, envipath_id: str):
+        """
+        :param envipath_id: The id of the object.
+        :return: The plain JSON of the object denoted by envipath_id.
+        """
+        raise NotImplementedError
+
+    def get_objects(self, base_url, endpoint) -> List[enviPathObject]:
+        """
+        :param base_url: Either the url of a package followed by '/' or the url of the instance.
+        :param endpoint: Enum of Endpoint.
+        :return: List of objects denoted by endpoint.
+        """
+        raise NotImplementedError
+
+    def iter_objects(self, base_url, endpoint, page_size: int = None,
+                     chunk_size: int = 1 << 16) -> Iterator[enviPathObject]:
+        """
+        Lazy variant of get_objects().
+        """
+        raise NotImplementedError
+
+    def decode(self, response):
+        """
+        Decodes the JSON body of a response straight from its bytes.
+        :param response: The response object.
+        :return: The decoded JSON.
+        """
+        return self.decoder(response.content)
+
+    def load_json(self, envipath_id: str) -> dict:
+        """
+        Gets the json of the object denoted by envipath_id. The json is fetched only once and shared via the
+        identity map with all objects created for the same id until it is evicted or invalidated.
+        :param envipath_id: The id of the object.
+        :return: The json of the object.
+        """
+        obj_fields = self.identity_map.get(envipath_id)
+        if obj_fields is None:
+            obj_fields = self.get_json(envipath_id)
+            self.identity_map.put(envipath_id, obj_fields)
+        return obj_fields
+
+    def invalidate(self, *envipath_ids: str) -> None:
+        """
+        Removes the loaded json of the objects denoted by envipath_ids from the identity map as well as memoized
+        rule applications. Must be called whenever an object is created, modified or deleted.
+        :param envipath_ids: The ids of the objects.
+        :return: None
+        """
+        for envipath_id in envipath_ids:
+            self.identity_map.invalidate(envipath_id)
+            if self.rule_cache is not None:
+                self.rule_cache.invalidate(envipath_id)
+
+    def login(self, url, username, password):
+        """
+        Performs login. Objects loaded so far are dropped from the identity map as their data depends on the user.
+        :param url: Can be any valid enviPath url.
+        :param username: The username.
+        :param password: The corresponding password.
+        :return: None
+        """
+        data = {
+            'hiddenMethod': 'login',
+            'loginusername': username,
+            'loginpassword': password,
+        }
+        self.post_request(url, payload=data)
+        self.identity_map.clear()
+
+    def logout(self, url):
+        """
+        Performs logout. As for login(), the identity map is cleared.
+        :param url: Can be any valid enviPath url.
+        :return: None
+        """
+        data = {
+            'hiddenMethod': 'logout',
+        }
+        self.post_request(url, payload=data)
+        self.identity_map.clear()
+
+    def _create_objects(self, endpoint, plain_objs: List[dict]) -> List[enviPathObject]:
+        """
+        Creates the objects of type denoted by endpoint from their plain JSON.
+        :param endpoint: Enum of Endpoint.
+        :param plain_objs: List of JSON objects.
+        :return: List of objects.
+        """
+        if endpoint == Endpoint.RULE:
+            res = []
+            for obj in plain_objs:
+                rule_type = RULE_TYPES.get(obj.get('identifier'))
+                if rule_type is None:
+                    logger.warning("Skipping %s of unknown rule type %s", obj.get('id'), obj.get('identifier'))
+                    continue
+                res.append(rule_type._from_json(self, obj))
+            return res
+        from_json = self.ENDPOINT_OBJECT_MAPPING[endpoint]._from_json
+        return [from_json(self, obj) for obj in plain_objs]
+
+    def hydrate(self, objs: List[enviPathObject], max_workers: int = None) -> Dict[str, Exception]:
+        """
+        Fetches the full data of all given objects in parallel and sets their fields in place. This avoids
+        the lazy load triggered on first access of each object. Objects that are already loaded are skipped.
+        Objects that could not be loaded are left untouched and are loaded lazily on access as before.
+        :param objs: The objects to hydrate.
+        :param max_workers: Number of threads used to perform the requests. Defaults to the pool size.
+        :return: Dictionary mapping the id of each object that failed to the raised exception.
+        """
+        failures = {}
+        with ThreadPoolExecutor(max_workers=max_workers or self.pool_maxsize) as executor:
+            futures = {executor.submit(obj._load): obj for obj in objs if not obj.loaded}
+            for future in as_completed(futures):
+                obj = futures[future]
+                try:
+                    obj._update(future.result())
+                except Exception as e:
+                    failures[obj.get_id()] = e
+        return failures
+
+    def prefetch(self, objs: List[enviPathObject], *paths: str, max_workers: int = None) -> Dict[str, Exception]:
+        """
+        Loads the objects reachable from objs via the given paths of fields, e.g. 'links.reaction.rules' for
+        pathways, so a following traversal is answered from the identity map without any further request.
+        The paths are walked breadth first, the objects of one level are fetched in parallel and each id only once.
+        A segment also resolves the field segment + 'URI' holding a plain id, e.g. 'reaction' of an edge.
+        Objects lacking a field are skipped, objs themselves are loaded in place as by hydrate().
+        The fetched objects are kept in the identity map only, a warning is logged if it is too small to hold them.
+        :param objs: The objects to start from.
+        :param paths: Dot separated field names.
+        :param max_workers: Number of threads used to perform the requests. Defaults to the pool size.
+        :return: Dictionary mapping the id of each object that failed to the raised exception. Objects
+         reachable only through a failed object are not fetched.
+        """
+        tree = {}
+        for path in paths:
+            node = tree
+            for segment in path.split('.'):
+                node = node.setdefault(segment, {})
+
+        failures = self.hydrate(objs, max_workers=max_workers)
+        # (json, remaining paths, (type of the root object, path walked so far))
+        frontier = [(obj._fields, tree, (obj.get_type(), None)) for obj in objs if obj.loaded]
+        fetched = {}
+
+        def fetch(envipath_id, origin):
+            with request_origin(*origin):
+                return self.load_json(envipath_id)
+
+        with ThreadPoolExecutor(max_workers=max_workers or self.pool_maxsize) as executor:
+            while frontier:
+                wanted = {}
+                for obj_fields, node, (object_type, walked) in frontier:
+                    for segment, children in node.items():
+                        origin = (object_type, segment if walked is None else walked + '.' + segment)
+                        for envipath_id in self._referenced_ids(obj_fields, segment):
+                            nexts = wanted.setdefault(envipath_id, [])
+                            if (children, origin) not in nexts:
+                                nexts.append((children, origin))
+
+                futures = {executor.submit(fetch, envipath_id, nexts[0][1]): envipath_id
+                           for envipath_id, nexts in wanted.items()
+                           if envipath_id not in fetched and envipath_id not in failures}
+                for future in as_completed(futures):
+                    try:
+                        fetched[futures[future]] = future.result()
+                    except Exception as e:
+                        failures[futures[future]] = e
+
+                frontier = [(fetched[envipath_id], children, origin)
+                            for envipath_id, nexts in wanted.items() if envipath_id in fetched
+                            for children, origin in nexts if children]
+        if len(fetched) > self.identity_map.maxsize:
+            logger.warning("Prefetched %d objects, but the identity map holds only %d. Objects evicted from it are "
+                           "fetched again on access, consider a larger identity_map_size.", len(fetched),
+                           self.identity_map.maxsize)
+        return failures
+
+    @staticmethod
+    def _referenced_ids(obj_fields: dict, segment: str) -> List[str]:
+        value = obj_fields.get(segment)
+        if value is None:
+            value = obj_fields.get(segment + 'URI')
+        if not isinstance(value, list):
+            value = [value]
+        return [v['id'] if isinstance(v, dict) else v for v in value
+                if isinstance(v, str) or (isinstance(v, dict) and 'id' in v)]
+
+
+class enviPathRequester(BaseRequester):
+    """
+    Class performing all requests to the enviPath instance.
+    """
+    header = {'Accept': 'application/json'}
+
+    # Query parameters used for paging collections, see iter_objects()
+    PAGE_PARAM = 'page'
+    PAGE_SIZE_PARAM = 'pageSize'
+    FIRST_PAGE = 0
+
+    def __init__(self, proxies=None, identity_map_size=10000, cache: ResponseCache = None, offline=False,
+                 retry: RetryPolicy = None, rate_limit: float = None, pool_connections: int = 10,
+                 pool_maxsize: int = 10, pool_block: bool = False, timeout=(10, 300),
+                 rule_cache: RuleApplicationCache = None, decoder: Union[str, Callable[[bytes], object]] = None):
+        """
+        Setup session for cookies as well as avoiding unnecessary ssl-handshakes.
+        Connections are kept alive and reused from per host pools. When the requester is used from multiple
+        threads, pool_maxsize should be at least the number of threads.
+        :param proxies: Optional proxies passed to the session.
+        :param identity_map_size: Maximum number of loaded objects kept in the identity map. 0 disables it.
+        :param cache: Optional persistent ResponseCache used for GET requests.
+        :param offline: If True no request is sent at all and GET requests are answered from the cache only.
+        :param retry: RetryPolicy for failed requests. Defaults to RetryPolicy(), RetryPolicy(total=0) disables it.
+        :param rate_limit: Optional maximum number of requests per second sent by this requester.
+        :param pool_connections: Number of host connection pools to cache.
+        :param pool_maxsize: Maximum number of connections kept alive per host.
+        :param pool_block: If True, requests wait for a free connection instead of opening a connection that is
+         discarded afterwards once pool_maxsize connections are in use.
+        :param timeout: Default timeout in seconds for all requests, either a single value or a
+         (connect timeout, read timeout) tuple. None waits forever.
+        :param rule_cache: Optional RuleApplicationCache memoizing the results of Rule.apply_to_smiles().
+        :param decoder: Function or name of the library decoding response bodies, see decoding.get_decoder().
+         Defaults to orjson or ujson if installed, the json module otherwise.
+        """
+        if offline and cache is None:
+            raise ValueError("Offline mode requires a cache!")
+        super().__init__(identity_map_size=identity_map_size, rule_cache=rule_cache, decoder=decoder)
         self.session = Session()
-        self.session.mount('http://', HTTPAdapter())
-        self.session.mount('https://', HTTPAdapter())
+        for prefix in ('http://', 'https://'):
+            self.session.mount(prefix, HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                                   pool_block=pool_block))
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        # Callables receiving a RequestEvent for every request, see add_observer()
+        self.observers = []
         if proxies:
             self.session.proxies = proxies
+        self.cache = cache
+        # Responses depend on the logged in user, hence cached responses are stored per username
+        self.cache_scope = ''
+        self.offline = offline
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.rate_limiter = TokenBucket(rate_limit) if rate_limit else None
+        # Number of retries performed, total and per cause
+        self.retry_counts = Counter()
+        self._retry_counts_lock = Lock()
 
     def get_request(self, url, params=None, payload=None, **kwargs):
         """
@@ -244,41 +569,147 @@ class enviPathRequester(object):
         """
         return self._request('DELETE', url, params, payload, **kwargs)
 
-    def _request(self, method, url, params=None, payload=None, **kwargs):
+    def add_observer(self, observer: Callable[[RequestEvent], None]) -> None:
+        """
+        Registers a callable that is notified with a RequestEvent after each request, including requests answered
+        from the cache and failed requests. Observers are called from the thread performing the request.
+        See instrumentation.RequestStats and instrumentation.OpenTelemetryExporter.
+        :param observer: The callable.
+        :return: None
+        """
+        self.observers.append(observer)
+
+    def remove_observer(self, observer: Callable[[RequestEvent], None]) -> None:
+        self.observers.remove(observer)
+
+    def _request(self, method, url, params=None, payload=None, use_cache=True, **kwargs):
+        """
+        Performs the request and notifies the observers, if any.
+        See _perform() for the parameters.
+        :return: response object.
+        """
+        if not self.observers:
+            return self._perform(method, url, params, payload, use_cache, **kwargs)
+
+        started_at, start = time.time(), time.perf_counter()
+        response, error = None, None
+        try:
+            response = self._perform(method, url, params, payload, use_cache, **kwargs)
+            return response
+        except Exception as e:
+            error = e
+            response = getattr(e, 'response', None)
+            raise
+        finally:
+            origin_type, origin_field, lazy = current_origin()
+            bytes_in = None
+            if response is not None:
+                if kwargs.get('stream'):
+                    bytes_in = int(response.headers.get('Content-Length', 0)) or None
+                else:
+                    bytes_in = len(response.content or b'')
+            event = RequestEvent(method, url, url_template(url), response.status_code if response is not None else None,
+                                 bytes_in, payload_size(payload), started_at, time.perf_counter() - start,
+                                 getattr(response, 'from_cache', False), origin_type, origin_field, error,
+                                 lazy)
+            for observer in self.observers:
+                observer(event)
+
+    def _perform(self, method, url, params=None, payload=None, use_cache=True, **kwargs):
         """
         Method performing the actual request.
+        If a cache is configured, GET requests are answered from it if possible. Stored responses with an ETag
+        or Last-Modified header are revalidated with a conditional request.
         :param method: HTTP method.
         :param url: url for request.
         :param params: parameters to send.
         :param payload: data to send.
+        :param use_cache: If False the cache is bypassed. Streamed requests always bypass the cache.
+        :param kwargs: Additional arguments passed to requests, e.g. timeout to override the default timeout.
         :return: response object.
         """
-        response = self.session.request(method, url, params=params, data=payload, headers=self.header, **kwargs)
+        headers = dict(self.header)
+        headers.update(kwargs.pop('headers', None) or {})
+        kwargs.setdefault('timeout', self.timeout)
+
+        cacheable = self.cache is not None and use_cache and method == 'GET' and not kwargs.get('stream')
+        entry = self.cache.get(url, params, self.cache_scope) if cacheable else None
+        if entry is not None and (self.offline or self.cache.is_fresh(entry)):
+            return entry.to_response()
+        if self.offline:
+            raise ConnectionError("Offline mode: no cached response for {} {}".format(method, url))
+        if entry is not None:
+            headers.update(entry.conditional_headers())
+
+        response = self._send(method, url, params, payload, headers, **kwargs)
+
+        if entry is not None and response.status_code == 304:
+            self.cache.touch(url, params, self.cache_scope)
+            return entry.to_response()
         response.raise_for_status()
+        if cacheable:
+            self.cache.put(url, params, response, self.cache_scope)
         return response
 
+    def _send(self, method, url, params, payload, headers, **kwargs):
+        """
+        Sends the request, respecting the rate limit, and retries it according to the retry policy.
+        :return: response object of the last attempt.
+        """
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                response = self.session.request(method, url, params=params, data=payload, headers=headers, **kwargs)
+            except (ConnectionError, Timeout):
+                if not self.retry.can_retry(method, attempt):
+                    raise
+                cause = 'connection_error'
+                delay = self.retry.backoff(attempt)
+            else:
+                if not (self.retry.is_retryable_status(response.status_code) and self.retry.can_retry(method, attempt)):
+                    return response
+                cause = 'status_{}'.format(response.status_code)
+                delay = self.retry.get_delay(response, attempt)
+                response.close()
+
+            with self._retry_counts_lock:
+                self.retry_counts['retries'] += 1
+                self.retry_counts[cause] += 1
+            attempt += 1
+            time.sleep(delay)
+
     def get_json(self, envipath_id: str):
         """
         TODO
         :param envipath_id:
         :return:
         """
-        return self.get_request(envipath_id).json()
+        return self.decode(self.get_request(envipath_id))
+
+    def invalidate(self, *envipath_ids: str) -> None:
+        """
+        Same as BaseRequester.invalidate(), additionally removes the responses of envipath_ids and of all urls below
+        them, e.g. the collections of a package, from the response cache.
+        :param envipath_ids: The ids of the objects.
+        :return: None
+        """
+        super().invalidate(*envipath_ids)
+        if self.cache is not None:
+            for envipath_id in envipath_ids:
+                self.cache.invalidate(envipath_id)
 
     def login(self, url, username, password):
         """
-        Performs login,
+        Performs login, cached responses are only reused for the same user.
         :param url: Can be any valid enviPath url.
         :param username: The username.
         :param password: The corresponding password.
         :return: None
         """
-        data = {
-            'hiddenMethod': 'login',
-            'loginusername': username,
-            'loginpassword': password,
-        }
-        self.post_request(url, payload=data)
+        super().login(url, username, password)
+        self.cache_scope = username
 
     def logout(self, url):
         """
@@ -286,10 +717,8 @@ class enviPathRequester(object):
         :param url: Can be any valid enviPath url.
         :return: None
         """
-        data = {
-            'hiddenMethod': 'logout',
-        }
-        self.post_request(url, payload=data)
+        super().logout(url)
+        self.cache_scope = ''
 
     def get_objects(self, base_url, endpoint):
         """
@@ -298,26 +727,49 @@ class enviPathRequester(object):
         :return: List of objects denoted by endpoint.
         """
         url = base_url + endpoint.value
-        objs = self.get_request(url).json()
+        objs = self.decode(self.get_request(url))
 
-        if endpoint == Endpoint.RULE:
-            res = []
-            for obj in objs[endpoint.value]:
-                if obj['identifier'] == Endpoint.SIMPLERULE.value:
-                    res.append(SimpleRule(self, **obj))
-                elif obj['identifier'] == Endpoint.SEQUENTIALCOMPOSITERULE.value:
-                    res.append(SequentialCompositeRule(self, **obj))
-                elif obj['identifier'] == Endpoint.PARALLELCOMPOSITERULE.value:
-                    res.append(ParallelCompositeRule(self, **obj))
-                else:
-                    # TODO replace with logger....
-                    print("Unknown Rule type...")
-                    print(obj)
-            return res
-        elif endpoint.value in objs:
-            return [self.ENDPOINT_OBJECT_MAPPING[endpoint](self, **obj) for obj in objs[endpoint.value]]
+        if endpoint.value in objs:
+            return self._create_objects(endpoint, objs[endpoint.value])
         else:
-            # TODO replace with logger....
-            print('Endpoint value not present in result...')
-            print(objs)
+            logger.warning("Response of %s does not contain %s: %s", url, endpoint.value, objs)
             return []
+
+    def iter_objects(self, base_url, endpoint, page_size: int = None,
+                     chunk_size: int = 1 << 16) -> Iterator[enviPathObject]:
+        """
+        Lazy variant of get_objects(). The collection is either fetched page by page or, if no page size is given,
+        parsed while it is downloaded. Hence memory usage does not grow with the size of the collection as long
+        as the objects are not kept by the caller.
+        If the instance ignores the paging parameters, i.e. the first page contains more than page_size objects,
+        the complete collection is served from the first response.
+        :param base_url: Either the url of a package followed by '/' or the url of the instance.
+        :param endpoint: Enum of Endpoint.
+        :param page_size: Number of objects requested per page, None streams the collection in one request.
+        :param chunk_size: Number of bytes read at once when streaming.
+        :return: Iterator of objects denoted by endpoint.
+        """
+        url = base_url + endpoint.value
+        if page_size is None:
+            response = self.get_request(url, stream=True)
+            try:
+                for _, plain_obj in iter_json_array_items(response.iter_content(chunk_size), [endpoint.value],
+                                                          decoder=self.decoder):
+                    yield from self._create_objects(endpoint, [plain_obj])
+            finally:
+                response.close()
+            return
+
+        if page_size < 1:
+            raise ValueError("page_size must be positive!")
+        page, first_id = self.FIRST_PAGE, None
+        while True:
+            params = {self.PAGE_PARAM: page, self.PAGE_SIZE_PARAM: page_size}
+            plain_objs = self.decode(self.get_request(url, params=params)).get(endpoint.value, [])
+            # Guards against instances returning the same page over and over
+            if not plain_objs or plain_objs[0].get('id') == first_id:
+                return
+            yield from self._create_objects(endpoint, plain_objs)
+            if len(plain_objs) != page_size:
+                return
+            page, first_id = page + 1, plain_objs[0].get('id')
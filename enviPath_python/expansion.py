@@ -0,0 +1,137 @@
+# Copyright 2020 enviPath UG & Co. KG
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import re
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from enviPath_python.batch import apply_rules, canonical_smiles
+from enviPath_python.graph import PathwayGraph
+from enviPath_python.objects import Package, Rule
+
+_ATOM = re.compile(r'\[[^\]]*\]|Cl|Br|C|c')
+_BRACKET_CARBON = re.compile(r'\[\d*[Cc](?![a-z])')
+
+
+def count_carbons(smiles: str) -> int:
+    """
+    Counts the carbon atoms of a SMILES without parsing it into a molecule.
+    :param smiles: The SMILES.
+    :return: Number of aliphatic and aromatic carbon atoms, including those written in brackets.
+    """
+    count = 0
+    for m in _ATOM.finditer(smiles):
+        atom = m.group()
+        if atom == 'C' or atom == 'c' or (atom[0] == '[' and _BRACKET_CARBON.match(atom)):
+            count += 1
+    return count
+
+
+class PathwayExpander(object):
+    """
+    Client side breadth first pathway prediction. Starting from a root SMILES the rules are applied to all
+    compounds of a generation concurrently (see batch.apply_rules()), products are de-duplicated by their
+    canonical SMILES and form the next generation. The limits correspond to those of Setting.create().
+    Rule applications are sent to the enviPath instance, combined with a RuleApplicationCache on the requester
+    repeated intermediates are only applied once.
+    """
+
+    def __init__(self, rules: Sequence[Rule], depth_limit: int = None, node_limit: int = None,
+                 min_carbon: int = None, terminal_smiles: Iterable[str] = None, max_workers: int = None):
+        """
+        :param rules: The rules to apply.
+        :param depth_limit: Compounds at this depth are not expanded further. None expands until no new
+         compounds are found.
+        :param node_limit: Maximum number of nodes of the pathway.
+        :param min_carbon: Compounds with fewer carbon atoms are not expanded further.
+        :param terminal_smiles: Compounds that are not expanded further.
+        :param max_workers: Number of concurrent rule applications. Defaults to the pool size of the requester.
+        """
+        self.rules = list(rules)
+        self.depth_limit = depth_limit
+        self.node_limit = node_limit
+        self.min_carbon = min_carbon
+        self.terminal_smiles = {canonical_smiles(s) for s in terminal_smiles or ()}
+        self.max_workers = max_workers
+        # (SMILES, rule id) -> exception for rule applications that failed during the last expansion
+        self.errors: Dict[Tuple[str, str], Exception] = {}
+
+    @classmethod
+    def from_package(cls, package: Package, **kwargs) -> 'PathwayExpander':
+        """
+        Creates an expander applying all rules of package.
+        :param package: The package providing the rules.
+        :param kwargs: Limits as accepted by the constructor.
+        :return: The PathwayExpander.
+        """
+        return cls(package.get_rules(), **kwargs)
+
+    def _expandable(self, smiles: str, depth: int) -> bool:
+        if self.depth_limit is not None and depth >= self.depth_limit:
+            return False
+        if self.min_carbon is not None and count_carbons(smiles) < self.min_carbon:
+            return False
+        return smiles not in self.terminal_smiles
+
+    def expand(self, smiles: str) -> PathwayGraph:
+        """
+        Predicts the pathway of smiles.
+        :param smiles: The SMILES of the root compound.
+        :return: PathwayGraph whose node ids are the canonical SMILES of the compounds and whose edges carry the
+         ids of the rules producing them.
+        """
+        self.errors = {}
+        root = canonical_smiles(smiles)
+        node_index = {root: 0}
+        nodes: List[str] = [root]
+        depths = [0]
+        edges: Dict[Tuple[int, Tuple[int, ...]], List[str]] = {}
+
+        frontier = [root] if self._expandable(root, 0) else []
+        depth = 0
+        while frontier and not self._full(nodes):
+            matrix = apply_rules(self.rules, frontier, max_workers=self.max_workers)
+            for (i, j), error in matrix.errors.items():
+                self.errors[(frontier[i], self.rules[j].get_id())] = error
+
+            next_frontier = []
+            for i, parent in enumerate(frontier):
+                for j, products in matrix.row_items(i):
+                    for product in products:
+                        components = list(dict.fromkeys(canonical_smiles(c) for c in product.split('.')))
+                        new = [c for c in components if c not in node_index]
+                        if self.node_limit is not None and len(nodes) + len(new) > self.node_limit:
+                            continue
+                        for component in new:
+                            node_index[component] = len(nodes)
+                            nodes.append(component)
+                            depths.append(depth + 1)
+                            if self._expandable(component, depth + 1):
+                                next_frontier.append(component)
+                        key = (node_index[parent], tuple(sorted(node_index[c] for c in components)))
+                        rules = edges.setdefault(key, [])
+                        if self.rules[j].get_id() not in rules:
+                            rules.append(self.rules[j].get_id())
+            frontier = next_frontier
+            depth += 1
+
+        edge_keys = list(edges)
+        return PathwayGraph(nodes, ['{}>>{}'.format(nodes[s], '.'.join(nodes[e] for e in ends))
+                                    for s, ends in edge_keys],
+                            [[s] for s, _ in edge_keys], [list(ends) for _, ends in edge_keys],
+                            depths=depths, smiles=nodes, edge_rules=[edges[k] for k in edge_keys])
+
+    def _full(self, nodes: list) -> bool:
+        return self.node_limit is not None and len(nodes) >= self.node_limit
@@ -0,0 +1,228 @@
+# Copyright 2020 enviPath UG & Co. KG
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+from array import array
+from collections import deque
+from typing import Iterable, List, Optional, Sequence, Set
+
+
+def _csr(n: int, pairs: Iterable[tuple]) -> tuple:
+    """
+    Builds a compressed sparse row representation of the adjacency given as (row, column) pairs.
+    Duplicate pairs are removed, columns of a row are sorted.
+    :return: (indptr, indices) with the columns of row i being indices[indptr[i]:indptr[i + 1]].
+    """
+    rows = [set() for _ in range(n)]
+    for row, col in pairs:
+        rows[row].add(col)
+    indptr = array('i', [0])
+    indices = array('i')
+    for cols in rows:
+        indices.extend(sorted(cols))
+        indptr.append(len(indices))
+    return indptr, indices
+
+
+def _id(ref) -> str:
+    return ref['id'] if isinstance(ref, dict) else ref
+
+
+class PathwayGraph(object):
+    """
+    Compact, immutable graph representation of a pathway built in a single pass from its JSON.
+    Nodes and edges are addressed by integer indices. Edges are hyperedges connecting one or more start nodes with
+    one or more end nodes, the node adjacency derived from them is stored as CSR arrays of successors and
+    predecessors. No enviPathObjects are created and no requests are performed.
+    """
+
+    def __init__(self, node_ids: List[str], edge_ids: List[str], edge_starts: List[Sequence[int]],
+                 edge_ends: List[Sequence[int]], depths: Sequence[int] = None, smiles: List[Optional[str]] = None,
+                 inchis: List[Optional[str]] = None, edge_reactions: List[Optional[str]] = None,
+                 edge_rules: List[Sequence[str]] = None, pathway_id: str = None):
+        """
+        :param node_ids: Ids of the nodes, the position in the list is the node index.
+        :param edge_ids: Ids of the edges, the position in the list is the edge index.
+        :param edge_starts: Indices of the start nodes for each edge.
+        :param edge_ends: Indices of the end nodes for each edge.
+        :param depths: Depth of each node. Computed as distance from the root nodes if not given.
+        :param smiles: Optional SMILES of the default structure of each node.
+        :param inchis: Optional InChI of the default structure of each node.
+        :param edge_reactions: Optional reaction id of each edge.
+        :param edge_rules: Optional rule ids of each edge.
+        :param pathway_id: Optional id of the pathway the graph was built from.
+        """
+        n, m = len(node_ids), len(edge_ids)
+        self.pathway_id = pathway_id
+        self.node_ids = list(node_ids)
+        self.edge_ids = list(edge_ids)
+        self.node_index = {node_id: i for i, node_id in enumerate(self.node_ids)}
+        self.edge_index = {edge_id: i for i, edge_id in enumerate(self.edge_ids)}
+        self.smiles = list(smiles) if smiles is not None else [None] * n
+        self.inchis = list(inchis) if inchis is not None else [None] * n
+        self.edge_reactions = list(edge_reactions) if edge_reactions is not None else [None] * m
+        self.edge_rules = [tuple(r) for r in edge_rules] if edge_rules is not None else [()] * m
+
+        self.edge_start_indptr, self.edge_start_indices = _csr(m, ((e, s) for e in range(m) for s in edge_starts[e]))
+        self.edge_end_indptr, self.edge_end_indices = _csr(m, ((e, t) for e in range(m) for t in edge_ends[e]))
+
+        arcs = [(s, t) for e in range(m) for s in edge_starts[e] for t in edge_ends[e]]
+        self.succ_indptr, self.succ_indices = _csr(n, arcs)
+        self.pred_indptr, self.pred_indices = _csr(n, ((t, s) for s, t in arcs))
+        self.in_edge_indptr, self.in_edge_indices = _csr(n, ((t, e) for e in range(m) for t in edge_ends[e]))
+        self.out_edge_indptr, self.out_edge_indices = _csr(n, ((s, e) for e in range(m) for s in edge_starts[e]))
+
+        if depths is None or any(d is None for d in depths):
+            depths = self._compute_depths()
+        self.depths = array('i', depths)
+
+    @classmethod
+    def from_json(cls, nodes: List[dict], links: List[dict], pathway_id: str = None) -> 'PathwayGraph':
+        """
+        Builds the graph from the 'nodes' and 'links' of a pathway JSON.
+        :param nodes: The nodes of the pathway.
+        :param links: The links (edges) of the pathway.
+        :param pathway_id: Optional id of the pathway.
+        :return: The PathwayGraph.
+        """
+        node_ids, depths, smiles, inchis = [], [], [], []
+        for node in nodes:
+            structure = node.get('defaultStructure') or {}
+            node_ids.append(node['id'])
+            depths.append(node.get('depth'))
+            smiles.append(node.get('smiles', structure.get('smiles')))
+            inchis.append(node.get('InChI', structure.get('InChI')))
+        node_index = {node_id: i for i, node_id in enumerate(node_ids)}
+
+        edge_ids, edge_starts, edge_ends, edge_reactions, edge_rules = [], [], [], [], []
+        for link in links:
+            edge_ids.append(link['id'])
+            edge_starts.append([node_index[_id(n)] for n in link.get('startNodes', [])])
+            edge_ends.append([node_index[_id(n)] for n in link.get('endNodes', [])])
+            edge_reactions.append(link.get('reactionURI'))
+            edge_rules.append([_id(r) for r in link.get('rules', [])])
+
+        return cls(node_ids, edge_ids, edge_starts, edge_ends, depths=depths, smiles=smiles, inchis=inchis,
+                   edge_reactions=edge_reactions, edge_rules=edge_rules, pathway_id=pathway_id)
+
+    def _compute_depths(self) -> List[int]:
+        depths = [-1] * len(self.node_ids)
+        queue = deque(self.roots())
+        for root in queue:
+            depths[root] = 0
+        while queue:
+            i = queue.popleft()
+            for j in self.successors(i):
+                if depths[j] == -1:
+                    depths[j] = depths[i] + 1
+                    queue.append(j)
+        return depths
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.edge_ids)
+
+    def successors(self, i: int) -> Sequence[int]:
+        return self.succ_indices[self.succ_indptr[i]:self.succ_indptr[i + 1]]
+
+    def predecessors(self, i: int) -> Sequence[int]:
+        return self.pred_indices[self.pred_indptr[i]:self.pred_indptr[i + 1]]
+
+    def in_edges(self, i: int) -> Sequence[int]:
+        """
+        :return: Indices of the edges having node i as end node.
+        """
+        return self.in_edge_indices[self.in_edge_indptr[i]:self.in_edge_indptr[i + 1]]
+
+    def out_edges(self, i: int) -> Sequence[int]:
+        """
+        :return: Indices of the edges having node i as start node.
+        """
+        return self.out_edge_indices[self.out_edge_indptr[i]:self.out_edge_indptr[i + 1]]
+
+    def edge_starts(self, e: int) -> Sequence[int]:
+        return self.edge_start_indices[self.edge_start_indptr[e]:self.edge_start_indptr[e + 1]]
+
+    def edge_ends(self, e: int) -> Sequence[int]:
+        return self.edge_end_indices[self.edge_end_indptr[e]:self.edge_end_indptr[e + 1]]
+
+    def roots(self) -> List[int]:
+        """
+        :return: Indices of the nodes without predecessors.
+        """
+        return [i for i in range(len(self.node_ids)) if self.pred_indptr[i] == self.pred_indptr[i + 1]]
+
+    def _reachable(self, i: int, neighbours) -> Set[int]:
+        seen = set()
+        stack = list(neighbours(i))
+        while stack:
+            j = stack.pop()
+            if j not in seen:
+                seen.add(j)
+                stack.extend(neighbours(j))
+        return seen
+
+    def upstream(self, i: int) -> Set[int]:
+        """
+        :return: Indices of all nodes from which node i can be reached.
+        """
+        return self._reachable(i, self.predecessors)
+
+    def downstream(self, i: int) -> Set[int]:
+        """
+        :return: Indices of all nodes reachable from node i.
+        """
+        return self._reachable(i, self.successors)
+
+    def topological_order(self) -> List[int]:
+        """
+        :return: Node indices ordered such that each node comes after all of its predecessors.
+        """
+        n = len(self.node_ids)
+        in_degree = [self.pred_indptr[i + 1] - self.pred_indptr[i] for i in range(n)]
+        queue = deque(i for i in range(n) if in_degree[i] == 0)
+        order = []
+        while queue:
+            i = queue.popleft()
+            order.append(i)
+            for j in self.successors(i):
+                in_degree[j] -= 1
+                if in_degree[j] == 0:
+                    queue.append(j)
+        if len(order) != n:
+            raise ValueError("The pathway contains a cycle!")
+        return order
+
+    def subgraph(self, nodes: Iterable[int]) -> 'PathwayGraph':
+        """
+        Extracts the graph induced by the given nodes. Edges are kept if all of their start and end nodes are kept.
+        Depths are taken over from this graph.
+        :param nodes: Indices of the nodes to keep.
+        :return: The new PathwayGraph with its own indices.
+        """
+        keep = sorted(set(nodes))
+        mapping = {old: new for new, old in enumerate(keep)}
+        edges = [e for e in range(len(self.edge_ids))
+                 if all(s in mapping for s in self.edge_starts(e)) and all(t in mapping for t in self.edge_ends(e))]
+        return PathwayGraph([self.node_ids[i] for i in keep], [self.edge_ids[e] for e in edges],
+                            [[mapping[s] for s in self.edge_starts(e)] for e in edges],
+                            [[mapping[t] for t in self.edge_ends(e)] for e in edges],
+                            depths=[self.depths[i] for i in keep], smiles=[self.smiles[i] for i in keep],
+                            inchis=[self.inchis[i] for i in keep],
+                            edge_reactions=[self.edge_reactions[e] for e in edges],
+                            edge_rules=[self.edge_rules[e] for e in edges], pathway_id=self.pathway_id)
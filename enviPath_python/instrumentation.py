@@ -0,0 +1,327 @@
+# Copyright 2020 enviPath UG & Co. KG
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import math
+import os
+import re
+import sys
+import warnings
+from collections import Counter, defaultdict, namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Iterator, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+RequestEvent = namedtuple('RequestEvent', 'method, url, url_template, status, bytes_in, bytes_out, started_at, '
+                                          'duration, from_cache, origin_type, origin_field, error, lazy')
+
+# (object type, field, lazy) of the enviPathObject access causing the requests of the current context
+_origin: ContextVar[Optional[Tuple[str, Optional[str], bool]]] = ContextVar('enviPath_request_origin', default=None)
+
+_ID_SEGMENT = re.compile(r'^(?:[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|\d+)$')
+
+
+@contextmanager
+def request_origin(object_type: str, field: str = None, lazy: bool = False) -> Iterator[None]:
+    """
+    Attributes all requests performed within the block to the access of field on an object of object_type.
+    :param object_type: Name of the class of the object, e.g. 'Compound'.
+    :param field: The accessed field, None if not known.
+    :param lazy: True if the requests load a single object on first access of field, False for explicit bulk loads
+     such as hydrate() or prefetch().
+    """
+    token = _origin.set((object_type, field, lazy))
+    try:
+        yield
+    finally:
+        _origin.reset(token)
+
+
+def current_origin() -> Tuple[Optional[str], Optional[str], bool]:
+    """
+    :return: (object type, field, lazy) set by the innermost request_origin() block or (None, None, False).
+    """
+    return _origin.get() or (None, None, False)
+
+
+def url_template(url: str) -> str:
+    """
+    Collapses the ids within the path of url, e.g. /package/<uuid>/compound/<uuid> -> /package/{id}/compound/{id}.
+    :param url: The requested url.
+    :return: The path of url with all id segments replaced by '{id}'.
+    """
+    path = urlsplit(url).path
+    return '/'.join('{id}' if _ID_SEGMENT.match(segment) else segment for segment in path.split('/')) or '/'
+
+
+def payload_size(payload) -> int:
+    """
+    Estimates the size of a request body from the payload passed to the requester.
+    """
+    if payload is None:
+        return 0
+    if isinstance(payload, (bytes, str)):
+        return len(payload)
+    if isinstance(payload, dict):
+        return len(urlencode(payload, doseq=True))
+    return 0
+
+
+def _percentile(values: List[float], q: float) -> float:
+    """
+    Nearest rank percentile of sorted values.
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, math.ceil(q / 100.0 * len(values)) - 1))]
+
+
+class RequestStats(object):
+    """
+    Observer aggregating RequestEvents, see enviPathRequester.add_observer().
+    The report lists latency percentiles and transferred bytes per URL template, as well as object fields whose
+    lazy loading caused many requests (N+1 access patterns).
+    """
+
+    def __init__(self, hotspot_threshold: int = 10):
+        """
+        :param hotspot_threshold: Minimum number of requests caused by the same object type and field to be
+         reported as hotspot.
+        """
+        self.hotspot_threshold = hotspot_threshold
+        self.events: List[RequestEvent] = []
+        self._lock = Lock()
+
+    def __call__(self, event: RequestEvent) -> None:
+        with self._lock:
+            self.events.append(event)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.events.clear()
+
+    def summary(self) -> dict:
+        """
+        :return: URL template -> dict with count, errors, cache hits, p50/p95/p99 latency in seconds and bytes in/out.
+        """
+        with self._lock:
+            events = list(self.events)
+        groups = defaultdict(list)
+        for event in events:
+            groups[(event.method, event.url_template)].append(event)
+        res = {}
+        for (method, template), group in sorted(groups.items(), key=lambda g: -len(g[1])):
+            durations = sorted(e.duration for e in group)
+            res['{} {}'.format(method, template)] = {
+                'count': len(group),
+                'errors': sum(1 for e in group if e.error is not None),
+                'cached': sum(1 for e in group if e.from_cache),
+                'p50': _percentile(durations, 50),
+                'p95': _percentile(durations, 95),
+                'p99': _percentile(durations, 99),
+                'bytes_in': sum(e.bytes_in or 0 for e in group),
+                'bytes_out': sum(e.bytes_out for e in group),
+            }
+        return res
+
+    def hotspots(self) -> List[Tuple[str, str, int]]:
+        """
+        :return: (object type, field, number of requests) for all lazy accesses that caused at least
+         hotspot_threshold requests, most requests first. Bulk loads via hydrate() or prefetch() are not counted.
+        """
+        with self._lock:
+            events = list(self.events)
+        counts = defaultdict(int)
+        for event in events:
+            if event.lazy and event.origin_type is not None:
+                counts[(event.origin_type, event.origin_field)] += 1
+        return sorted(((t, f, n) for (t, f), n in counts.items() if n >= self.hotspot_threshold),
+                      key=lambda h: -h[2])
+
+    def report(self) -> str:
+        """
+        :return: Human readable report of summary() and hotspots().
+        """
+        lines = ['{:<60} {:>7} {:>6} {:>6} {:>9} {:>9} {:>9} {:>12}'.format(
+            'request', 'count', 'errors', 'cached', 'p50 ms', 'p95 ms', 'p99 ms', 'bytes in')]
+        for name, s in self.summary().items():
+            lines.append('{:<60} {:>7} {:>6} {:>6} {:>9.1f} {:>9.1f} {:>9.1f} {:>12}'.format(
+                name[:60], s['count'], s['errors'], s['cached'], s['p50'] * 1e3, s['p95'] * 1e3, s['p99'] * 1e3,
+                s['bytes_in']))
+        hotspots = self.hotspots()
+        if hotspots:
+            lines.append('')
+            lines.append('N+1 hotspots (requests caused by lazy loading):')
+            for object_type, field, n in hotspots:
+                lines.append('  {}.{}: {} requests, consider hydrate=True or prefetch()'.format(
+                    object_type, field or '*', n))
+        return '\n'.join(lines)
+
+    def print_report(self, file=None) -> None:
+        print(self.report(), file=file or sys.stdout)
+
+
+class OpenTelemetryExporter(object):
+    """
+    Observer exporting every RequestEvent as OpenTelemetry span. Requires the package opentelemetry-api
+    (pip install enviPath-python[otel]) and a configured tracer provider.
+    """
+
+    def __init__(self, tracer=None):
+        """
+        :param tracer: The tracer creating the spans. Defaults to the tracer of the global tracer provider.
+        """
+        try:
+            from opentelemetry import trace
+        except ImportError:
+            raise ImportError("OpenTelemetryExporter requires opentelemetry-api, "
+                              "install it via pip install enviPath-python[otel]")
+        self._trace = trace
+        self.tracer = tracer or trace.get_tracer('enviPath_python')
+
+    def __call__(self, event: RequestEvent) -> None:
+        start = int(event.started_at * 1e9)
+        attributes = {
+            'http.method': event.method,
+            'http.url': event.url,
+            'http.route': event.url_template,
+            'http.request_content_length': event.bytes_out,
+            'envipath.from_cache': event.from_cache,
+        }
+        if event.status is not None:
+            attributes['http.status_code'] = event.status
+        if event.bytes_in is not None:
+            attributes['http.response_content_length'] = event.bytes_in
+        if event.origin_type is not None:
+            attributes['envipath.origin'] = '{}.{}'.format(event.origin_type, event.origin_field or '*')
+            attributes['envipath.lazy'] = event.lazy
+        span = self.tracer.start_span('{} {}'.format(event.method, event.url_template), start_time=start,
+                                      kind=self._trace.SpanKind.CLIENT, attributes=attributes)
+        if event.error is not None:
+            span.record_exception(event.error)
+            span.set_status(self._trace.Status(self._trace.StatusCode.ERROR, str(event.error)))
+        span.end(end_time=start + int(event.duration * 1e9))
+
+
+class LazyLoadWarning(UserWarning):
+    """
+    Issued by LazyLoadProfiler if the same field is loaded lazily at the same place too often.
+    """
+
+
+class ImplicitLoadError(RuntimeError):
+    """
+    Raised by a strict LazyLoadProfiler on lazy loads that would access the network.
+    """
+
+
+# Active LazyLoadProfilers, notified by enviPathObject._get()
+_lazy_load_profilers = []
+_lazy_load_lock = Lock()
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _call_site():
+    """
+    :return: The innermost frame outside of this package or None.
+    """
+    frame = sys._getframe(1)
+    while frame is not None and os.path.dirname(os.path.abspath(frame.f_code.co_filename)) == _PACKAGE_DIR:
+        frame = frame.f_back
+    return frame
+
+
+def notify_lazy_load(obj, field: str) -> None:
+    """
+    Called by enviPathObject._get() before an object is loaded because field is accessed.
+    """
+    if _lazy_load_profilers:
+        for profiler in list(_lazy_load_profilers):
+            profiler.record(obj, field)
+
+
+class LazyLoadProfiler(object):
+    """
+    Opt-in profiling of lazy loads, i.e. objects being fetched because a field is accessed that was not loaded
+    yet. Loads are counted per (class, field, call site), the call site being the first frame outside of this
+    package. Once a count reaches `threshold` a LazyLoadWarning suggests to load the objects upfront. In strict mode
+    every lazy load that is not answered from the identity map raises ImplicitLoadError.
+    Usage:
+        with LazyLoadProfiler() as profiler:
+            names = [c.get_smiles() for c in package.get_compounds()]
+        print(profiler.report())
+    """
+
+    def __init__(self, threshold: int = 20, strict: bool = False):
+        """
+        :param threshold: Number of lazy loads of the same field at the same call site causing a warning.
+         None disables warnings.
+        :param strict: If True lazy loads requiring a request raise ImplicitLoadError.
+        """
+        self.threshold = threshold
+        self.strict = strict
+        self.counts = Counter()
+        self._lock = Lock()
+
+    def record(self, obj, field: str) -> None:
+        requester = obj.requester
+        identity_map = getattr(requester, 'identity_map', None)
+        cached = identity_map is not None and obj.id in identity_map
+        frame = _call_site()
+        site = '<unknown>' if frame is None else \
+            '{}:{} ({})'.format(frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name)
+        if self.strict and not cached:
+            raise ImplicitLoadError("Access of {}.{} at {} would load {}".format(obj.get_type(), field, site, obj.id))
+        key = (obj.get_type(), field, site)
+        with self._lock:
+            self.counts[key] += 1
+            count = self.counts[key]
+        if count == self.threshold:
+            message = "{} lazy loads of {}.{} at {}. Load the objects upfront, e.g. via get_...(hydrate=True), " \
+                      "requester.hydrate(objects) or prefetch().".format(count, obj.get_type(), field, site)
+            if frame is None:
+                warnings.warn(message, LazyLoadWarning)
+            else:
+                warnings.warn_explicit(message, LazyLoadWarning, frame.f_code.co_filename, frame.f_lineno,
+                                       module_globals=frame.f_globals)
+
+    def start(self) -> 'LazyLoadProfiler':
+        with _lazy_load_lock:
+            _lazy_load_profilers.append(self)
+        return self
+
+    def stop(self) -> None:
+        with _lazy_load_lock:
+            if self in _lazy_load_profilers:
+                _lazy_load_profilers.remove(self)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def report(self) -> str:
+        """
+        :return: The lazy loads per class, field and call site, most frequent first.
+        """
+        with self._lock:
+            counts = self.counts.most_common()
+        if not counts:
+            return 'No lazy loads.'
+        return '\n'.join('{:>7}  {}.{}  {}'.format(n, object_type, field, site)
+                         for (object_type, field, site), n in counts)
@@ -14,19 +14,30 @@
 # CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
-import json
+import logging
+import os
 from abc import ABC, abstractmethod
 from collections import namedtuple
-from io import BytesIO
-from typing import List, Optional, Union
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from enviPath_python.enums import Endpoint, ClassifierType, FingerprinterType, AssociationType, EvaluationType, \
     Permission
+from enviPath_python.graph import PathwayGraph
+from enviPath_python.instrumentation import notify_lazy_load, request_origin
+from enviPath_python.streaming import iter_json_array_items
+
+logger = logging.getLogger(__name__)
 
 
 class enviPathObject(ABC):
     """
     Base class for an enviPath object.
+    Instances only hold the requester, id, name and the JSON fetched from the instance. The JSON is kept as is,
+    shared with the identity map of the requester, and nested objects are only created on access. Subclasses must
+    declare `__slots__ = ()` to not get a per-instance __dict__.
     """
+    __slots__ = ('requester', 'id', 'name', 'loaded', '_fields')
 
     def __init__(self, requester, *args, **kwargs):
         """
@@ -37,10 +48,35 @@ class enviPathObject(ABC):
         """
         self.requester = requester
         # Make name optional to allow object creation with id only
-        if 'name' in kwargs:
-            self.name = kwargs['name']
+        self.name = kwargs.get('name')
         self.id = kwargs['id']
         self.loaded = False
+        self._fields = None
+
+    @classmethod
+    def _from_json(cls, requester, obj: dict) -> 'enviPathObject':
+        """
+        Fast path of the constructor for objects created from listings. Only reads 'id' and 'name' of obj.
+        :param requester: The enviPathRequester used for getting this object.
+        :param obj: The plain JSON of the object as listed by the instance.
+        :return: The object.
+        """
+        self = cls.__new__(cls)
+        self.requester = requester
+        self.id = obj['id']
+        self.name = obj.get('name')
+        self.loaded = False
+        self._fields = None
+        return self
+
+    def __getattr__(self, item):
+        """
+        Gives attribute access to the fields fetched so far, e.g. compound.description. Does not trigger loading.
+        """
+        try:
+            return object.__getattribute__(self, '_fields')[item]
+        except (AttributeError, KeyError, TypeError):
+            raise AttributeError("'{}' object has no attribute '{}'".format(type(self).__name__, item))
 
     def get_type(self):
         """
@@ -73,16 +109,102 @@ class enviPathObject(ABC):
         :param field: The field of interest.
         :return: The value of the field.
         """
-        if not self.loaded and not hasattr(self, field):
-            obj_fields = self._load()
-            for k, v in obj_fields.items():
-                setattr(self, k, v)
-                self.loaded = True
-
-        if not hasattr(self, field):
+        fields = self._fields
+        if not self.loaded and (fields is None or field not in fields):
+            if field == 'name' and self.name is not None:
+                return self.name
+            notify_lazy_load(self, field)
+            self._update(self._load(field, lazy=True))
+            fields = self._fields
+
+        if field not in fields:
             raise ValueError('{} has no property {}'.format(self.get_type(), field))
 
-        return getattr(self, field)
+        return fields[field]
+
+    def _update(self, obj_fields: dict) -> None:
+        """
+        Sets the fields fetched from the enviPath instance on this object and marks it as loaded.
+        obj_fields is kept without copying unless it has to be merged with fields known before.
+        :param obj_fields: json containing the server response for this object.
+        :return: None
+        """
+        if self._fields or (self.name is not None and 'name' not in obj_fields):
+            merged = {'name': self.name} if self.name is not None else {}
+            merged.update(self._fields or ())
+            merged.update(obj_fields)
+            obj_fields = merged
+        self._fields = obj_fields
+        self.loaded = True
+
+    def _set(self, field: str, value) -> None:
+        """
+        Sets a single field after it was changed on the instance. The JSON might be shared, hence it is copied.
+        """
+        fields = dict(self._fields or ())
+        fields[field] = value
+        self._fields = fields
+
+    def refresh(self, fields: Iterable[str] = None, if_modified: bool = True) -> List[str]:
+        """
+        Fetches the object again from the enviPath instance and merges the fields that changed.
+        If the object is loaded and provides 'lastModified' (e.g. Pathway) the request is conditional, i.e. the
+        server can skip the body if nothing changed since.
+        :param fields: Names of the fields to merge, None merges all fields and marks the object as loaded.
+        :param if_modified: If False the object is always fetched completely.
+        :return: Names of the fields whose value changed.
+        """
+        headers = {}
+        last_modified = self._fields.get('lastModified') if self.loaded else None
+        http_date = self._http_date(last_modified) if if_modified and last_modified is not None else None
+        if http_date is not None:
+            headers['If-Modified-Since'] = http_date
+
+        res = self.requester.get_request(self.id, use_cache=False, headers=headers)
+        if res.status_code == 304:
+            return []
+        obj_fields = self.requester.decode(res)
+
+        if fields is not None:
+            obj_fields = {k: obj_fields[k] for k in fields if k in obj_fields}
+        current = self._fields or {}
+        changed = [k for k, v in obj_fields.items() if k not in current or current[k] != v]
+
+        # Share the new state with other objects of the same id
+        cached = self.requester.identity_map.get(self.id)
+        self.requester.invalidate(self.id)
+        if fields is None:
+            self._update(obj_fields)
+            self.requester.identity_map.put(self.id, self._fields)
+        else:
+            for k in changed:
+                self._set(k, obj_fields[k])
+            if cached is not None:
+                self.requester.identity_map.put(self.id, dict(cached, **obj_fields))
+        return changed
+
+    @staticmethod
+    def _http_date(value) -> Optional[str]:
+        """
+        Converts a 'lastModified' value, either milliseconds since epoch or a date string, to an HTTP date.
+        :return: The HTTP date or None if value can not be interpreted as date.
+        """
+        if isinstance(value, str) and value.strip().isdigit():
+            value = int(value)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return formatdate(value / 1000, usegmt=True)
+        if not isinstance(value, str):
+            return None
+        try:
+            date = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            try:
+                date = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+            except ValueError:
+                return None
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=timezone.utc)
+        return formatdate(date.timestamp(), usegmt=True)
 
     def get_id(self):
         return self.id
@@ -101,12 +223,16 @@ class enviPathObject(ABC):
     def get_description(self):
         return self._get('description')
 
-    def _load(self):
+    def _load(self, field: str = None, lazy: bool = False):
         """
         Fetches data from the enviPath instance via the enviPathRequester provided at objects creation.
+        Data already loaded for the same id is taken from the requesters identity map.
+        :param field: The field whose access caused the load, reported to the observers of the requester.
+        :param lazy: True if the load is caused by the access of field, False if it is part of a bulk load.
         :return: json containing the server response.
         """
-        res = self.requester.get_request(self.id).json()
+        with request_origin(self.get_type(), field, lazy):
+            res = self.requester.load_json(self.id)
         return res
 
     def get_json(self):
@@ -116,28 +242,38 @@ class enviPathObject(ABC):
         """
         return self.requester.get_json(self.id)
 
+    def prefetch(self, *paths: str, max_workers: int = None) -> Dict[str, Exception]:
+        """
+        Loads this object and all objects reachable via the given paths of fields in parallel, level by level,
+        so navigating them afterwards performs no requests, e.g. pathway.prefetch('links.reaction.rules',
+        'nodes.defaultStructure'). See BaseRequester.prefetch().
+        :param paths: Dot separated field names.
+        :param max_workers: Number of threads used to perform the requests. Defaults to the pool size.
+        :return: Dictionary mapping the id of each object that failed to the raised exception.
+        """
+        return self.requester.prefetch([self], *paths, max_workers=max_workers)
+
     def _create_from_nested_json(self, member_name: str, nested_object_type):
-        res = []
-        plain_objs = self._get(member_name)
-        for plain_obj in plain_objs:
-            res.append(nested_object_type(self.requester, **plain_obj))
-        return res
+        from_json = nested_object_type._from_json
+        return [from_json(self.requester, plain_obj) for plain_obj in self._get(member_name)]
 
     def delete(self):
         """
         Deletes the object denoted by the internally maintained field `id`.
         :return:
         """
-        if not hasattr(self, 'id') or self.id is None:
+        if self.id is None:
             raise ValueError("Unable to delete object due to missing id!")
         self.requester.delete_request(self.id)
+        self.requester.invalidate(self.id)
         self.id = None
         # Removed potential cached members
-        for key in self.__dict__:
-            self.__delattr__(key)
+        self._fields = {}
+        self.loaded = True
 
 
 class ReviewableEnviPathObject(enviPathObject, ABC):
+    __slots__ = ()
 
     def get_aliases(self) -> List[str]:
         return self._get('aliases')
@@ -157,25 +293,65 @@ class ReviewableEnviPathObject(enviPathObject, ABC):
 
 
 class Package(enviPathObject):
+    __slots__ = ()
 
     def set_description(self, desc: str) -> None:
         payload = {
             'packageDescription': (None, desc),
         }
         self.requester.post_request(self.id, files=payload)
-        setattr(self, "description", desc)
+        self.requester.invalidate(self.id)
+        self._set('description', desc)
 
     def add_compound(self, smiles: str, name: str = None, description: str = None, inchi: str = None) -> 'Compound':
         return Compound.create(self, smiles, name=name, description=description, inchi=inchi)
 
-    def get_compounds(self) -> List['Compound']:
+    def add_compounds(self, records: Iterable[Union[str, dict]], max_workers: int = None, chunk_size: int = 100,
+                      checkpoint: str = None) -> 'BulkResult':
+        """
+        Creates many compounds concurrently, see batch.bulk_create().
+        :param records: Either SMILES or dicts with the arguments of add_compound(), e.g. {'smiles': 'CCO',
+         'name': 'Ethanol'}.
+        :param max_workers: Number of concurrent requests. Defaults to the pool size of the requester.
+        :param chunk_size: Number of records submitted at once.
+        :param checkpoint: Optional path of a checkpoint file to resume an interrupted import.
+        :return: BulkResult with the compound ids in input order and the exception per failed record.
+        """
+        return self._bulk_create(lambda r: Compound.create(self, **r), Endpoint.COMPOUND, 'smiles', records,
+                                 max_workers, chunk_size, checkpoint)
+
+    def _bulk_create(self, create, endpoint: Endpoint, key: str, records, max_workers: int, chunk_size: int,
+                     checkpoint: str):
+        from enviPath_python.batch import bulk_create
+        records = ({key: r} if isinstance(r, str) else r for r in records)
+        return bulk_create(create, records, max_workers=max_workers or getattr(self.requester, 'pool_maxsize', 10),
+                           chunk_size=chunk_size, checkpoint=checkpoint, kind=self.id + '/' + endpoint.value)
+
+    def _hydrate(self, objs: List[enviPathObject]) -> None:
+        failures = self.requester.hydrate(objs)
+        for envipath_id, e in failures.items():
+            logger.warning("Could not load %s: %s", envipath_id, e)
+
+    def get_compounds(self, hydrate: bool = False) -> List['Compound']:
         """
         Gets all compounds of the package.
+        :param hydrate: If True the full data of all compounds is fetched in parallel upfront. Objects that
+         could not be fetched are logged and loaded on access.
         :return: List of Compound objects.
         """
         res = self.requester.get_objects(self.id + '/', Endpoint.COMPOUND)
+        if hydrate:
+            self._hydrate(res)
         return res
 
+    def iter_compounds(self, page_size: int = None) -> Iterator['Compound']:
+        """
+        Lazy variant of get_compounds(), see enviPathRequester.iter_objects().
+        :param page_size: Number of objects fetched per request, None streams all objects in one request.
+        :return: Iterator of Compound objects.
+        """
+        return self.requester.iter_objects(self.id + '/', Endpoint.COMPOUND, page_size=page_size)
+
     def add_simple_rule(self, smirks: str, name: str = None, description: str = None,
                         reactant_filter_smarts: str = None, product_filter_smarts: str = None,
                         immediate: str = None) -> 'SimpleRule':
@@ -183,6 +359,20 @@ class Package(enviPathObject):
                                  reactant_filter_smarts=reactant_filter_smarts,
                                  product_filter_smarts=product_filter_smarts, immediate=immediate)
 
+    def add_simple_rules(self, records: Iterable[Union[str, dict]], max_workers: int = None, chunk_size: int = 100,
+                         checkpoint: str = None) -> 'BulkResult':
+        """
+        Creates many simple rules concurrently, see batch.bulk_create().
+        :param records: Either SMIRKS or dicts with the arguments of add_simple_rule(), e.g. {'smirks': ...,
+         'name': ...}.
+        :param max_workers: Number of concurrent requests. Defaults to the pool size of the requester.
+        :param chunk_size: Number of records submitted at once.
+        :param checkpoint: Optional path of a checkpoint file to resume an interrupted import.
+        :return: BulkResult with the rule ids in input order and the exception per failed record.
+        """
+        return self._bulk_create(lambda r: SimpleRule.create(self, **r), Endpoint.SIMPLERULE, 'smirks', records,
+                                 max_workers, chunk_size, checkpoint)
+
     def add_sequential_composite_rule(self, simple_rules: List['SimpleRule'], name: str = None, description: str = None,
                                       reactant_filter_smarts: str = None, product_filter_smarts: str = None,
                                       immediate: str = None) -> 'SequentialCompositeRule':
@@ -197,26 +387,76 @@ class Package(enviPathObject):
                                             reactant_filter_smarts=reactant_filter_smarts,
                                             product_filter_smarts=product_filter_smarts, immediate=immediate)
 
-    def get_rules(self) -> List['Rule']:
+    def get_rules(self, hydrate: bool = False) -> List['Rule']:
         """
         Gets all rules of the package.
+        :param hydrate: If True the full data of all rules is fetched in parallel upfront. Objects that
+         could not be fetched are logged and loaded on access.
         :return: List of Rule objects.
         """
         res = self.requester.get_objects(self.id + '/', Endpoint.RULE)
+        if hydrate:
+            self._hydrate(res)
         return res
 
+    def iter_rules(self, page_size: int = None) -> Iterator['Rule']:
+        """
+        Lazy variant of get_rules(), see enviPathRequester.iter_objects().
+        :param page_size: Number of objects fetched per request, None streams all objects in one request.
+        :return: Iterator of Rule objects.
+        """
+        return self.requester.iter_objects(self.id + '/', Endpoint.RULE, page_size=page_size)
+
+    def apply_rules(self, smiles_list: List[str], rules: List['Rule'] = None,
+                    max_workers: int = None) -> 'RuleApplicationMatrix':
+        """
+        Applies rules to many SMILES concurrently, identical (rule, SMILES) pairs are sent only once.
+        :param smiles_list: The SMILES to apply the rules to.
+        :param rules: The rules to apply, defaults to all rules of the package.
+        :param max_workers: Number of concurrent requests. Defaults to the pool size of the requester.
+        :return: RuleApplicationMatrix with one row per SMILES and one column per rule.
+        """
+        from enviPath_python.batch import apply_rules
+        return apply_rules(self.get_rules() if rules is None else rules, smiles_list, max_workers=max_workers)
+
     def add_reaction(self, smirks: str = None, educt: 'CompoundStructure' = None, product: 'CompoundStructure' = None,
                      name: str = None, description: str = None, rule: 'Rule' = None):
         return Reaction.create(self, smirks, educt, product, name, description, rule)
 
-    def get_reactions(self) -> List['Reaction']:
+    def add_reactions(self, records: Iterable[Union[str, dict]], max_workers: int = None, chunk_size: int = 100,
+                      checkpoint: str = None) -> 'BulkResult':
+        """
+        Creates many reactions concurrently, see batch.bulk_create().
+        :param records: Either SMIRKS or dicts with the arguments of add_reaction(), e.g. {'smirks': ...,
+         'rule': ...}.
+        :param max_workers: Number of concurrent requests. Defaults to the pool size of the requester.
+        :param chunk_size: Number of records submitted at once.
+        :param checkpoint: Optional path of a checkpoint file to resume an interrupted import.
+        :return: BulkResult with the reaction ids in input order and the exception per failed record.
+        """
+        return self._bulk_create(lambda r: Reaction.create(self, **r), Endpoint.REACTION, 'smirks', records,
+                                 max_workers, chunk_size, checkpoint)
+
+    def get_reactions(self, hydrate: bool = False) -> List['Reaction']:
         """
         Gets all reactions of the package.
+        :param hydrate: If True the full data of all reactions is fetched in parallel upfront. Objects that
+         could not be fetched are logged and loaded on access.
         :return: List of Reaction objects.
         """
         res = self.requester.get_objects(self.id + '/', Endpoint.REACTION)
+        if hydrate:
+            self._hydrate(res)
         return res
 
+    def iter_reactions(self, page_size: int = None) -> Iterator['Reaction']:
+        """
+        Lazy variant of get_reactions(), see enviPathRequester.iter_objects().
+        :param page_size: Number of objects fetched per request, None streams all objects in one request.
+        :return: Iterator of Reaction objects.
+        """
+        return self.requester.iter_objects(self.id + '/', Endpoint.REACTION, page_size=page_size)
+
     def add_pathway(self, smiles: str, name: str = None, description: str = None,
                     root_node_only: bool = False, setting: 'Setting' = None) -> 'Pathway':
         """
@@ -243,14 +483,26 @@ class Package(enviPathObject):
         """
         return self.add_pathway(smiles, name, description, root_node_only, setting)
 
-    def get_pathways(self) -> List['Pathway']:
+    def get_pathways(self, hydrate: bool = False) -> List['Pathway']:
         """
         Gets all pathways of the package.
+        :param hydrate: If True the full data of all pathways is fetched in parallel upfront. Objects that
+         could not be fetched are logged and loaded on access.
         :return: List of Pathway objects.
         """
         res = self.requester.get_objects(self.id + '/', Endpoint.PATHWAY)
+        if hydrate:
+            self._hydrate(res)
         return res
 
+    def iter_pathways(self, page_size: int = None) -> Iterator['Pathway']:
+        """
+        Lazy variant of get_pathways(), see enviPathRequester.iter_objects().
+        :param page_size: Number of objects fetched per request, None streams all objects in one request.
+        :return: Iterator of Pathway objects.
+        """
+        return self.requester.iter_objects(self.id + '/', Endpoint.PATHWAY, page_size=page_size)
+
     def add_relative_reasoning(self, packages: List['Package'], classifer_type: ClassifierType,
                                eval_type: EvaluationType, association_type: AssociationType,
                                evaluation_packages: List['Package'] = None,
@@ -278,6 +530,8 @@ class Package(enviPathObject):
         res = self.requester.get_objects(self.id + '/', Endpoint.SCENARIO)
         return res
 
+    EXPORT_KINDS = ('compounds', 'reactions', 'rules', 'pathways')
+
     def export_as_json(self) -> dict:
         """
         Exports the entire package as json.
@@ -286,10 +540,52 @@ class Package(enviPathObject):
         params = {
             'exportAsJson': 'true',
         }
-        raw_content = self.requester.get_request(self.id, params=params, stream=True).content
-        buffer = BytesIO(raw_content)
-        buffer.seek(0)
-        return json.loads(buffer.read().decode())
+        return self.requester.decode(self.requester.get_request(self.id, params=params))
+
+    def iter_export(self, kind: Union[str, Iterable[str]] = EXPORT_KINDS,
+                    chunk_size: int = 1 << 16) -> Iterator[Tuple[str, dict]]:
+        """
+        Exports the entire package, but parses the export incrementally while it is received. Only the item
+        currently parsed is kept in memory, independent of the package size.
+        :param kind: Name or names of the collections of the export to iterate, e.g. 'compounds' or
+         ('compounds', 'pathways'). Defaults to compounds, reactions, rules and pathways.
+        :param chunk_size: Number of bytes read from the connection at once.
+        :return: Iterator of (kind, item) in the order they appear in the export.
+        """
+        params = {
+            'exportAsJson': 'true',
+        }
+        kinds = [kind] if isinstance(kind, str) else kind
+        response = self.requester.get_request(self.id, params=params, stream=True)
+        try:
+            yield from iter_json_array_items(response.iter_content(chunk_size=chunk_size), kinds,
+                                             decoder=self.requester.decoder)
+        finally:
+            response.close()
+
+    def export_to_file(self, path: str, chunk_size: int = 1 << 20) -> str:
+        """
+        Exports the entire package as json and streams it to path without holding it in memory.
+        The file can be opened with PackageSnapshot.open() to work with the package offline.
+        :param path: The file to write. It is only replaced once the export has been received completely.
+        :param chunk_size: Number of bytes read from the connection at once.
+        :return: The path of the written file.
+        """
+        params = {
+            'exportAsJson': 'true',
+        }
+        tmp_path = path + '.part'
+        response = self.requester.get_request(self.id, params=params, stream=True)
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    f.write(chunk)
+            os.replace(tmp_path, path)
+        finally:
+            response.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return path
 
     def set_access_for_user(self, obj: Union['Group', 'User'], perm: Permission) -> None:
         payload = {
@@ -304,6 +600,7 @@ class Package(enviPathObject):
             payload['write'] = 'on'
 
         self.requester.post_request(self.id, payload=payload, allow_redirects=False)
+        self.requester.invalidate(self.id)
 
     @staticmethod
     def create(ep, group: 'Group', name: str = None, description: str = None) -> 'Package':
@@ -318,10 +615,12 @@ class Package(enviPathObject):
         url = '{}{}'.format(ep.get_base_url(), Endpoint.PACKAGE.value)
         res = ep.requester.post_request(url, payload=package_payload, allow_redirects=False)
         res.raise_for_status()
+        ep.requester.invalidate(url, res.headers['Location'])
         return Package(ep.requester, id=res.headers['Location'])
 
 
 class Scenario(enviPathObject):
+    __slots__ = ()
 
     @staticmethod
     def create(**kwargs):
@@ -329,6 +628,7 @@ class Scenario(enviPathObject):
 
 
 class Compound(ReviewableEnviPathObject):
+    __slots__ = ()
 
     def add_structure(self, smiles, name=None, description=None, inchi=None, mol_file=None) -> 'CompoundStructure':
         return CompoundStructure.create(self, smiles, name=name, description=description, inchi=inchi,
@@ -362,6 +662,7 @@ class Compound(ReviewableEnviPathObject):
         url = '{}/{}'.format(parent.get_id(), Endpoint.COMPOUND.value)
         res = parent.requester.post_request(url, payload=compound_payload, allow_redirects=False)
         res.raise_for_status()
+        parent.requester.invalidate(parent.get_id(), res.headers['Location'])
         return Compound(parent.requester, id=res.headers['Location'])
 
     def get_default_structure(self) -> 'CompoundStructure':
@@ -375,6 +676,7 @@ class Compound(ReviewableEnviPathObject):
 
 
 class CompoundStructure(ReviewableEnviPathObject):
+    __slots__ = ()
 
     def get_charge(self) -> float:
         return float(self._get('charge'))
@@ -430,10 +732,12 @@ class CompoundStructure(ReviewableEnviPathObject):
         url = '{}/{}'.format(parent.get_id(), Endpoint.COMPOUNDSTRUCTURE)
         res = parent.requester.post_request(url, payload=structure_payload, allow_redirects=False)
         res.raise_for_status()
+        parent.requester.invalidate(parent.get_id(), res.headers['Location'])
         return CompoundStructure(parent.requester, id=res.headers['Location'])
 
 
 class Reaction(enviPathObject):
+    __slots__ = ()
 
     def is_multistep(self) -> bool:
         return "true" == self._get('multistep')
@@ -468,8 +772,7 @@ class Reaction(enviPathObject):
                 return None
             if len(rules) > 1:
                 raise Exception("More than one rule attached to reaction!")
-            rule_type = Rule.get_rule_type(rules[0])
-            return rule_type(self.requester, **rules[0])
+            return Rule.get_rule_type(rules[0])._from_json(self.requester, rules[0])
         except ValueError:
             return None
 
@@ -503,10 +806,12 @@ class Reaction(enviPathObject):
         url = '{}/{}'.format(package.get_id(), Endpoint.REACTION.value)
         res = package.requester.post_request(url, payload=payload, allow_redirects=False)
         res.raise_for_status()
+        package.requester.invalidate(package.get_id(), res.headers['Location'])
         return Reaction(package.requester, id=res.headers['Location'])
 
 
 class Rule(ReviewableEnviPathObject, ABC):
+    __slots__ = ()
 
     def get_ec_numbers(self) -> List[object]:
         return self._get('ecNumbers')
@@ -545,6 +850,18 @@ class Rule(ReviewableEnviPathObject, ABC):
         return self.apply_to_smiles(compound.get_default_structure().get_smiles())
 
     def apply_to_smiles(self, smiles) -> List[str]:
+        """
+        Applies the rule to smiles. If the requester has a rule_cache, results are memoized per rule revision.
+        :param smiles: The SMILES to apply the rule to.
+        :return: The SMILES of the products.
+        """
+        cache = getattr(self.requester, 'rule_cache', None)
+        if cache is not None:
+            revision = self.get_revision()
+            products = cache.get(self.get_id(), revision, smiles.strip())
+            if products is not None:
+                return list(products)
+
         payload = {
             'hiddenMethod': 'APPLYRULES',
             'compound': smiles
@@ -556,18 +873,44 @@ class Rule(ReviewableEnviPathObject, ABC):
         for split in splitted:
             if split:
                 result.append(split)
+
+        if cache is not None:
+            cache.put(self.get_id(), revision, smiles.strip(), result)
         return result
 
+    def get_revision(self) -> str:
+        """
+        Identifies the current state of the rule, used to memoize rule applications.
+        :return: The lastModified value of the rule if available, its SMIRKS otherwise.
+        """
+        for field in ('lastModified', 'smirks'):
+            try:
+                return str(self._get(field))
+            except ValueError:
+                pass
+        return ''
+
+    def apply_batch(self, smiles_list: List[str], max_workers: int = None) -> 'RuleApplicationMatrix':
+        """
+        Applies this rule to many SMILES concurrently, identical SMILES are sent only once.
+        :param smiles_list: The SMILES to apply the rule to.
+        :param max_workers: Number of concurrent requests. Defaults to the pool size of the requester.
+        :return: RuleApplicationMatrix with one row per SMILES and a single column.
+        """
+        from enviPath_python.batch import apply_rules
+        return apply_rules([self], smiles_list, max_workers=max_workers)
+
     @staticmethod
     def get_rule_type(obj: dict):
-        if obj['identifier'] == Endpoint.SIMPLERULE.value:
-            return SimpleRule
-        elif obj['identifier'] == Endpoint.SEQUENTIALCOMPOSITERULE.value:
-            return SequentialCompositeRule
-        elif obj['identifier'] == Endpoint.PARALLELCOMPOSITERULE.value:
-            return ParallelCompositeRule
-        else:
-            raise ValueError("Unknown rule type {}".format(obj['identifier']))
+        """
+        Looks up the class of a rule in RULE_TYPES.
+        :param obj: The plain JSON of the rule.
+        :return: The class of the rule.
+        """
+        try:
+            return RULE_TYPES[obj.get('identifier')]
+        except KeyError:
+            raise ValueError("Unknown rule type {}".format(obj.get('identifier')))
 
     @staticmethod
     @abstractmethod
@@ -577,6 +920,7 @@ class Rule(ReviewableEnviPathObject, ABC):
 
 
 class SimpleRule(Rule):
+    __slots__ = ()
 
     @staticmethod
     def create(package: Package, smirks: str, name: str = None, description: str = None,
@@ -604,6 +948,7 @@ class SimpleRule(Rule):
         url = '{}/{}'.format(package.get_id(), Endpoint.SIMPLERULE.value)
         res = package.requester.post_request(url, payload=rule_payload, allow_redirects=False)
         res.raise_for_status()
+        package.requester.invalidate(package.get_id(), res.headers['Location'])
         return SimpleRule(package.requester, id=res.headers['Location'])
 
     def get_smirks(self) -> str:
@@ -611,6 +956,8 @@ class SimpleRule(Rule):
 
 
 class SequentialCompositeRule(Rule):
+    __slots__ = ()
+
     @staticmethod
     def create(package: Package, simple_rules: List[SimpleRule], name: str = None, description: str = None,
                reactant_filter_smarts: str = None, product_filter_smarts: str = None,
@@ -638,6 +985,7 @@ class SequentialCompositeRule(Rule):
         url = '{}/{}'.format(package.get_id(), Endpoint.SEQUENTIALCOMPOSITERULE.value)
         res = package.requester.post_request(url, payload=rule_payload, allow_redirects=False)
         res.raise_for_status()
+        package.requester.invalidate(package.get_id(), res.headers['Location'])
         return SequentialCompositeRule(package.requester, id=res.headers['Location'])
 
     def get_simple_rules(self):
@@ -645,6 +993,8 @@ class SequentialCompositeRule(Rule):
 
 
 class ParallelCompositeRule(Rule):
+    __slots__ = ()
+
     @staticmethod
     def create(package: Package, simple_rules: List[SimpleRule], name: str = None, description: str = None,
                reactant_filter_smarts: str = None, product_filter_smarts: str = None,
@@ -672,13 +1022,23 @@ class ParallelCompositeRule(Rule):
         url = '{}/{}'.format(package.get_id(), Endpoint.PARALLELCOMPOSITERULE.value)
         res = package.requester.post_request(url, payload=rule_payload, allow_redirects=False)
         res.raise_for_status()
+        package.requester.invalidate(package.get_id(), res.headers['Location'])
         return ParallelCompositeRule(package.requester, id=res.headers['Location'])
 
     def get_simple_rules(self):
         return self._create_from_nested_json('simpleRules', SimpleRule)
 
 
+# Maps the 'identifier' of a rule JSON to the class of the rule
+RULE_TYPES = {
+    Endpoint.SIMPLERULE.value: SimpleRule,
+    Endpoint.SEQUENTIALCOMPOSITERULE.value: SequentialCompositeRule,
+    Endpoint.PARALLELCOMPOSITERULE.value: ParallelCompositeRule,
+}
+
+
 class RelativeReasoning(ReviewableEnviPathObject):
+    __slots__ = ()
 
     @staticmethod
     def create(package: Package, packages: List[Package], classifer_type: ClassifierType,
@@ -711,6 +1071,7 @@ class RelativeReasoning(ReviewableEnviPathObject):
         url = '{}/{}'.format(package.get_id(), Endpoint.RELATIVEREASONING.value)
         res = package.requester.post_request(url, payload=payload, allow_redirects=False)
         res.raise_for_status()
+        package.requester.invalidate(package.get_id(), res.headers['Location'])
         return RelativeReasoning(package.requester, id=res.headers['Location'])
 
     def download_arff(self) -> str:
@@ -723,7 +1084,7 @@ class RelativeReasoning(ReviewableEnviPathObject):
         params = {
             'status': "true",
         }
-        return ModelStatus(**self.requester.get_request(self.id, params=params).json())
+        return ModelStatus(**self.requester.decode(self.requester.get_request(self.id, params=params)))
 
     def classify_structure(self, structure: CompoundStructure):
         return self.classify_smiles(structure.get_smiles())
@@ -734,6 +1095,7 @@ class RelativeReasoning(ReviewableEnviPathObject):
 
 
 class Node(ReviewableEnviPathObject):
+    __slots__ = ()
 
     def get_smiles(self):
         return self.get_default_structure().get_smiles()
@@ -770,6 +1132,7 @@ class Node(ReviewableEnviPathObject):
 
 
 class Edge(ReviewableEnviPathObject):
+    __slots__ = ()
 
     def get_start_nodes(self) -> List['Node']:
         return self._create_from_nested_json('startNodes', Node)
@@ -794,6 +1157,7 @@ class Edge(ReviewableEnviPathObject):
 
 
 class Setting(enviPathObject):
+    __slots__ = ()
 
     @staticmethod
     def create(ep, packages: List[Package], name: str = None, depth_limit: int = None, node_limit: int = None,
@@ -831,6 +1195,7 @@ class Setting(enviPathObject):
         url = '{}{}'.format(ep.get_base_url(), Endpoint.SETTING.value)
         res = ep.requester.post_request(url, payload=payload, allow_redirects=False)
         res.raise_for_status()
+        ep.requester.invalidate(url, res.headers['Location'])
         return Setting(ep.requester, id=res.headers['Location'])
 
     def set_name(self, name: str) -> None:
@@ -838,7 +1203,8 @@ class Setting(enviPathObject):
             'settingName': name
         }
         self.requester.post_request(self.id, payload=payload)
-        setattr(self, "settingName", name)
+        self.requester.invalidate(self.id)
+        self._set('settingName', name)
 
     def get_included_packages(self) -> List['Package']:
         return self._create_from_nested_json('includedPackages', Package)
@@ -854,6 +1220,7 @@ class Setting(enviPathObject):
             'addedPackages[]': [p.id for p in packages]
         }
         self.requester.post_request(self.id, payload=payload)
+        self.requester.invalidate(self.id)
         # TODO modify local state
 
     def remove_package(self, package: 'Package'):
@@ -864,6 +1231,7 @@ class Setting(enviPathObject):
             'removedPackages[]': [p.id for p in packages]
         }
         self.requester.post_request(self.id, payload=payload)
+        self.requester.invalidate(self.id)
         # TODO modify local state
 
     def get_normalization_rules(self) -> List['NormalizationRule']:
@@ -885,14 +1253,18 @@ class Setting(enviPathObject):
             payload['ruleDesc'] = description
 
         self.requester.post_request(self.id, payload=payload)
+        self.requester.invalidate(self.id)
         # TODO modify local state
 
 
 class TruncationStrategy(enviPathObject):
+    __slots__ = ()
+
     pass
 
 
 class NormalizationRule(ReviewableEnviPathObject):
+    __slots__ = ()
 
     @staticmethod
     def create(setting: 'Setting', smirks: str, name: str = None, description: str = None):
@@ -910,6 +1282,7 @@ class NormalizationRule(ReviewableEnviPathObject):
             payload['ruleDesc'] = description
 
         setting.requester.post_request(setting.id, payload=payload)
+        setting.requester.invalidate(setting.id)
 
     # TODO
     # {
@@ -936,6 +1309,7 @@ class NormalizationRule(ReviewableEnviPathObject):
 
 
 class Pathway(ReviewableEnviPathObject):
+    __slots__ = ()
 
     def get_nodes(self) -> List[Node]:
         return self._create_from_nested_json('nodes', Node)
@@ -943,6 +1317,13 @@ class Pathway(ReviewableEnviPathObject):
     def get_edges(self) -> List[Edge]:
         return self._create_from_nested_json('links', Edge)
 
+    def to_graph(self) -> PathwayGraph:
+        """
+        Builds a compact graph of this pathway from its JSON without creating Node and Edge objects.
+        :return: PathwayGraph of this pathway.
+        """
+        return PathwayGraph.from_json(self._get('nodes'), self._get('links'), pathway_id=self.id)
+
     def get_name(self) -> str:
         return self._get('pathwayName')
 
@@ -982,10 +1363,12 @@ class Pathway(ReviewableEnviPathObject):
         res = package.requester.post_request(package.id + '/' + Endpoint.PATHWAY.value, params=None,
                                              payload=payload, allow_redirects=False)
         res.raise_for_status()
+        package.requester.invalidate(package.get_id(), res.headers['Location'])
         return Pathway(package.requester, id=res.headers['Location'])
 
 
 class User(enviPathObject):
+    __slots__ = ()
 
     def get_email(self) -> str:
         return self._get('email')
@@ -1044,6 +1427,7 @@ class User(enviPathObject):
 
 
 class Group(enviPathObject):
+    __slots__ = ()
 
     def create(self, **kwargs):
         raise NotImplementedError("Not (yet) implemented!")
@@ -0,0 +1,141 @@
+# Copyright 2020 enviPath UG & Co. KG
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import random
+import time
+from email.utils import parsedate_to_datetime
+from threading import Lock
+from typing import Optional
+
+
+class RetryPolicy(object):
+    """
+    Describes which requests are retried and how long to wait in between.
+    The delay grows exponentially with each attempt and is randomized by `jitter` to avoid retries of parallel
+    jobs hitting the instance at the same time. If the server sends a Retry-After header on a 429 or 503 response
+    the delay requested by the server is used instead.
+    """
+
+    def __init__(self, total: int = 3, backoff_factor: float = 0.5, max_backoff: float = 60, jitter: float = 0.5,
+                 status_forcelist=(429, 500, 502, 503, 504), methods=('GET',), max_retry_after: float = 300):
+        """
+        :param total: Maximum number of retries per request. 0 disables retries.
+        :param backoff_factor: Delay before the first retry in seconds, doubled for each further retry.
+        :param max_backoff: Upper bound of the computed delay in seconds.
+        :param jitter: Fraction of the delay that is added at random, e.g. 0.5 adds up to 50%.
+        :param status_forcelist: Response status codes that cause a retry.
+        :param methods: HTTP methods that are retried. Should only contain idempotent methods.
+        :param max_retry_after: Upper bound in seconds for delays requested via Retry-After.
+        """
+        if total < 0:
+            raise ValueError("total must not be negative!")
+        self.total = total
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.status_forcelist = frozenset(status_forcelist)
+        self.methods = frozenset(m.upper() for m in methods)
+        self.max_retry_after = max_retry_after
+
+    def can_retry(self, method: str, attempt: int) -> bool:
+        """
+        :param method: HTTP method of the request.
+        :param attempt: Number of retries already performed.
+        :return: True if another retry is allowed.
+        """
+        return attempt < self.total and method.upper() in self.methods
+
+    def is_retryable_status(self, status_code: int) -> bool:
+        return status_code in self.status_forcelist
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Computes the randomized exponential delay.
+        :param attempt: Number of retries already performed.
+        :return: Delay in seconds.
+        """
+        delay = min(self.max_backoff, self.backoff_factor * 2 ** attempt)
+        return delay + random.uniform(0, self.jitter * delay)
+
+    def get_delay(self, response, attempt: int) -> float:
+        """
+        Computes the delay before retrying the request that led to response.
+        :param response: The response with a retryable status code.
+        :param attempt: Number of retries already performed.
+        :return: Delay in seconds.
+        """
+        if response.status_code in (429, 503):
+            retry_after = self.parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                return min(retry_after, self.max_retry_after)
+        return self.backoff(attempt)
+
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """
+        Parses a Retry-After header which is either given in seconds or as HTTP date.
+        :param value: The header value.
+        :return: Seconds to wait or None if not parsable.
+        """
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class TokenBucket(object):
+    """
+    Thread safe client side rate limiter. Tokens are refilled at `rate` per second up to `capacity`, every request
+    takes one token and blocks until one is available.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        """
+        :param rate: Number of requests per second allowed on average.
+        :param capacity: Maximum burst size. Defaults to rate, but at least 1.
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive!")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = Lock()
+
+    def acquire(self, tokens: float = 1) -> float:
+        """
+        Takes tokens from the bucket, waits if not enough tokens are available.
+        :param tokens: Number of tokens to take.
+        :return: Seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
@@ -0,0 +1,331 @@
+# Copyright 2020 enviPath UG & Co. KG
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import json
+import mmap
+import os
+from collections import namedtuple
+from typing import Iterator, List, Optional
+
+from requests import HTTPError
+
+from enviPath_python.decoding import get_decoder
+from enviPath_python.enums import Endpoint
+from enviPath_python.enviPath import BaseRequester
+from enviPath_python.streaming import iter_array_items
+
+IndexEntry = namedtuple('IndexEntry', 'kind, start, end, nested')
+
+
+class SnapshotError(RuntimeError):
+    """
+    Raised by SnapshotRequester for data that package exports do not contain, e.g. users or groups.
+    """
+
+
+class SnapshotReadOnlyError(SnapshotError):
+    """
+    Raised by SnapshotRequester for every request, as snapshots can neither be modified nor refreshed.
+    """
+
+
+class PackageSnapshot(object):
+    """
+    Read only view on a package export stored on disk, see Package.export_to_file().
+    The file is memory mapped and an index of id -> byte range is kept, so single objects can be decoded on demand
+    without parsing the whole export. The index is stored next to the export (<path>.idx) and reused as long as the
+    export is unchanged, hence opening a snapshot a second time does not scan the export again.
+    Objects nested within top level items (e.g. structures of compounds, nodes and edges of pathways) are indexed
+    as well and resolved through their enclosing item.
+    """
+    INDEX_SUFFIX = '.idx'
+    INDEX_VERSION = 1
+
+    def __init__(self, path: str, fp, mm, index: dict):
+        self.path = path
+        self._fp = fp
+        self._mm = mm
+        self.index = index
+
+    @classmethod
+    def open(cls, path: str, rebuild_index: bool = False) -> 'PackageSnapshot':
+        """
+        Opens the export stored at path.
+        :param path: Path of the export.
+        :param rebuild_index: If True the index is built from scratch even if a valid index file exists.
+        :return: The PackageSnapshot.
+        """
+        fp = open(path, 'rb')
+        mm = None
+        try:
+            if os.fstat(fp.fileno()).st_size == 0:
+                raise ValueError("{} is empty!".format(path))
+            mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            index = None if rebuild_index else cls._read_index(path)
+            if index is None:
+                index = cls._build_index(mm)
+                cls._write_index(path, index)
+        except Exception:
+            if mm is not None:
+                mm.close()
+            fp.close()
+            raise
+        return cls(path, fp, mm, index)
+
+    @classmethod
+    def _index_stamp(cls, path: str) -> list:
+        stat = os.stat(path)
+        return [cls.INDEX_VERSION, stat.st_size, stat.st_mtime_ns]
+
+    @classmethod
+    def _read_index(cls, path: str) -> Optional[dict]:
+        try:
+            with open(path + cls.INDEX_SUFFIX) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('stamp') != cls._index_stamp(path):
+            return None
+        return {k: IndexEntry(*v) for k, v in data['entries'].items()}
+
+    @classmethod
+    def _write_index(cls, path: str, index: dict) -> None:
+        data = {
+            'stamp': cls._index_stamp(path),
+            'entries': index,
+        }
+        try:
+            with open(path + cls.INDEX_SUFFIX, 'w') as f:
+                json.dump(data, f)
+        except OSError:
+            # Not being able to persist the index only affects the time needed to open the snapshot again
+            pass
+
+    @classmethod
+    def _build_index(cls, mm) -> dict:
+        index = {}
+        chunk_size = 1 << 20
+        chunks = (mm[i:i + chunk_size] for i in range(0, len(mm), chunk_size))
+        for kind, start, end, raw in iter_array_items(chunks):
+            item = json.loads(raw)
+            if not isinstance(item, dict) or 'id' not in item:
+                continue
+            index[item['id']] = IndexEntry(kind, start, end, False)
+            for nested_id in cls._nested_ids(item):
+                if nested_id not in index:
+                    index[nested_id] = IndexEntry(kind, start, end, True)
+        return index
+
+    @staticmethod
+    def _nested_ids(item: dict) -> Iterator[str]:
+        stack = [v for v in item.values() if isinstance(v, (dict, list))]
+        while stack:
+            value = stack.pop()
+            children = value if isinstance(value, list) else value.values()
+            if isinstance(value, dict) and isinstance(value.get('id'), str):
+                yield value['id']
+            stack.extend(v for v in children if isinstance(v, (dict, list)))
+
+    @staticmethod
+    def _find_nested(item, envipath_id: str) -> Optional[dict]:
+        """
+        Finds the most complete representation of the object envipath_id within item.
+        """
+        best = None
+        stack = [item]
+        while stack:
+            value = stack.pop()
+            if isinstance(value, dict):
+                if value.get('id') == envipath_id and (best is None or len(value) > len(best)):
+                    best = value
+                stack.extend(value.values())
+            elif isinstance(value, list):
+                stack.extend(value)
+        return best
+
+    def get(self, envipath_id: str) -> dict:
+        """
+        Decodes the object denoted by envipath_id.
+        :param envipath_id: The id of the object.
+        :return: The json of the object.
+        """
+        try:
+            entry = self.index[envipath_id]
+        except KeyError:
+            raise KeyError("{} is not part of the snapshot {}".format(envipath_id, self.path))
+        item = json.loads(self._mm[entry.start:entry.end])
+        if not entry.nested:
+            return item
+        return self._find_nested(item, envipath_id)
+
+    def get_raw(self, envipath_id: str) -> bytes:
+        """
+        :param envipath_id: The id of a top level object, e.g. a compound or pathway.
+        :return: The undecoded json of the object.
+        """
+        entry = self.index[envipath_id]
+        if entry.nested:
+            raise ValueError("{} is nested within another object!".format(envipath_id))
+        return self._mm[entry.start:entry.end]
+
+    def ids(self, kind: str = None) -> List[str]:
+        """
+        :param kind: Optional name of the collection, e.g. 'compounds'.
+        :return: Ids of all top level objects, optionally restricted to kind, in the order of the export.
+        """
+        entries = [(e.start, k) for k, e in self.index.items() if not e.nested and (kind is None or e.kind == kind)]
+        return [k for _, k in sorted(entries)]
+
+    def iter_items(self, kind: str = None) -> Iterator[dict]:
+        """
+        Decodes the top level objects one after another.
+        :param kind: Optional name of the collection, e.g. 'compounds'.
+        :return: Iterator of the json of the objects in the order of the export.
+        """
+        for envipath_id in self.ids(kind):
+            yield self.get(envipath_id)
+
+    def close(self) -> None:
+        self._mm.close()
+        self._fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __contains__(self, envipath_id):
+        return envipath_id in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+
+class SnapshotRequester(BaseRequester):
+    """
+    Requester answering get_json()/get_objects() from package exports held in memory instead of an enviPath
+    instance, see Package.export_as_json(). All enviPathObjects created with it, e.g. via
+    enviPath(base_url, requester=SnapshotRequester(export)), work offline at in-memory speed, no connection to an
+    instance is set up.
+    Requests that would modify data as well as requests for data not contained in the exports raise.
+    """
+
+    EXPORT_KEYS = {
+        Endpoint.COMPOUND: 'compounds',
+        Endpoint.REACTION: 'reactions',
+        Endpoint.RULE: 'rules',
+        Endpoint.PATHWAY: 'pathways',
+        Endpoint.SCENARIO: 'scenarios',
+        Endpoint.RELATIVEREASONING: 'relativeReasonings',
+    }
+
+    def __init__(self, *exports: dict, **kwargs):
+        """
+        :param exports: One or more package exports as returned by Package.export_as_json().
+        :param kwargs: Additional options passed to BaseRequester, e.g. identity_map_size.
+        """
+        super().__init__(**kwargs)
+        self.exports = {export['id']: export for export in exports}
+        self.objects = {}
+        for export in exports:
+            self._index(export)
+
+    @classmethod
+    def from_file(cls, *paths: str, **kwargs) -> 'SnapshotRequester':
+        """
+        Creates the requester from exports stored on disk, see Package.export_to_file().
+        :param paths: Paths of the exports.
+        :param kwargs: Additional options passed to BaseRequester, e.g. decoder.
+        :return: The SnapshotRequester.
+        """
+        decoder = get_decoder(kwargs.get('decoder'))
+        exports = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                exports.append(decoder(f.read()))
+        return cls(*exports, **kwargs)
+
+    def _index(self, export: dict) -> None:
+        """
+        Registers every object contained in export by its id. If an object occurs multiple times, e.g. as reference
+        within another object, the most complete representation is kept.
+        """
+        collections = set(self.EXPORT_KEYS.values())
+        self.objects[export['id']] = {k: v for k, v in export.items() if k not in collections}
+        stack = [v for k, v in export.items() if k in collections]
+        while stack:
+            value = stack.pop()
+            if isinstance(value, list):
+                stack.extend(value)
+            elif isinstance(value, dict):
+                envipath_id = value.get('id')
+                if isinstance(envipath_id, str) and len(value) > len(self.objects.get(envipath_id, ())):
+                    self.objects[envipath_id] = value
+                stack.extend(value.values())
+
+    def _read_only(self, method, url):
+        return SnapshotReadOnlyError("{} is read only and can not perform {} {}".format(
+            type(self).__name__, method, url))
+
+    def get_request(self, url, params=None, payload=None, **kwargs):
+        raise self._read_only('GET', url)
+
+    def post_request(self, url, params=None, payload=None, **kwargs):
+        raise self._read_only('POST', url)
+
+    def delete_request(self, url, params=None, payload=None, **kwargs):
+        raise self._read_only('DELETE', url)
+
+    def get_json(self, envipath_id: str):
+        """
+        Looks up the JSON of the object denoted by envipath_id in the exports.
+        :param envipath_id: The id of the object.
+        :return: The JSON of the object.
+        """
+        try:
+            return self.objects[envipath_id]
+        except KeyError:
+            raise HTTPError("404 Client Error: {} is not part of the snapshot".format(envipath_id))
+
+    def get_objects(self, base_url, endpoint):
+        """
+        Gets the objects of the given type, either of a single package or of all exports.
+        :param base_url: Either the url of a package followed by '/' or the url of the instance.
+        :param endpoint: Enum of Endpoint.
+        :return: List of objects denoted by endpoint.
+        """
+        if endpoint == Endpoint.PACKAGE:
+            return self._create_objects(endpoint, [self.objects[package_id] for package_id in self.exports])
+
+        key = self.EXPORT_KEYS.get(endpoint)
+        if key is None:
+            raise SnapshotError("{} are not part of package exports".format(endpoint.value))
+
+        package_id = base_url.rstrip('/')
+        if package_id in self.exports:
+            exports = [self.exports[package_id]]
+        elif '/{}/'.format(Endpoint.PACKAGE.value) in base_url:
+            raise HTTPError("404 Client Error: {} is not part of the snapshot".format(package_id))
+        else:
+            exports = self.exports.values()
+        return self._create_objects(endpoint, [obj for export in exports for obj in export.get(key, [])])
+
+    def iter_objects(self, base_url, endpoint, page_size: int = None, chunk_size: int = 1 << 16):
+        """
+        Same as get_objects(), the exports are held in memory anyway.
+        """
+        yield from self.get_objects(base_url, endpoint)
@@ -0,0 +1,127 @@
+# Copyright 2020 enviPath UG & Co. KG
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import json
+import re
+from typing import Iterable, Iterator, Tuple
+
+_STRUCTURE = re.compile(rb'["{}\[\]]')
+_STRING = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+
+
+class JSONArrayScanner(object):
+    """
+    Incremental scanner for documents of the form {"key": [{...}, {...}], "other": ...}.
+    Data is fed in chunks of bytes and every object (or array) contained in a top level array is emitted as soon as
+    it is complete, together with the name of the array and its byte offsets in the document. Only the item currently
+    being scanned is buffered, hence memory usage does not depend on the size of the document.
+    Primitive values in top level arrays are skipped.
+    """
+
+    def __init__(self, keys: Iterable[str] = None):
+        """
+        :param keys: Names of the top level arrays of interest. None selects all top level arrays.
+        """
+        self.keys = set(keys) if keys is not None else None
+        self._buf = bytearray()
+        self._base = 0  # Offset of _buf[0] in the document
+        self._pos = 0
+        self._depth = 0
+        self._last_key = None
+        self._array_key = None
+        self._item_start = None
+
+    def feed(self, chunk: bytes) -> Iterator[Tuple[str, int, int, bytes]]:
+        """
+        Scans the next chunk of the document.
+        :param chunk: The bytes following the previously fed chunk.
+        :return: Iterator of (array name, start offset, end offset, raw item) for every item completed in this chunk.
+        """
+        buf = self._buf
+        buf += chunk
+        pos = self._pos
+
+        while True:
+            m = _STRUCTURE.search(buf, pos)
+            if m is None:
+                pos = len(buf)
+                break
+            i = m.start()
+            c = buf[i]
+            if c == 0x22:  # "
+                string = _STRING.match(buf, i)
+                if string is None:
+                    # The string continues in the next chunk
+                    pos = i
+                    break
+                pos = string.end()
+                if self._depth == 1:
+                    self._last_key = buf[i + 1:pos - 1].decode()
+                continue
+
+            pos = i + 1
+            if c == 0x7b or c == 0x5b:  # { [
+                self._depth += 1
+                if self._depth == 2 and c == 0x5b:
+                    if self.keys is None or self._last_key in self.keys:
+                        self._array_key = self._last_key
+                elif self._depth == 3 and self._array_key is not None:
+                    self._item_start = i
+            else:  # } ]
+                self._depth -= 1
+                if self._depth == 2 and self._item_start is not None:
+                    yield self._array_key, self._base + self._item_start, self._base + pos, \
+                        bytes(buf[self._item_start:pos])
+                    self._item_start = None
+                elif self._depth == 1:
+                    self._array_key = None
+
+        # Drop everything that is not needed anymore
+        keep = pos if self._item_start is None else min(pos, self._item_start)
+        if keep:
+            del buf[:keep]
+            self._base += keep
+            pos -= keep
+            if self._item_start is not None:
+                self._item_start -= keep
+        self._pos = pos
+
+
+def iter_array_items(chunks: Iterable[bytes], keys: Iterable[str] = None) -> Iterator[Tuple[str, int, int, bytes]]:
+    """
+    Scans a document given as chunks of bytes for items of its top level arrays.
+    :param chunks: The document, e.g. response.iter_content(chunk_size) or chunks read from a file.
+    :param keys: Names of the top level arrays of interest. None selects all top level arrays.
+    :return: Iterator of (array name, start offset, end offset, raw item).
+    """
+    scanner = JSONArrayScanner(keys)
+    for chunk in chunks:
+        if chunk:
+            yield from scanner.feed(chunk)
+
+
+def iter_json_array_items(chunks: Iterable[bytes], keys: Iterable[str] = None,
+                          decoder=json.loads) -> Iterator[Tuple[str, dict]]:
+    """
+    Same as iter_array_items but yields the decoded items.
+    :param chunks: The document, e.g. response.iter_content(chunk_size) or chunks read from a file.
+    :param keys: Names of the top level arrays of interest. None selects all top level arrays.
+    :param decoder: Function decoding the raw bytes of a single item.
+    :return: Iterator of (array name, item).
+    """
+    for key, _, _, raw in iter_array_items(chunks, keys):
+        yield key, decoder(raw)
+
@@ -14,81 +14,310 @@
 # CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
-from collections import defaultdict
-from enviPath_python.objects import Pathway, Setting
+import warnings
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Sequence, Set, Union
+
+import numpy as np
+
+from enviPath_python.batch import PredictionBatch
+from enviPath_python.graph import PathwayGraph
+from enviPath_python.objects import Package, Pathway, Setting
+
+MultiGenResult = namedtuple('MultiGenResult', 'precision, recall, tp_pred, tp_data, fp, fn, correct_nodes, '
+                                              'incorrect_nodes, false_positive_nodes, correct_edges, incorrect_edges')
+PRCurve = namedtuple('PRCurve', 'thresholds, precision, recall')
+PackageEvaluation = namedtuple('PackageEvaluation', 'micro, macro, results, predictions, failed')
+
+
+def _compare_up_to_depths(pred: PathwayGraph, data: PathwayGraph, thresholds: Sequence[int]) -> List[MultiGenResult]:
+    """
+    Compares pred against data restricted to the nodes up to each of the depth thresholds.
+    Module level to be usable within a process pool.
+    """
+    res = []
+    for threshold in thresholds:
+        res.append(MultiGenUtils.compare_pathways(
+            pred.subgraph(i for i in range(len(pred)) if pred.depths[i] <= threshold),
+            data.subgraph(i for i in range(len(data)) if data.depths[i] <= threshold)))
+    return res
 
 
 class MultiGenUtils(object):
 
     @staticmethod
-    def evaluate(pathway: Pathway, setting: Setting):
+    def evaluate(pathway: Union[Pathway, PathwayGraph], setting: Setting, prediction_package: Package,
+                 poll_interval: float = 5, timeout: float = None) -> MultiGenResult:
         """
         Takes an pathway and uses the setting to predict a pathway with the exact same root node and compares
         the resulting pathway against the provided one.
         :param pathway: The pathway that is tried to predict.
         :param setting: The setting used for prediction
-        :return:
+        :param prediction_package: The package the predicted pathway is stored in.
+        :param poll_interval: Seconds to wait between checks whether the prediction is completed.
+        :param timeout: Maximum number of seconds to wait for the prediction, None waits forever.
+        :return: The result of compare_pathways(prediction, pathway).
+        """
+        data = MultiGenUtils.to_graph(pathway)
+        pred = MultiGenUtils.predict(data, setting, prediction_package, poll_interval, timeout)
+        return MultiGenUtils.compare_pathways(pred, data)
+
+    @staticmethod
+    def root_smiles(pathway: Union[Pathway, PathwayGraph]) -> str:
+        """
+        :param pathway: The pathway or its graph.
+        :return: The SMILES of the single root node of pathway.
+        """
+        graph = MultiGenUtils.to_graph(pathway)
+        roots = graph.roots()
+        if len(roots) != 1 or not graph.smiles[roots[0]]:
+            raise ValueError("Pathway {} has no unique root with SMILES!".format(graph.pathway_id))
+        return graph.smiles[roots[0]]
+
+    @staticmethod
+    def predict(pathway: Union[Pathway, PathwayGraph], setting: Setting, prediction_package: Package,
+                poll_interval: float = 5, timeout: float = None) -> PathwayGraph:
+        """
+        Predicts a pathway for the root node of pathway and waits until the prediction is completed.
+        :param pathway: The pathway providing the root node.
+        :param setting: The setting used for prediction.
+        :param prediction_package: The package the predicted pathway is stored in.
+        :param poll_interval: Seconds to wait before the first check whether the prediction is completed.
+        :param timeout: Maximum number of seconds to wait for the prediction, None waits forever.
+        :return: Graph of the predicted pathway.
+        """
+        batch = PredictionBatch(prediction_package, setting, max_in_flight=1, poll_interval=poll_interval,
+                                timeout=timeout)
+        batch.submit(MultiGenUtils.root_smiles(pathway))
+        for prediction in batch.as_completed():
+            if prediction.has_failed():
+                raise ValueError("Prediction {} failed!".format(prediction.id))
+            return prediction.to_graph()
+        raise batch.errors[0]
+
+    @staticmethod
+    def evaluate_package(package: Package, setting: Setting, prediction_package: Package, max_workers: int = None,
+                         processes: int = None, thresholds: Sequence[int] = None, poll_interval: float = 5,
+                         timeout: float = None) -> PackageEvaluation:
+        """
+        Evaluates setting on all pathways of package. For each pathway a prediction for its root node is submitted,
+        predictions are polled to completion concurrently (see PredictionBatch) and compared against the curated
+        pathway in a process pool, each up to every depth threshold.
+        :param package: The package containing the reference pathways.
+        :param setting: The setting to evaluate.
+        :param prediction_package: The package the predicted pathways are stored in.
+        :param max_workers: Number of predictions running concurrently. Defaults to the pool size of the requester.
+        :param processes: Number of processes used for the comparison. None uses one per CPU, 0 compares in the
+         current process.
+        :param thresholds: Depth thresholds of the precision recall curves. Defaults to 1 up to the maximum depth
+         of all reference pathways.
+        :param poll_interval: Seconds to wait before the first check whether a prediction is completed.
+        :param timeout: Maximum number of seconds to wait for a single prediction, None waits forever.
+        :return: PackageEvaluation with the micro and macro averaged PRCurve, the MultiGenResult of each threshold
+         per pathway id, the predicted graph per pathway id and the exception per pathway id that could not be
+         evaluated.
+        """
+        pathways = package.get_pathways()
+        failed = package.requester.hydrate(pathways)
+        data = {}
+        for pathway in pathways:
+            if pathway.id in failed:
+                continue
+            try:
+                data[pathway.id] = pathway.to_graph()
+            except (KeyError, ValueError) as e:
+                failed[pathway.id] = e
+        if thresholds is None:
+            max_depth = max((max(g.depths, default=0) for g in data.values()), default=0)
+            thresholds = range(1, max(max_depth, 1) + 1)
+        thresholds = list(thresholds)
+
+        predictions, submitted = {}, {}
+        batch = PredictionBatch(prediction_package, setting,
+                                max_in_flight=max_workers or getattr(package.requester, 'pool_maxsize', 10),
+                                poll_interval=poll_interval, timeout=timeout)
+        for pathway_id, graph in data.items():
+            try:
+                submitted[batch.submit(MultiGenUtils.root_smiles(graph))] = pathway_id
+            except ValueError as e:
+                failed[pathway_id] = e
+        for prediction in batch.as_completed():
+            pathway_id = submitted[batch.indices[prediction.id]]
+            if prediction.has_failed():
+                failed[pathway_id] = ValueError("Prediction {} failed!".format(prediction.id))
+            else:
+                predictions[pathway_id] = prediction.to_graph()
+        for index, e in batch.errors.items():
+            failed[submitted[index]] = e
+
+        ids = [pathway_id for pathway_id in data if pathway_id in predictions]
+        args = ([predictions[i] for i in ids], [data[i] for i in ids], [thresholds] * len(ids))
+        if processes == 0:
+            compared = list(map(_compare_up_to_depths, *args))
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                compared = list(executor.map(_compare_up_to_depths, *args, chunksize=max(1, len(ids) // 64)))
+        results = dict(zip(ids, compared))
+
+        return PackageEvaluation(micro=MultiGenUtils.micro_average(results.values(), thresholds),
+                                 macro=MultiGenUtils.macro_average(results.values(), thresholds),
+                                 results=results, predictions=predictions, failed=failed)
+
+    @staticmethod
+    def micro_average(results, thresholds: Sequence[int]) -> PRCurve:
+        """
+        Computes precision and recall per threshold from the weighted counts summed over all pathways.
+        :param results: Per pathway the list of MultiGenResult, one for each threshold.
+        :param thresholds: The depth thresholds.
+        :return: The PRCurve.
+        """
+        counts = np.array([[(r.tp_pred, r.fp, r.tp_data, r.fn) for r in res] for res in results],
+                          dtype=float).reshape(-1, len(thresholds), 4).sum(axis=0)
+        tp_pred, fp, tp_data, fn = counts.T
+        with np.errstate(invalid='ignore', divide='ignore'):
+            precision = np.nan_to_num(tp_pred / (tp_pred + fp))
+            recall = np.nan_to_num(tp_data / (tp_data + fn))
+        return PRCurve(list(thresholds), precision.tolist(), recall.tolist())
+
+    @staticmethod
+    def macro_average(results, thresholds: Sequence[int]) -> PRCurve:
+        """
+        Computes precision and recall per threshold as mean over the values of the single pathways.
+        :param results: Per pathway the list of MultiGenResult, one for each threshold.
+        :param thresholds: The depth thresholds.
+        :return: The PRCurve.
         """
-        # TODO
-        pass
+        values = np.array([[(r.precision, r.recall) for r in res] for res in results],
+                          dtype=float).reshape(-1, len(thresholds), 2)
+        if len(values) == 0:
+            return PRCurve(list(thresholds), [0.0] * len(thresholds), [0.0] * len(thresholds))
+        precision, recall = values.mean(axis=0).T
+        return PRCurve(list(thresholds), precision.tolist(), recall.tolist())
 
     @staticmethod
-    def assemble_upsream(pathway: Pathway) -> dict:
+    def canonical_key(graph: PathwayGraph, i: int) -> str:
+        """
+        Key identifying the structure of a node across pathways. Uses the InChI if available, the SMILES otherwise
+        and falls back to the node id if the graph carries no structure information.
+        :param graph: The graph containing the node.
+        :param i: The index of the node.
+        :return: The key.
+        """
+        if graph.inchis[i]:
+            return graph.inchis[i]
+        if graph.smiles[i]:
+            return graph.smiles[i].strip()
+        return graph.node_ids[i]
+
+    @staticmethod
+    def to_graph(pathway: Union[Pathway, PathwayGraph]) -> PathwayGraph:
+        return pathway if isinstance(pathway, PathwayGraph) else pathway.to_graph()
+
+    @staticmethod
+    def assemble_upstream(pathway: Union[Pathway, PathwayGraph],
+                          key: Callable[[PathwayGraph, int], str] = None) -> Dict[str, Set[str]]:
+        """
+        Maps the key of each node to the keys of its direct predecessors.
+        :param pathway: The pathway or its graph.
+        :param key: Function computing the key of a node, defaults to canonical_key.
+        :return: Dictionary of node key -> set of upstream node keys.
+        """
+        graph = MultiGenUtils.to_graph(pathway)
+        key = key or MultiGenUtils.canonical_key
+        keys = [key(graph, i) for i in range(len(graph))]
         res = defaultdict(set)
-        for edge in pathway.get_edges():
-            res[edge.get_end_nodes].add(edge.get_start_nodes())
+        for i in range(len(graph)):
+            res[keys[i]].update(keys[j] for j in graph.predecessors(i))
         return res
 
     @staticmethod
-    def assemble_eval_weights(pathway: Pathway) -> defaultdict[set]:
-        res = defaultdict(lambda x: 1)
-        for node in pathway.get_nodes():
-            res[node] = 1 / 2 ** node.get_depth()
-        return res
+    def assemble_upsream(pathway: Union[Pathway, PathwayGraph],
+                         key: Callable[[PathwayGraph, int], str] = None) -> Dict[str, Set[str]]:
+        """
+        Deprecated, misspelled alias of assemble_upstream().
+        """
+        warnings.warn("assemble_upsream() is deprecated, use assemble_upstream()", DeprecationWarning, stacklevel=2)
+        return MultiGenUtils.assemble_upstream(pathway, key=key)
 
     @staticmethod
-    def compare_pathways(pred: Pathway, data: Pathway):
-        correct_ndoes = set()
-        incorrect_nodes = set()
-        correct_edges = set()
-        incorrect_edges = set()
-
-        pred_upstream = MultiGenUtils.assemble_upsream(pred)
-        pred_eval_weights = MultiGenUtils.assemble_eval_weights(pred)
-        data_upstream = MultiGenUtils.assemble_upsream(data)
-        data_eval_weights = MultiGenUtils.assemble_eval_weights(data)
-
-        tp_pred = 0.0
-        tp_data = 0.0
-        fp = 0.0
-        fn = 0.0
-
-        for node, outgoing_nodes in data_upstream.items():
-            if node in pred_upstream:
-                if node.get_depth() == 1:
-                    # No upstream nodes available as this is the root
-                    continue
-                else:
-                    if data_upstream[node].intersection(pred_upstream[node]):
-                        correct_ndoes.add(node)
-                        for edge in data.get_edges():
-                            if node in edge.get_end_nodes:
-                                correct_edges.add(edge)
-
-                        tp_pred = tp_pred + pred_eval_weights[node]
-                    else:  # No overlap
-                        # TODO duplicate
-                        fn = fn + pred_eval_weights[node]
-                        incorrect_nodes.add(node)
-                        for edge in data.get_edges():
-                            if node in edge.get_end_nodes:
-                                incorrect_edges.add(edge)
-            else:
-                # TODO duplicate
-                fn = fn + pred_eval_weights[node]
-                incorrect_nodes.add(node)
-                for edge in data.get_edges():
-                    if node in edge.get_end_nodes:
-                        incorrect_edges.add(edge)
-
-        return tp_pred, tp_data, fp, fn
+    def assemble_eval_weights(pathway: Union[Pathway, PathwayGraph]) -> np.ndarray:
+        """
+        Computes the weight of each node, halved with each level of depth.
+        :param pathway: The pathway or its graph.
+        :return: Array with the weight of each node index.
+        """
+        graph = MultiGenUtils.to_graph(pathway)
+        return 1.0 / np.power(2.0, np.frombuffer(graph.depths, dtype=np.int32))
+
+    @staticmethod
+    def _encode(graph: PathwayGraph, vocabulary: Dict[str, int], key) -> tuple:
+        """
+        Translates the graph into arrays over the shared vocabulary of node keys.
+        :return: (key index of each node, root mask, encoded (node key, predecessor key) pairs)
+        """
+        codes = np.fromiter((vocabulary.setdefault(key(graph, i), len(vocabulary)) for i in range(len(graph))),
+                            dtype=np.int64, count=len(graph))
+        indptr = np.frombuffer(graph.pred_indptr, dtype=np.int32)
+        preds = np.frombuffer(graph.pred_indices, dtype=np.int32)
+        is_root = indptr[1:] == indptr[:-1]
+        targets = np.repeat(codes, np.diff(indptr))
+        return codes, is_root, targets, codes[preds]
+
+    @staticmethod
+    def compare_pathways(pred: Union[Pathway, PathwayGraph], data: Union[Pathway, PathwayGraph],
+                         key: Callable[[PathwayGraph, int], str] = None) -> MultiGenResult:
+        """
+        Compares a predicted pathway against a reference pathway. Nodes are matched by structure (see
+        canonical_key). A non root node is correct if it is present in both pathways and shares at least one direct
+        predecessor. Each node is weighted with 1 / 2 ** depth. Correct nodes of the prediction are true positives
+        for precision, correct nodes of the reference for recall. All other non root nodes of the prediction are
+        false positives, all other non root nodes of the reference false negatives.
+        :param pred: The predicted pathway or its graph.
+        :param data: The reference pathway or its graph.
+        :param key: Function computing the key of a node, defaults to canonical_key.
+        :return: MultiGenResult with precision, recall, the weighted counts, the ids of correct, incorrect and false
+         positive nodes as well as the ids of correct and incorrect edges of the reference.
+        """
+        pred, data = MultiGenUtils.to_graph(pred), MultiGenUtils.to_graph(data)
+        key = key or MultiGenUtils.canonical_key
+
+        vocabulary = {}
+        data_codes, data_root, data_targets, data_sources = MultiGenUtils._encode(data, vocabulary, key)
+        pred_codes, pred_root, pred_targets, pred_sources = MultiGenUtils._encode(pred, vocabulary, key)
+        size = len(vocabulary)
+
+        # (node, predecessor) pairs present in both pathways
+        common_arcs = np.intersect1d(data_targets * size + data_sources, pred_targets * size + pred_sources)
+        correct = np.zeros(size, dtype=bool)
+        correct[common_arcs // size] = True
+
+        data_weights = MultiGenUtils.assemble_eval_weights(data)
+        pred_weights = MultiGenUtils.assemble_eval_weights(pred)
+        data_correct = correct[data_codes] & ~data_root
+        data_incorrect = ~correct[data_codes] & ~data_root
+        pred_correct = correct[pred_codes] & ~pred_root
+        pred_incorrect = ~correct[pred_codes] & ~pred_root
+
+        tp_data = float(data_weights[data_correct].sum())
+        fn = float(data_weights[data_incorrect].sum())
+        tp_pred = float(pred_weights[pred_correct].sum())
+        fp = float(pred_weights[pred_incorrect].sum())
+
+        # An edge of the reference is correct if one of its (end node, start node) pairs is present in both
+        edge_arcs = [(e, t, s) for e in range(data.num_edges) for t in data.edge_ends(e) for s in data.edge_starts(e)]
+        edge_correct = np.zeros(data.num_edges, dtype=bool)
+        if edge_arcs:
+            edges, ends, starts = np.array(edge_arcs, dtype=np.int64).T
+            edge_correct[edges[np.isin(data_codes[ends] * size + data_codes[starts], common_arcs)]] = True
+
+        return MultiGenResult(
+            precision=tp_pred / (tp_pred + fp) if tp_pred + fp > 0 else 0.0,
+            recall=tp_data / (tp_data + fn) if tp_data + fn > 0 else 0.0,
+            tp_pred=tp_pred, tp_data=tp_data, fp=fp, fn=fn,
+            correct_nodes={data.node_ids[i] for i in np.flatnonzero(data_correct)},
+            incorrect_nodes={data.node_ids[i] for i in np.flatnonzero(data_incorrect)},
+            false_positive_nodes={pred.node_ids[i] for i in np.flatnonzero(pred_incorrect)},
+            correct_edges={data.edge_ids[e] for e in np.flatnonzero(edge_correct)},
+            incorrect_edges={data.edge_ids[e] for e in np.flatnonzero(~edge_correct)},
+        )
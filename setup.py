@@ -18,16 +18,25 @@ setup(
     url='https://envipath.com',
     author='Tim Lorsbach',
     author_email='lorsbach@envipath.com',
+    python_requires='>=3.7',
     install_requires=[
         'requests',
     ],
+    extras_require={
+        'async': ['aiohttp'],
+        'eval': ['numpy'],
+        'otel': ['opentelemetry-api'],
+        'fast': ['orjson'],
+    },
     classifiers=[
         'Intended Audience :: Developers',
         'License :: OSI Approved :: MIT License',
         'Operating System :: OS Independent',
         'Programming Language :: Python',
-        'Programming Language :: Python :: 3.5',
-        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
         'Topic :: Internet :: WWW/HTTP',
     ],
 )
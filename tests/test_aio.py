@@ -0,0 +1,148 @@
+# Copyright 2020 enviPath UG & Co. KG
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import asyncio
+import inspect
+import json
+import warnings
+
+import pytest
+
+web = pytest.importorskip('aiohttp.web')
+
+from enviPath_python.aio import AsyncEnviPath, AsyncEnviPathRequester, AsyncObjectError
+from enviPath_python.objects import Compound, Package
+
+
+class TestAsyncEnviPath:
+
+    @staticmethod
+    def _app(n_compounds):
+        async def compounds(request):
+            base = str(request.url.origin())
+            return web.json_response({'compound': [
+                {'id': '{}/package/p/compound/{}'.format(base, i), 'name': 'c{}'.format(i)}
+                for i in range(n_compounds)
+            ]})
+
+        async def compound(request):
+            if request.match_info['cid'] == 'broken':
+                return web.Response(status=500)
+            return web.json_response({'id': str(request.url), 'name': 'c', 'description': 'loaded'})
+
+        async def empty(request):
+            return web.json_response({})
+
+        app = web.Application()
+        app.router.add_get('/package/p/compound', compounds)
+        app.router.add_get('/package/empty/compound', empty)
+        app.router.add_get('/package/p/compound/{cid}', compound)
+        return app
+
+    @staticmethod
+    def _run(app, coro_fn, **kwargs):
+        async def main():
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, '127.0.0.1', 0)
+            await site.start()
+            port = runner.addresses[0][1]
+            try:
+                async with AsyncEnviPath('http://127.0.0.1:{}'.format(port), concurrency=4, **kwargs) as eP:
+                    return await coro_fn(eP)
+            finally:
+                await runner.cleanup()
+
+        return asyncio.run(main())
+
+    def test_get_and_hydrate_compounds(self):
+        async def scenario(eP):
+            package = Package(eP.requester, id=eP.get_base_url() + 'package/p')
+            compounds = await eP.get_compounds(package)
+            failures = await eP.requester.ahydrate(compounds)
+            return compounds, failures
+
+        compounds, failures = self._run(self._app(25), scenario)
+        assert len(compounds) == 25
+        assert failures == {}
+        assert all(c.get_description() == 'loaded' for c in compounds)
+
+    def test_hydrate_reports_failures(self):
+        async def scenario(eP):
+            good = Compound(eP.requester, id=eP.get_base_url() + 'package/p/compound/1', name='good')
+            bad = Compound(eP.requester, id=eP.get_base_url() + 'package/p/compound/broken', name='bad')
+            return good, bad, await eP.requester.ahydrate([good, bad])
+
+        good, bad, failures = self._run(self._app(0), scenario)
+        assert list(failures) == [bad.get_id()]
+        assert good.loaded and not bad.loaded
+
+    def test_decoder_gets_bytes(self):
+        bodies = []
+
+        def decoder(body):
+            bodies.append(body)
+            return json.loads(body)
+
+        async def scenario(eP):
+            package = Package(eP.requester, id=eP.get_base_url() + 'package/p')
+            compounds = await eP.get_compounds(package)
+            await eP.requester.ahydrate(compounds)
+            return compounds
+
+        compounds = self._run(self._app(3), scenario, decoder=decoder)
+        assert [c.get_description() for c in compounds] == ['loaded'] * 3
+        assert len(bodies) == 4 and all(isinstance(body, bytes) for body in bodies)
+
+    def test_objects_are_read_only(self):
+        requester = AsyncEnviPathRequester()
+        compound = Compound(requester, id='http://localhost:8080/package/p/compound/1', name='c')
+        package = Package(requester, id='http://localhost:8080/package/p')
+
+        with warnings.catch_warnings():
+            # no coroutine must be left behind without being awaited
+            warnings.simplefilter('error')
+            assert compound.get_name() == 'c'
+            with pytest.raises(AsyncObjectError, match='compound/1 is not loaded'):
+                compound.get_description()
+            with pytest.raises(AsyncObjectError):
+                compound.delete()
+            with pytest.raises(AsyncObjectError):
+                package.set_description('d')
+            with pytest.raises(AsyncObjectError):
+                package.get_compounds()
+            with pytest.raises(AsyncObjectError):
+                package.add_compound('CCO')
+            with pytest.raises(AsyncObjectError):
+                compound.get_json()
+            with pytest.raises(AsyncObjectError):
+                requester.hydrate([compound])
+
+    def test_coroutines(self):
+        for name in ('aget_request', 'apost_request', 'adelete_request', 'aget_json', 'aget_objects', 'aload',
+                     'ahydrate', 'login', 'logout', 'close'):
+            assert inspect.iscoroutinefunction(getattr(AsyncEnviPathRequester, name)), name
+        for name in ('get_request', 'post_request', 'delete_request', 'get_json', 'get_objects', 'hydrate',
+                     'load_json', 'iter_objects', 'prefetch', 'invalidate'):
+            assert not inspect.iscoroutinefunction(getattr(AsyncEnviPathRequester, name)), name
+
+    def test_get_objects_logs_unexpected_response(self, caplog):
+        async def scenario(eP):
+            return await eP.get_compounds(Package(eP.requester, id=eP.get_base_url() + 'package/empty'))
+
+        with caplog.at_level('WARNING'):
+            assert self._run(self._app(0), scenario) == []
+        assert 'does not contain compound' in caplog.text
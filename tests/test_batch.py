@@ -0,0 +1,355 @@
+# Copyright 2020 enviPath UG & Co. KG
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import itertools
+import json
+import threading
+
+import pytest
+from requests import HTTPError, Response
+
+from enviPath_python import batch
+from enviPath_python.batch import PredictionBatch
+from enviPath_python.cache import CacheStats, RuleApplicationCache
+from enviPath_python.enviPath import enviPath
+from enviPath_python.objects import Package, SimpleRule
+from enviPath_python.retry import RetryPolicy
+from tests.test_requester import INSTANCE_HOST, PACKAGE_ID, FakeServer
+
+
+class PredictionServer(FakeServer):
+    """
+    Creates a prediction for each POST, each prediction is completed after `polls` GET requests. SMILES listed in
+    `failing` result in failed predictions, SMILES in `rejected` in an error response.
+    """
+
+    def __init__(self, polls=2, failing=(), rejected=()):
+        super().__init__({})
+        self.polls = polls
+        self.failing = set(failing)
+        self.rejected = set(rejected)
+        self.counter = itertools.count()
+        self.state = {}
+        self.outstanding = 0
+        self.max_outstanding = 0
+
+    def __call__(self, method, url, params=None, data=None, headers=None, **kwargs):
+        with self.lock:
+            self.calls.append((method, url))
+        if method == 'POST':
+            smiles = data['smilesinput']
+            if smiles in self.rejected:
+                result = 500, {}, {}
+            else:
+                location = '{}/pathway/{}'.format(PACKAGE_ID, next(self.counter))
+                with self.lock:
+                    self.state[location] = [smiles, 0]
+                    self.outstanding += 1
+                    self.max_outstanding = max(self.max_outstanding, self.outstanding)
+                result = 201, {}, {'Location': location}
+        else:
+            with self.lock:
+                smiles, polls = self.state[url]
+                self.state[url][1] += 1
+                completed = 'false'
+                if polls + 1 >= self.polls:
+                    completed = 'error' if smiles in self.failing else 'true'
+                    if polls + 1 == self.polls:
+                        self.outstanding -= 1
+            result = 200, {'id': url, 'completed': completed, 'pathwayName': smiles,
+                           'nodes': [{'id': url + '/node/0', 'depth': 0, 'smiles': smiles}], 'links': []}, {}
+        return FakeServer({url: lambda *args: result})(method, url, params, data, headers, **kwargs)
+
+
+class TestPredictionBatch:
+
+    @pytest.fixture
+    def package(self):
+        eP = enviPath(INSTANCE_HOST, retry=RetryPolicy(total=0))
+        return Package(eP.requester, id=PACKAGE_ID)
+
+    def test_yields_completed_pathways(self, package):
+        server = PredictionServer(polls=3)
+        package.requester.session.request = server
+
+        batch = PredictionBatch(package, max_in_flight=2, poll_interval=0)
+        smiles = ['C' * i for i in range(1, 8)]
+        for s in smiles:
+            batch.submit(s)
+        pathways = list(batch.as_completed())
+
+        assert sorted(p.get_name() for p in pathways) == smiles
+        assert all(p.is_completed() for p in pathways)
+        assert [p.get_name() for p in batch.pathways] == smiles
+        assert server.max_outstanding == 2
+        assert len([c for c in server.calls if c[0] == 'GET']) == 3 * len(smiles)
+        assert not batch.errors
+
+    def test_failed_and_rejected_predictions(self, package):
+        package.requester.session.request = PredictionServer(failing=['CC'], rejected=['CCC'])
+
+        batch = PredictionBatch(package, poll_interval=0)
+        indices = [batch.submit(s) for s in ['C', 'CC', 'CCC']]
+        pathways = {p.get_name(): p for p in batch.as_completed()}
+
+        assert set(pathways) == {'C', 'CC'}
+        assert pathways['CC'].has_failed()
+        assert list(batch.errors) == [indices[2]]
+        assert isinstance(batch.errors[indices[2]], HTTPError)
+        assert batch.pathways[indices[2]] is None
+
+    def test_timeout(self, package):
+        package.requester.session.request = PredictionServer(polls=1000)
+
+        batch = PredictionBatch(package, poll_interval=0.01, max_poll_interval=0.02, timeout=0.05)
+        batch.submit('C')
+
+        assert list(batch.as_completed()) == []
+        assert isinstance(batch.errors[0], TimeoutError)
+
+    def test_poll_interval_grows(self, package):
+        package.requester.session.request = PredictionServer(polls=1000)
+
+        batch = PredictionBatch(package, poll_interval=1, max_poll_interval=3, backoff=2)
+        batch.submit('C')
+        job = batch._queue[0]
+        batch._submit(job)
+        intervals = []
+        for _ in range(4):
+            batch._poll(job)
+            intervals.append(job.interval)
+        assert intervals == [2, 3, 3, 3]
+
+
+class RuleServer:
+    """
+    Answers APPLYRULES requests, rule r<n> appends n oxygens to the SMILES, rule 'broken' fails.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+        self.smirks = {}
+
+    def __call__(self, method, url, params=None, data=None, headers=None, **kwargs):
+        response = Response()
+        response.url = url
+        rule = url.rsplit('/', 1)[1]
+        if method == 'GET':
+            response.status_code = 200
+            response._content = json.dumps({'id': url, 'smirks': self.smirks.get(rule, '[C:1]>>[C:1]O')}).encode()
+            return response
+        with self.lock:
+            self.calls.append((url, data['compound']))
+        if rule == 'broken':
+            response.status_code = 500
+            response._content = b''
+        else:
+            response.status_code = 200
+            n = int(rule[1:])
+            response._content = ' '.join(data['compound'].strip() + 'O' * k for k in range(1, n + 1)).encode()
+        return response
+
+
+class TestApplyRules:
+
+    @pytest.fixture
+    def package(self):
+        eP = enviPath(INSTANCE_HOST, retry=RetryPolicy(total=0))
+        return Package(eP.requester, id=PACKAGE_ID)
+
+    def rule(self, package, name):
+        return SimpleRule(package.requester, id='{}/simple-rule/{}'.format(PACKAGE_ID, name), name=name)
+
+    def test_matrix(self, package):
+        server = RuleServer()
+        package.requester.session.request = server
+        rules = [self.rule(package, 'r0'), self.rule(package, 'r2'), self.rule(package, 'broken')]
+
+        res = package.apply_rules(['C', 'CC', ' C ', 'C'], rules=rules, max_workers=4)
+
+        assert res.shape == (4, 3)
+        assert len(server.calls) == 2 * 3
+        assert res.get(0, 1) == ('CO', 'COO')
+        assert res.get(2, 1) is res.get(0, 1)
+        assert res.get(1, 0) == ()
+        assert res.row(1) == {rules[1].get_id(): ('CCO', 'CCOO')}
+        assert res.column(rules[1].get_id()) == {0: ('CO', 'COO'), 1: ('CCO', 'CCOO'), 2: ('CO', 'COO'),
+                                                 3: ('CO', 'COO')}
+        assert len(res) == 4
+        assert list(res)[1] == ('CC', rules[1].get_id(), ('CCO', 'CCOO'))
+        assert set(res.errors) == {(i, 2) for i in range(4)}
+        assert all(isinstance(e, HTTPError) for e in res.errors.values())
+
+    def test_bounded_submission(self, package, monkeypatch):
+        server = RuleServer()
+        package.requester.session.request = server
+        submitted = []
+
+        class CountingExecutor(batch.ThreadPoolExecutor):
+            outstanding = 0
+            lock = threading.Lock()
+
+            def submit(self, *args, **kwargs):
+                with self.lock:
+                    CountingExecutor.outstanding += 1
+                    submitted.append(CountingExecutor.outstanding)
+                future = super().submit(*args, **kwargs)
+                future.add_done_callback(lambda f: self.done())
+                return future
+
+            def done(self):
+                with self.lock:
+                    CountingExecutor.outstanding -= 1
+
+        monkeypatch.setattr(batch, 'ThreadPoolExecutor', CountingExecutor)
+        rules = [self.rule(package, 'r0'), self.rule(package, 'r1')]
+        res = package.apply_rules(['C' * i for i in range(1, 51)], rules=rules, max_workers=2)
+
+        assert len(submitted) == 100
+        assert max(submitted) <= 2 * batch.APPLY_WINDOW
+        # rule r0 never yields products, its cells are not stored
+        assert len(res) == 50 and res.column(rules[0].get_id()) == {}
+
+    def test_apply_batch(self, package):
+        server = RuleServer()
+        package.requester.session.request = server
+
+        res = self.rule(package, 'r1').apply_batch(['C{}'.format(i % 10) for i in range(100)])
+
+        assert len(server.calls) == 10
+        assert [res.get(i, 0) for i in range(3)] == [('C0O',), ('C1O',), ('C2O',)]
+
+    def test_memoized(self, package, tmp_path):
+        server = RuleServer()
+        package.requester.session.request = server
+        package.requester.rule_cache = RuleApplicationCache(path=str(tmp_path / 'rules.sqlite'))
+        rule = self.rule(package, 'r1')
+
+        assert rule.apply_to_smiles('C') == ['CO']
+        assert rule.apply_to_smiles(' C') == ['CO']
+        assert package.apply_rules(['C', 'CC'], rules=[rule]).get(1, 0) == ('CCO',)
+        assert len(server.calls) == 2
+        assert package.requester.rule_cache.stats() == CacheStats(hits=2, misses=2, size=2)
+
+        # A new SMIRKS is a new revision of the rule
+        server.smirks['r1'] = '[C:1]>>[C:1]N'
+        package.requester.invalidate(rule.get_id())
+        rule.refresh()
+        assert rule.apply_to_smiles('C') == ['CO']
+        assert len(server.calls) == 3
+
+        # Entries are persisted and removed with the rule
+        persisted = RuleApplicationCache(path=str(tmp_path / 'rules.sqlite'))
+        assert persisted.get(rule.get_id(), '[C:1]>>[C:1]N', 'C') == ('CO',)
+        package.requester.invalidate(rule.get_id())
+        assert len(package.requester.rule_cache) == 0
+        persisted = RuleApplicationCache(path=str(tmp_path / 'rules.sqlite'))
+        assert persisted.get(rule.get_id(), '[C:1]>>[C:1]N', 'C') is None
+
+
+class TestRuleApplicationCache:
+
+    def test_lru(self):
+        cache = RuleApplicationCache(maxsize=2)
+        cache.put('r1', 'a', 'C', ['CO'])
+        cache.put('r2', 'a', 'C', [])
+        assert cache.get('r1', 'a', 'C') == ('CO',)
+        cache.put('r2', 'a', 'CC', ['CCO'])
+        assert cache.get('r2', 'a', 'C') is None
+        assert cache.get('r1', 'b', 'C') is None
+        assert cache.stats() == CacheStats(hits=1, misses=2, size=2)
+        cache.invalidate('r2')
+        assert len(cache) == 1
+        cache.invalidate('r1')
+        assert len(cache) == 0 and not cache._by_rule
+
+
+class CreateServer:
+    """
+    Answers create requests with a new Location, SMILES/SMIRKS listed in `rejected` cause a 400.
+    """
+
+    def __init__(self, rejected=()):
+        self.rejected = set(rejected)
+        self.created = []
+        self.lock = threading.Lock()
+
+    def __call__(self, method, url, params=None, data=None, headers=None, **kwargs):
+        response = Response()
+        response.url = url
+        value = data.get('compoundSmiles', data.get('smirks'))
+        if value in self.rejected:
+            response.status_code = 400
+            response._content = b''
+            return response
+        with self.lock:
+            location = '{}/{}'.format(url, len(self.created))
+            self.created.append(value)
+        response.status_code = 201
+        response._content = b''
+        response.headers['Location'] = location
+        return response
+
+
+class TestBulkCreate:
+
+    @pytest.fixture
+    def package(self):
+        eP = enviPath(INSTANCE_HOST, retry=RetryPolicy(total=0))
+        return Package(eP.requester, id=PACKAGE_ID)
+
+    def test_add_compounds(self, package):
+        server = CreateServer(rejected=['X'])
+        package.requester.session.request = server
+        records = ['C' * i for i in range(1, 6)] + ['X', {'smiles': 'CCO', 'name': 'Ethanol'}]
+
+        res = package.add_compounds(iter(records), max_workers=3, chunk_size=2)
+
+        assert len(res.ids) == 7 and res.ids[5] is None
+        assert [server.created[int(i.rsplit('/', 1)[1])] for i in res.ids if i] == records[:5] + ['CCO']
+        assert list(res.errors) == [5]
+        assert isinstance(res.errors[5], HTTPError)
+
+    def test_resume_from_checkpoint(self, package, tmp_path):
+        checkpoint = str(tmp_path / 'import.jsonl')
+        records = ['C', 'CC', 'CCC', 'CCCC']
+        package.requester.session.request = CreateServer(rejected=['CCC'])
+        first = package.add_simple_rules([{'smirks': r} for r in records], checkpoint=checkpoint)
+        assert list(first.errors) == [2]
+
+        # Simulate a crash while writing the checkpoint
+        with open(checkpoint, 'a') as f:
+            f.write('{"index": 2, "i')
+        server = CreateServer()
+        package.requester.session.request = server
+        second = package.add_simple_rules(records, checkpoint=checkpoint)
+
+        assert server.created == ['CCC']
+        assert not second.errors
+        assert second.ids[:2] == first.ids[:2] and second.ids[3] == first.ids[3]
+        assert second.ids[2].endswith('/simple-rule/0')
+
+        # Records that changed are created again
+        changed = package.add_simple_rules(['C', {'smirks': 'CC', 'name': 'x'}, 'CCC', 'CCCC'],
+                                           checkpoint=checkpoint)
+        assert server.created == ['CCC', 'CC']
+        assert changed.ids[1].endswith('/simple-rule/1') and changed.ids[2:] == second.ids[2:]
+
+        # Ids of other kinds of objects are never reused
+        reactions = package.add_reactions(records, checkpoint=checkpoint)
+        assert server.created == ['CCC', 'CC'] + records
+        assert all(i.startswith(PACKAGE_ID + '/reaction/') for i in reactions.ids)
@@ -0,0 +1,82 @@
+# Copyright 2020 enviPath UG & Co. KG
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import json
+
+import pytest
+from requests import Response
+
+from enviPath_python.enviPath import enviPath
+from enviPath_python.expansion import PathwayExpander, count_carbons
+from enviPath_python.objects import SimpleRule
+from enviPath_python.retry import RetryPolicy
+from enviPath_python.utils import MultiGenUtils
+from tests.test_requester import INSTANCE_HOST, PACKAGE_ID
+
+# rule -> SMILES -> products
+REACTIONS = {
+    'hydroxylation': {'CCCC': 'CCCCO', 'CCCCO': 'OCCCCO', 'CC': 'CCO'},
+    'cleavage': {'CCCC': 'CC.CC', 'CCCCO': 'CC.CCO', 'OCCCCO': 'OCC.CCO'},
+}
+
+
+def request(method, url, params=None, data=None, headers=None, **kwargs):
+    rule = url.rsplit('/', 1)[1]
+    response = Response()
+    response.url = url
+    response.status_code = 200
+    if method == 'GET':
+        response._content = json.dumps({'id': url, 'smirks': rule}).encode()
+    else:
+        response._content = REACTIONS[rule].get(data['compound'], '').encode()
+    return response
+
+
+class TestPathwayExpander:
+
+    @pytest.fixture
+    def rules(self):
+        eP = enviPath(INSTANCE_HOST, retry=RetryPolicy(total=0))
+        eP.requester.session.request = request
+        return [SimpleRule(eP.requester, id='{}/simple-rule/{}'.format(PACKAGE_ID, r), name=r) for r in REACTIONS]
+
+    def test_count_carbons(self):
+        assert count_carbons('CCO') == 2
+        assert count_carbons('c1ccccc1Cl') == 6
+        assert count_carbons('[13CH3][C@@H](Br)C(=O)[O-]') == 3
+        assert count_carbons('[Ca+2].[Cl-].[Cs]') == 0
+
+    def test_expand(self, rules):
+        graph = PathwayExpander(rules).expand('CCCC')
+
+        assert graph.node_ids == ['CCCC', 'CCCCO', 'CC', 'OCCCCO', 'CCO', 'OCC']
+        assert list(graph.depths) == [0, 1, 1, 2, 2, 3]
+        assert graph.roots() == [0]
+        assert graph.edge_ids[:2] == ['CCCC>>CCCCO', 'CCCC>>CC']
+        assert graph.edge_rules[1] == (rules[1].get_id(),)
+        assert [graph.node_ids[i] for i in graph.successors(1)] == ['CC', 'OCCCCO', 'CCO']
+        assert MultiGenUtils.compare_pathways(graph, graph).precision == 1.0
+
+    def test_limits(self, rules):
+        graph = PathwayExpander(rules, depth_limit=1).expand('CCCC')
+        assert graph.node_ids == ['CCCC', 'CCCCO', 'CC']
+
+        graph = PathwayExpander(rules, node_limit=4).expand('CCCC')
+        assert graph.node_ids == ['CCCC', 'CCCCO', 'CC', 'OCCCCO']
+        assert len(graph.roots()) == 1
+
+        graph = PathwayExpander(rules, min_carbon=3, terminal_smiles=['CCCCO']).expand('CCCC')
+        assert graph.node_ids == ['CCCC', 'CCCCO', 'CC']
@@ -0,0 +1,87 @@
+# Copyright 2020 enviPath UG & Co. KG
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import pytest
+
+from enviPath_python.graph import PathwayGraph
+from enviPath_python.objects import Pathway
+from enviPath_python.snapshot import SnapshotRequester
+
+PW = 'http://localhost:8080/package/p/pathway/pw'
+
+
+def node(name, depth, smiles):
+    return {'id': '{}/node/{}'.format(PW, name), 'name': name, 'depth': depth,
+            'defaultStructure': {'id': 'http://localhost:8080/package/p/compound/{0}/structure/{0}'.format(name),
+                                 'smiles': smiles}}
+
+
+def link(name, starts, ends):
+    return {'id': '{}/edge/{}'.format(PW, name), 'reactionURI': 'http://localhost:8080/package/p/reaction/' + name,
+            'startNodes': [{'id': '{}/node/{}'.format(PW, s)} for s in starts],
+            'endNodes': [{'id': '{}/node/{}'.format(PW, e)} for e in ends]}
+
+
+# a -> b -> d, a -> c -> d, c -> e
+PATHWAY = {
+    'id': PW,
+    'pathwayName': 'Test Pathway',
+    'nodes': [node('a', 0, 'CCCO'), node('b', 1, 'CCC=O'), node('c', 1, 'CC(O)C'), node('d', 2, 'CC(=O)O'),
+              node('e', 2, 'CC(C)=O')],
+    'links': [link('ab', 'a', 'b'), link('ac', 'a', 'c'), link('bd', 'b', 'd'), link('cd', 'c', 'd'),
+              link('ce', 'c', 'e')],
+}
+
+
+class TestPathwayGraph:
+
+    @pytest.fixture
+    def graph(self):
+        requester = SnapshotRequester({'id': 'http://localhost:8080/package/p', 'pathways': [PATHWAY]})
+        return Pathway(requester, id=PW).to_graph()
+
+    def idx(self, graph, name):
+        return graph.node_index['{}/node/{}'.format(PW, name)]
+
+    def names(self, graph, indices):
+        return {graph.node_ids[i].rsplit('/', 1)[1] for i in indices}
+
+    def test_structure(self, graph):
+        assert len(graph) == 5 and graph.num_edges == 5
+        assert self.names(graph, graph.successors(self.idx(graph, 'a'))) == {'b', 'c'}
+        assert self.names(graph, graph.predecessors(self.idx(graph, 'd'))) == {'b', 'c'}
+        assert list(graph.depths) == [0, 1, 1, 2, 2]
+        assert graph.smiles[self.idx(graph, 'd')] == 'CC(=O)O'
+        assert graph.edge_reactions[graph.edge_index[PW + '/edge/ce']].endswith('/reaction/ce')
+        assert self.names(graph, graph.roots()) == {'a'}
+
+    def test_queries(self, graph):
+        assert self.names(graph, graph.upstream(self.idx(graph, 'd'))) == {'a', 'b', 'c'}
+        assert self.names(graph, graph.downstream(self.idx(graph, 'c'))) == {'d', 'e'}
+        order = graph.topological_order()
+        assert all(order.index(p) < order.index(i) for i in range(len(graph)) for p in graph.predecessors(i))
+
+    def test_subgraph(self, graph):
+        sub = graph.subgraph(graph.downstream(self.idx(graph, 'c')) | {self.idx(graph, 'c')})
+        assert self.names(sub, range(len(sub))) == {'c', 'd', 'e'}
+        assert sub.num_edges == 2
+        assert list(sub.depths) == [1, 2, 2]
+
+    def test_depths_are_computed_if_missing(self):
+        graph = PathwayGraph(['a', 'b', 'c'], ['ab', 'bc'], [[0], [1]], [[1], [2]])
+        assert list(graph.depths) == [0, 1, 2]
+        with pytest.raises(ValueError):
+            PathwayGraph(['a', 'b'], ['ab', 'ba'], [[0], [1]], [[1], [0]], depths=[0, 1]).topological_order()
@@ -0,0 +1,152 @@
+# Copyright 2020 enviPath UG & Co. KG
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import io
+
+import pytest
+from requests import HTTPError
+
+from enviPath_python.enviPath import enviPath
+from enviPath_python.instrumentation import ImplicitLoadError, LazyLoadProfiler, LazyLoadWarning, \
+    OpenTelemetryExporter, RequestStats, _percentile, url_template
+from enviPath_python.objects import Compound, Package
+from enviPath_python.retry import RetryPolicy
+from tests.test_requester import INSTANCE_HOST, PACKAGE_ID, FakeServer, compound_routes
+
+
+class TestInstrumentation:
+
+    @pytest.fixture
+    def eP(self):
+        eP = enviPath(INSTANCE_HOST, retry=RetryPolicy(total=0))
+        routes = compound_routes(12)
+        routes[PACKAGE_ID + '/compound/11'] = (500, {})
+        eP.requester.session.request = FakeServer(routes)
+        return eP
+
+    def test_url_template(self):
+        assert url_template('https://envipath.org/package/32de3cf4-e3e6-4168-956e-32fa5ddb0ce1/compound/'
+                            'a1b5c0e0-4e46-4b8a-9a1f-5d7b2e7e1c11/structure/3') == \
+            '/package/{id}/compound/{id}/structure/{id}'
+        assert url_template(INSTANCE_HOST) == '/'
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        assert [_percentile(values, q) for q in (50, 95, 99, 100)] == [50, 95, 99, 100]
+        assert _percentile(list(range(1, 11)), 50) == 5
+        assert _percentile(list(range(1, 11)), 0) == 1
+        assert _percentile([7], 99) == 7
+        assert _percentile([], 50) == 0.0
+
+    def test_events_and_report(self, eP):
+        stats = RequestStats(hotspot_threshold=5)
+        eP.requester.add_observer(stats)
+
+        compounds = Package(eP.requester, id=PACKAGE_ID).get_compounds()
+        for c in compounds[:11]:
+            c.get_description()
+        with pytest.raises(HTTPError):
+            compounds[11].get_description()
+        eP.requester.post_request(PACKAGE_ID + '/compound/0', payload={'compoundName': 'x'})
+
+        listing, first = stats.events[:2]
+        assert listing.origin_type is None and listing.url_template == '/package/p/compound'
+        assert first.method == 'GET' and first.status == 200 and first.error is None
+        assert first.url_template == '/package/p/compound/{id}'
+        assert (first.origin_type, first.origin_field) == ('Compound', 'description') and first.lazy
+        assert first.bytes_in == len(b'{"id": "http://localhost:8080/package/p/compound/0", "name": "c0", '
+                                     b'"description": "d0"}')
+        assert stats.events[12].status == 500 and isinstance(stats.events[12].error, HTTPError)
+        assert stats.events[13].bytes_out == len('compoundName=x')
+
+        summary = stats.summary()
+        assert summary['GET /package/p/compound/{id}']['count'] == 12
+        assert summary['GET /package/p/compound/{id}']['errors'] == 1
+        assert stats.hotspots() == [('Compound', 'description', 12)]
+
+        out = io.StringIO()
+        stats.print_report(file=out)
+        assert 'Compound.description: 12 requests' in out.getvalue()
+
+        eP.requester.remove_observer(stats)
+        compounds[0].get_name()
+        assert len(stats.events) == 14
+
+    def test_hydrate_origin(self, eP):
+        stats = RequestStats()
+        eP.requester.add_observer(stats)
+        eP.requester.hydrate(Package(eP.requester, id=PACKAGE_ID).get_compounds()[:3])
+        assert {(e.origin_type, e.origin_field, e.lazy) for e in stats.events[1:]} == {('Compound', None, False)}
+
+    def test_bulk_loads_are_no_hotspots(self, eP):
+        stats = RequestStats(hotspot_threshold=5)
+        eP.requester.add_observer(stats)
+        compounds = Package(eP.requester, id=PACKAGE_ID).get_compounds()[:11]
+        eP.requester.prefetch(compounds, 'structures')
+        assert len(stats.events) == 12
+        assert stats.hotspots() == []
+        assert 'hotspots' not in stats.report()
+
+    def test_opentelemetry(self, eP):
+        pytest.importorskip('opentelemetry.sdk')
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+        from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+        exporter = InMemorySpanExporter()
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+        eP.requester.add_observer(OpenTelemetryExporter(provider.get_tracer('test')))
+
+        Compound(eP.requester, id=PACKAGE_ID + '/compound/0').get_description()
+        with pytest.raises(HTTPError):
+            Compound(eP.requester, id=PACKAGE_ID + '/compound/11').get_description()
+
+        spans = exporter.get_finished_spans()
+        assert [s.name for s in spans] == ['GET /package/p/compound/{id}'] * 2
+        assert spans[0].attributes['http.status_code'] == 200
+        assert spans[0].attributes['envipath.origin'] == 'Compound.description'
+        assert spans[0].status.status_code.name == 'UNSET'
+        assert spans[1].status.status_code.name == 'ERROR'
+        assert spans[0].end_time >= spans[0].start_time
+
+    def test_lazy_load_profiler(self, eP):
+        compounds = Package(eP.requester, id=PACKAGE_ID).get_compounds()[:6]
+        with pytest.warns(LazyLoadWarning, match='5 lazy loads of Compound.description'):
+            with LazyLoadProfiler(threshold=5) as profiler:
+                for c in compounds:
+                    c.get_description()
+        [(key, count)] = profiler.counts.items()
+        assert count == 6
+        assert key[:2] == ('Compound', 'description')
+        assert key[2].startswith(__file__) and key[2].endswith('(test_lazy_load_profiler)')
+        assert 'Compound.description' in profiler.report()
+
+        # stopped profilers do not record anything
+        Compound(eP.requester, id=PACKAGE_ID + '/compound/7').get_description()
+        assert sum(profiler.counts.values()) == 6
+
+    def test_lazy_load_profiler_strict(self, eP):
+        server = eP.requester.session.request
+        Compound(eP.requester, id=PACKAGE_ID + '/compound/0').get_description()
+        calls = len(server.calls)
+        with LazyLoadProfiler(strict=True) as profiler:
+            # answered from the identity map
+            assert Compound(eP.requester, id=PACKAGE_ID + '/compound/0').get_description() == 'd0'
+            with pytest.raises(ImplicitLoadError, match='Compound.description'):
+                Compound(eP.requester, id=PACKAGE_ID + '/compound/1').get_description()
+        assert len(server.calls) == calls
+        assert sum(profiler.counts.values()) == 1
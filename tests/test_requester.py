@@ -0,0 +1,497 @@
+# Copyright 2020 enviPath UG & Co. KG
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import io
+import json
+import threading
+import time
+
+import pytest
+from requests import ConnectionError, HTTPError, Response
+
+from enviPath_python.cache import ResponseCache
+from enviPath_python.decoding import DECODERS, get_decoder
+from enviPath_python.enviPath import enviPath
+from enviPath_python.objects import Compound, Package, ParallelCompositeRule, Pathway, Rule, SimpleRule
+from enviPath_python.retry import RetryPolicy, TokenBucket
+
+INSTANCE_HOST = 'http://localhost:8080/'
+PACKAGE_ID = INSTANCE_HOST + 'package/p'
+
+
+class FakeServer:
+    """
+    Replaces session.request of a requester and answers from a dictionary mapping url -> (status, json) or
+    url -> callable(method, url, params, headers) returning (status, json, response_headers).
+    """
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, method, url, params=None, data=None, headers=None, **kwargs):
+        with self.lock:
+            self.calls.append((method, url))
+        route = self.routes.get(url, (404, {}))
+        status, body, response_headers = route(method, url, params, headers) if callable(route) else route + ({},)
+        response = Response()
+        response.status_code = status
+        response.url = url
+        response._content = json.dumps(body).encode()
+        response.raw = io.BytesIO(response._content)
+        response.headers['Content-Type'] = 'application/json'
+        response.headers.update(response_headers)
+        return response
+
+
+def compound_routes(n):
+    routes = {
+        PACKAGE_ID + '/compound': (200, {'compound': [
+            {'id': '{}/compound/{}'.format(PACKAGE_ID, i), 'name': 'c{}'.format(i)} for i in range(n)
+        ]}),
+    }
+    for i in range(n):
+        cid = '{}/compound/{}'.format(PACKAGE_ID, i)
+        routes[cid] = (200, {'id': cid, 'name': 'c{}'.format(i), 'description': 'd{}'.format(i)})
+    return routes
+
+
+class TestRequester:
+
+    @pytest.fixture
+    def eP(self):
+        return enviPath(INSTANCE_HOST, retry=RetryPolicy(total=0))
+
+    def test_hydrate_loads_all_objects(self, eP):
+        server = FakeServer(compound_routes(20))
+        eP.requester.session.request = server
+
+        compounds = Package(eP.requester, id=PACKAGE_ID).get_compounds(hydrate=True)
+
+        assert len(server.calls) == 21
+        assert all(c.loaded for c in compounds)
+        assert [c.get_description() for c in compounds] == ['d{}'.format(i) for i in range(20)]
+        assert len(server.calls) == 21
+
+    def test_hydrate_reports_failures(self, eP):
+        routes = compound_routes(2)
+        routes[PACKAGE_ID + '/compound/1'] = (500, {})
+        eP.requester.session.request = FakeServer(routes)
+
+        good = Compound(eP.requester, id=PACKAGE_ID + '/compound/0')
+        bad = Compound(eP.requester, id=PACKAGE_ID + '/compound/1')
+        failures = eP.requester.hydrate([good, bad], max_workers=2)
+
+        assert list(failures) == [bad.get_id()]
+        assert isinstance(failures[bad.get_id()], HTTPError)
+        assert good.loaded and not bad.loaded
+
+    def test_get_objects_hydrate_logs_failures(self, eP, caplog):
+        routes = compound_routes(2)
+        routes[PACKAGE_ID + '/compound/1'] = (500, {})
+        eP.requester.session.request = FakeServer(routes)
+
+        with caplog.at_level('WARNING'):
+            good, bad = Package(eP.requester, id=PACKAGE_ID).get_compounds(hydrate=True)
+
+        assert good.loaded and not bad.loaded
+        assert 'Could not load {}'.format(bad.get_id()) in caplog.text
+
+    def test_identity_map_shares_loaded_state(self, eP):
+        server = FakeServer(compound_routes(1))
+        eP.requester.session.request = server
+
+        cid = PACKAGE_ID + '/compound/0'
+        assert Compound(eP.requester, id=cid).get_description() == 'd0'
+        assert Compound(eP.requester, id=cid).get_description() == 'd0'
+        assert server.calls == [('GET', cid)]
+
+        eP.requester.invalidate(cid)
+        assert Compound(eP.requester, id=cid).get_description() == 'd0'
+        assert server.calls == [('GET', cid), ('GET', cid)]
+
+    def test_identity_map_is_bounded(self):
+        eP = enviPath(INSTANCE_HOST, identity_map_size=2)
+        server = FakeServer(compound_routes(3))
+        eP.requester.session.request = server
+
+        for i in [0, 1, 2, 0]:
+            Compound(eP.requester, id='{}/compound/{}'.format(PACKAGE_ID, i)).get_description()
+
+        assert len(eP.requester.identity_map) == 2
+        # compound 0 was evicted by compound 2 and fetched again
+        assert len(server.calls) == 4
+
+    def test_cache_serves_fresh_responses_within_ttl(self, tmp_path):
+        cache = ResponseCache(str(tmp_path / 'cache.sqlite'), ttl=60)
+        eP = enviPath(INSTANCE_HOST, identity_map_size=0, cache=cache)
+        server = FakeServer(compound_routes(1))
+        eP.requester.session.request = server
+
+        cid = PACKAGE_ID + '/compound/0'
+        assert eP.requester.get_json(cid)['description'] == 'd0'
+        assert eP.requester.get_json(cid)['description'] == 'd0'
+        assert len(server.calls) == 1
+
+        cache.ttl = 0
+        eP.requester.get_json(cid)
+        assert len(server.calls) == 2
+
+    def test_cache_revalidates_with_etag(self, tmp_path):
+        cid = PACKAGE_ID + '/compound/0'
+
+        def compound(method, url, params, headers):
+            if headers.get('If-None-Match') == '"v1"':
+                return 304, {}, {}
+            return 200, {'id': cid, 'description': 'd0'}, {'ETag': '"v1"'}
+
+        cache = ResponseCache(str(tmp_path / 'cache.sqlite'))
+        eP = enviPath(INSTANCE_HOST, cache=cache)
+        server = FakeServer({cid: compound})
+        eP.requester.session.request = server
+
+        first = eP.requester.get_request(cid)
+        second = eP.requester.get_request(cid)
+
+        assert not getattr(first, 'from_cache', False)
+        assert second.from_cache
+        assert second.json() == {'id': cid, 'description': 'd0'}
+        assert len(server.calls) == 2
+
+    def test_cache_invalidates_collections_on_create(self, tmp_path):
+        listing = [{'id': PACKAGE_ID + '/compound/0', 'name': 'c0'}]
+
+        def compounds(method, url, params, headers):
+            if method == 'POST':
+                listing.append({'id': '{}/compound/{}'.format(PACKAGE_ID, len(listing)), 'name': 'new'})
+                return 201, {}, {'Location': listing[-1]['id']}
+            return 200, {'compound': list(listing)}, {}
+
+        cache = ResponseCache(str(tmp_path / 'cache.sqlite'), ttl=3600)
+        eP = enviPath(INSTANCE_HOST, cache=cache)
+        eP.requester.session.request = FakeServer({PACKAGE_ID + '/compound': compounds})
+        package = Package(eP.requester, id=PACKAGE_ID)
+
+        assert len(package.get_compounds()) == 1
+        package.add_compound('CCO')
+        assert len(package.get_compounds()) == 2
+        package.add_compounds(['CCC', 'CCCC'])
+        assert len(package.get_compounds()) == 4
+
+        # A url sharing a prefix but not lying below the invalidated one is kept
+        cache.invalidate(PACKAGE_ID + '/comp')
+        assert len(cache) == 1
+
+    def test_cache_is_scoped_by_login(self, tmp_path):
+        cid = PACKAGE_ID + '/compound/0'
+        session = {'user': 'anonymous'}
+
+        def login(method, url, params, headers):
+            return 200, {}, {}
+
+        def compound(method, url, params, headers):
+            return 200, {'id': cid, 'description': 'seen by ' + session['user']}, {}
+
+        def user(method, url, params, headers):
+            return 200, {'user': [{'id': INSTANCE_HOST + 'user/' + session['user'], 'name': session['user']}]}, {}
+
+        eP = enviPath(INSTANCE_HOST, cache=ResponseCache(str(tmp_path / 'cache.sqlite'), ttl=60))
+        server = FakeServer({INSTANCE_HOST: login, cid: compound, INSTANCE_HOST + 'user': user})
+        eP.requester.session.request = server
+
+        assert eP.who_am_i().get_name() == 'anonymous'
+        assert Compound(eP.requester, id=cid).get_description() == 'seen by anonymous'
+        eP.login('alice', 'secret')
+        session['user'] = 'alice'
+        assert eP.who_am_i().get_name() == 'alice'
+        assert Compound(eP.requester, id=cid).get_description() == 'seen by alice'
+
+        eP.logout()
+        session['user'] = 'anonymous'
+        calls = len(server.calls)
+        # served from the cache again
+        assert Compound(eP.requester, id=cid).get_description() == 'seen by anonymous'
+        assert len(server.calls) == calls
+
+    def test_offline_mode_serves_from_cache_only(self, tmp_path):
+        path = str(tmp_path / 'cache.sqlite')
+        cid = PACKAGE_ID + '/compound/0'
+        online = enviPath(INSTANCE_HOST, cache=ResponseCache(path))
+        online.requester.session.request = FakeServer(compound_routes(1))
+        online.requester.get_json(cid)
+
+        offline = enviPath(INSTANCE_HOST, cache=ResponseCache(path), offline=True)
+        server = FakeServer({})
+        offline.requester.session.request = server
+
+        assert offline.requester.get_json(cid)['description'] == 'd0'
+        with pytest.raises(ConnectionError):
+            offline.requester.get_json(PACKAGE_ID + '/compound/1')
+        assert server.calls == []
+
+    def test_retries_honor_retry_after(self, monkeypatch):
+        sleeps = []
+        monkeypatch.setattr('enviPath_python.enviPath.time.sleep', sleeps.append)
+        cid = PACKAGE_ID + '/compound/0'
+        responses = [(503, {}, {'Retry-After': '7'}), (502, {}, {}), (200, {'id': cid}, {})]
+        server = FakeServer({cid: lambda *args: responses.pop(0)})
+        eP = enviPath(INSTANCE_HOST, retry=RetryPolicy(total=3, backoff_factor=1, jitter=0))
+        eP.requester.session.request = server
+
+        assert eP.requester.get_json(cid) == {'id': cid}
+        assert sleeps == [7, 2]
+        assert eP.requester.retry_counts == {'retries': 2, 'status_503': 1, 'status_502': 1}
+
+    def test_retries_connection_errors_of_get_only(self, monkeypatch):
+        monkeypatch.setattr('enviPath_python.enviPath.time.sleep', lambda s: None)
+        calls = []
+
+        def failing(method, url, **kwargs):
+            calls.append(method)
+            raise ConnectionError('reset')
+
+        eP = enviPath(INSTANCE_HOST, retry=RetryPolicy(total=2))
+        eP.requester.session.request = failing
+
+        with pytest.raises(ConnectionError):
+            eP.requester.get_request(PACKAGE_ID)
+        with pytest.raises(ConnectionError):
+            eP.requester.post_request(PACKAGE_ID)
+        assert calls == ['GET', 'GET', 'GET', 'POST']
+        assert eP.requester.retry_counts['connection_error'] == 2
+
+    def test_token_bucket_limits_rate(self):
+        bucket = TokenBucket(rate=100, capacity=1)
+        start = time.monotonic()
+        for _ in range(11):
+            bucket.acquire()
+        assert time.monotonic() - start >= 0.09
+
+    def test_pool_and_timeout_options(self):
+        eP = enviPath(INSTANCE_HOST, pool_connections=4, pool_maxsize=32, pool_block=True, timeout=5)
+        adapter = eP.requester.session.get_adapter(INSTANCE_HOST)
+        assert adapter._pool_connections == 4
+        assert adapter._pool_maxsize == 32
+        assert adapter._pool_block
+
+        timeouts = []
+
+        def request(method, url, timeout=None, **kwargs):
+            timeouts.append(timeout)
+            return FakeServer(compound_routes(1))(method, url, **kwargs)
+
+        eP.requester.session.request = request
+        eP.requester.get_request(PACKAGE_ID + '/compound/0')
+        eP.requester.get_request(PACKAGE_ID + '/compound/0', timeout=60)
+        assert timeouts == [5, 60]
+
+    def test_refresh_merges_changes(self, eP):
+        pid = PACKAGE_ID + '/pathway/0'
+        state = {'id': pid, 'pathwayName': 'p', 'completed': 'false', 'lastModified': 1000}
+        conditional = []
+
+        def pathway(method, url, params, headers):
+            conditional.append(headers.get('If-Modified-Since'))
+            if headers.get('If-Modified-Since') and state['lastModified'] == 1000:
+                return 304, {}, {}
+            return 200, dict(state), {}
+
+        eP.requester.session.request = FakeServer({pid: pathway})
+
+        p = Pathway(eP.requester, id=pid)
+        assert not p.is_completed()
+        assert p.refresh() == []
+        state.update(completed='true', lastModified=2000)
+        assert sorted(p.refresh()) == ['completed', 'lastModified']
+        assert p.is_completed()
+        assert conditional == [None, 'Thu, 01 Jan 1970 00:00:01 GMT', 'Thu, 01 Jan 1970 00:00:01 GMT']
+        # Other objects of the same id see the new state without a request
+        assert Pathway(eP.requester, id=pid).is_completed()
+        assert len(conditional) == 3
+
+        state.update(pathwayName='q', completed='false', lastModified=3000)
+        assert p.refresh(fields=['pathwayName'], if_modified=False) == ['pathwayName']
+        assert p.get_name() == 'q' and p.is_completed()
+        assert conditional[-1] is None
+
+    def test_refresh_server_ignoring_if_modified_since(self, eP):
+        pid = PACKAGE_ID + '/pathway/0'
+        state = {'id': pid, 'completed': 'false', 'lastModified': 'not a date'}
+        conditional = []
+
+        def pathway(method, url, params, headers):
+            conditional.append(headers.get('If-Modified-Since'))
+            return 200, dict(state), {}
+
+        eP.requester.session.request = FakeServer({pid: pathway})
+        p = Pathway(eP.requester, id=pid)
+        assert not p.is_completed()
+        # lastModified is not updated by the server, the body is merged anyway
+        state['completed'] = 'true'
+        assert p.refresh() == ['completed']
+        assert p.is_completed()
+        # Invalid dates are not sent
+        assert conditional == [None, None]
+
+    def test_http_date(self):
+        assert Pathway._http_date(1000) == 'Thu, 01 Jan 1970 00:00:01 GMT'
+        assert Pathway._http_date('1000') == 'Thu, 01 Jan 1970 00:00:01 GMT'
+        assert Pathway._http_date('Thu, 01 Jan 1970 00:00:02 GMT') == 'Thu, 01 Jan 1970 00:00:02 GMT'
+        assert Pathway._http_date('1970-01-01T00:00:03Z') == 'Thu, 01 Jan 1970 00:00:03 GMT'
+        assert Pathway._http_date('yesterday') is None
+        assert Pathway._http_date(None) is None
+
+    def test_objects_share_json_with_identity_map(self, eP):
+        server = FakeServer(compound_routes(1))
+        eP.requester.session.request = server
+
+        cid = PACKAGE_ID + '/compound/0'
+        compound = Compound(eP.requester, id=cid, name='c0')
+        assert not hasattr(compound, '__dict__')
+        assert compound.get_name() == 'c0' and not compound.loaded
+        assert compound.get_description() == 'd0'
+        assert compound._fields is eP.requester.identity_map.get(cid)
+        assert compound.description == 'd0'
+        with pytest.raises(AttributeError):
+            compound.unknown
+
+        compound._set('description', 'changed')
+        assert compound.get_description() == 'changed'
+        assert eP.requester.identity_map.get(cid)['description'] == 'd0'
+
+    def test_iter_objects_streams_collection(self, eP):
+        server = FakeServer(compound_routes(5))
+        eP.requester.session.request = server
+
+        compounds = Package(eP.requester, id=PACKAGE_ID).iter_compounds()
+        assert next(compounds).get_name() == 'c0'
+        assert [c.get_name() for c in compounds] == ['c1', 'c2', 'c3', 'c4']
+        assert server.calls == [('GET', PACKAGE_ID + '/compound')]
+
+    @pytest.mark.parametrize('page_size, pages', [(2, 3), (5, 2), (10, 1)])
+    def test_iter_objects_pages(self, eP, page_size, pages):
+        items = compound_routes(5)[PACKAGE_ID + '/compound'][1]['compound']
+        requested = []
+
+        def collection(method, url, params, headers):
+            requested.append(params)
+            start = params['page'] * params['pageSize']
+            return 200, {'compound': items[start:start + params['pageSize']]}, {}
+
+        eP.requester.session.request = FakeServer({PACKAGE_ID + '/compound': collection})
+
+        names = [c.get_name() for c in Package(eP.requester, id=PACKAGE_ID).iter_compounds(page_size=page_size)]
+        assert names == ['c{}'.format(i) for i in range(5)]
+        assert len(requested) == pages
+
+    def test_iter_objects_paging_ignored(self, eP):
+        server = FakeServer(compound_routes(5))
+        eP.requester.session.request = server
+
+        assert len(list(Package(eP.requester, id=PACKAGE_ID).iter_compounds(page_size=2))) == 5
+        assert len(list(Package(eP.requester, id=PACKAGE_ID).iter_compounds(page_size=5))) == 5
+        assert len(server.calls) == 3
+
+    def test_rule_types(self, eP, caplog):
+        rules = [{'id': PACKAGE_ID + '/simple-rule/0', 'name': 's', 'identifier': 'simple-rule'},
+                 {'id': PACKAGE_ID + '/rule/1', 'name': 'x', 'identifier': 'unknown-rule'},
+                 {'id': PACKAGE_ID + '/parallel-rule/2', 'name': 'p', 'identifier': 'parallel-rule'}]
+        eP.requester.session.request = FakeServer({PACKAGE_ID + '/rule': (200, {'rule': rules})})
+
+        with caplog.at_level('WARNING'):
+            res = Package(eP.requester, id=PACKAGE_ID).get_rules()
+
+        assert [type(r) for r in res] == [SimpleRule, ParallelCompositeRule]
+        assert [r.get_name() for r in res] == ['s', 'p']
+        assert 'unknown-rule' in caplog.text
+        assert Rule.get_rule_type(rules[2]) is ParallelCompositeRule
+        with pytest.raises(ValueError):
+            Rule.get_rule_type(rules[1])
+
+    def test_prefetch(self, eP):
+        pw = PACKAGE_ID + '/pathway/pw'
+        rule = {'id': PACKAGE_ID + '/sequential-rule/r', 'name': 'r', 'identifier': 'sequential-rule'}
+        routes = {
+            pw: (200, {'id': pw, 'name': 'pw',
+                       'nodes': [{'id': pw + '/node/{}'.format(i), 'defaultStructure': {'id': 's{}'.format(i)}}
+                                 for i in range(3)],
+                       'links': [{'id': pw + '/edge/{}'.format(i), 'name': 'e{}'.format(i)} for i in range(2)]}),
+            PACKAGE_ID + '/reaction/x': (200, {'id': PACKAGE_ID + '/reaction/x', 'rules': [rule]}),
+            rule['id']: (200, dict(rule, simpleRules=[{'id': PACKAGE_ID + '/simple-rule/s', 'name': 's'}])),
+            PACKAGE_ID + '/simple-rule/s': (200, {'id': PACKAGE_ID + '/simple-rule/s', 'smirks': 'C>>O'}),
+        }
+        for i in range(3):
+            routes[pw + '/node/{}'.format(i)] = (200, {'id': pw + '/node/{}'.format(i),
+                                                       'defaultStructure': {'id': 's{}'.format(i)}})
+            routes['s{}'.format(i)] = (200, {'id': 's{}'.format(i), 'smiles': 'C' * (i + 1)})
+        for i in range(2):
+            # both edges share the same reaction
+            routes[pw + '/edge/{}'.format(i)] = (200, {'id': pw + '/edge/{}'.format(i),
+                                                       'reactionURI': PACKAGE_ID + '/reaction/x'})
+        routes['s2'] = (500, {})
+        server = FakeServer(routes)
+        eP.requester.session.request = server
+
+        pathway = Pathway(eP.requester, id=pw)
+        failures = pathway.prefetch('links.reaction.rules.simpleRules', 'nodes.defaultStructure', 'links.missing')
+
+        assert list(failures) == ['s2']
+        assert sorted(server.calls) == sorted(('GET', url) for url in routes)
+        server.calls.clear()
+
+        assert [n.get_smiles() for n in pathway.get_nodes()[:2]] == ['C', 'CC']
+        rules = [e.get_rule() for e in pathway.get_edges()]
+        assert [r.get_id() for r in rules] == [rule['id']] * 2
+        assert [r.get_smirks() for r in rules[0].get_simple_rules()] == ['C>>O']
+        assert server.calls == []
+
+    def test_decoder(self):
+        assert get_decoder('json') is json.loads
+        assert get_decoder() is DECODERS[next(n for n in ('orjson', 'ujson', 'json') if n in DECODERS)]
+        with pytest.raises(ValueError):
+            get_decoder('yaml')
+
+        decoded = []
+
+        def decoder(body):
+            decoded.append(body)
+            return json.loads(body)
+
+        eP = enviPath(INSTANCE_HOST, decoder=decoder)
+        eP.requester.session.request = FakeServer(compound_routes(3))
+        compounds = Package(eP.requester, id=PACKAGE_ID).get_compounds()
+        assert [c.get_description() for c in compounds] == ['d0', 'd1', 'd2']
+        assert list(Package(eP.requester, id=PACKAGE_ID).iter_compounds()) == compounds
+        assert len(decoded) == 4 + 3 and all(isinstance(body, bytes) for body in decoded)
+
+    def test_prefetch_warns_if_identity_map_is_too_small(self, caplog):
+        eP = enviPath(INSTANCE_HOST, identity_map_size=2)
+        routes = compound_routes(3)
+        pw = PACKAGE_ID + '/pathway/pw'
+        routes[pw] = (200, {'id': pw, 'nodes': [{'id': '{}/compound/{}'.format(PACKAGE_ID, i)} for i in range(3)]})
+        eP.requester.session.request = FakeServer(routes)
+
+        with caplog.at_level('WARNING'):
+            assert Pathway(eP.requester, id=pw).prefetch('nodes') == {}
+        assert 'Prefetched 3 objects, but the identity map holds only 2' in caplog.text
+
+        caplog.clear()
+        with caplog.at_level('WARNING'):
+            eP = enviPath(INSTANCE_HOST)
+            eP.requester.session.request = FakeServer(routes)
+            Pathway(eP.requester, id=pw).prefetch('nodes')
+        assert 'identity map' not in caplog.text
@@ -0,0 +1,120 @@
+# Copyright 2020 enviPath UG & Co. KG
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import json
+
+import pytest
+
+from enviPath_python.enviPath import BaseRequester, enviPath
+from enviPath_python.objects import Compound, Package, SimpleRule
+from enviPath_python.snapshot import PackageSnapshot, SnapshotError, SnapshotReadOnlyError, SnapshotRequester
+
+PACKAGE_ID = 'http://localhost:8080/package/p'
+
+EXPORT = {
+    'id': PACKAGE_ID,
+    'name': 'Snapshot Package',
+    'compounds': [
+        {'id': PACKAGE_ID + '/compound/c1', 'name': 'Ethanol',
+         'structures': [{'id': PACKAGE_ID + '/compound/c1/structure/s1', 'smiles': 'CCO', 'isDefaultStructure': True}]},
+        {'id': PACKAGE_ID + '/compound/c2', 'name': 'Acetaldehyde',
+         'structures': [{'id': PACKAGE_ID + '/compound/c2/structure/s2', 'smiles': 'CC=O',
+                         'isDefaultStructure': True}]},
+    ],
+    'reactions': [],
+    'rules': [{'id': PACKAGE_ID + '/simple-rule/r1', 'identifier': 'simple-rule', 'smirks': '[C:1]O>>[C:1]=O'}],
+    'pathways': [
+        {'id': PACKAGE_ID + '/pathway/pw1', 'name': 'Ethanol degradation',
+         'nodes': [{'id': PACKAGE_ID + '/pathway/pw1/node/n1', 'depth': 0,
+                    'defaultStructure': {'id': PACKAGE_ID + '/compound/c1/structure/s1'}}],
+         'links': []},
+    ],
+}
+
+
+class TestPackageSnapshot:
+
+    @pytest.fixture
+    def path(self, tmp_path):
+        path = str(tmp_path / 'export.json')
+        with open(path, 'w') as f:
+            json.dump(EXPORT, f, indent=1)
+        return path
+
+    def test_lookup(self, path):
+        with PackageSnapshot.open(path) as snapshot:
+            assert snapshot.ids('compounds') == [c['id'] for c in EXPORT['compounds']]
+            assert snapshot.get(PACKAGE_ID + '/pathway/pw1') == EXPORT['pathways'][0]
+            assert json.loads(snapshot.get_raw(PACKAGE_ID + '/compound/c2')) == EXPORT['compounds'][1]
+            # nested objects resolve to their most complete representation
+            assert snapshot.get(PACKAGE_ID + '/compound/c1/structure/s1')['smiles'] == 'CCO'
+            assert snapshot.get(PACKAGE_ID + '/pathway/pw1/node/n1')['depth'] == 0
+            assert list(snapshot.iter_items('rules')) == EXPORT['rules']
+            with pytest.raises(KeyError):
+                snapshot.get(PACKAGE_ID + '/compound/unknown')
+
+    def test_index_is_reused_until_export_changes(self, path, monkeypatch):
+        PackageSnapshot.open(path).close()
+
+        def fail(mm):
+            raise AssertionError("index rebuilt")
+
+        monkeypatch.setattr(PackageSnapshot, '_build_index', classmethod(lambda cls, mm: fail(mm)))
+        with PackageSnapshot.open(path) as snapshot:
+            assert PACKAGE_ID + '/compound/c1' in snapshot
+
+        with open(path, 'a') as f:
+            f.write('\n')
+        with pytest.raises(AssertionError):
+            PackageSnapshot.open(path)
+
+
+class TestSnapshotRequester:
+
+    @pytest.fixture
+    def eP(self):
+        return enviPath('http://localhost:8080/', requester=SnapshotRequester(EXPORT))
+
+    def test_objects_are_served_offline(self, eP):
+        package = eP.get_package(PACKAGE_ID)
+        assert package.get_name() == 'Snapshot Package'
+
+        compounds = package.get_compounds()
+        assert [c.get_smiles() for c in compounds] == ['CCO', 'CC=O']
+        assert list(package.iter_compounds(page_size=1)) == compounds
+
+        rules = eP.get_rules()
+        assert type(rules[0]) == SimpleRule
+        assert rules[0].get_smirks() == '[C:1]O>>[C:1]=O'
+
+        node = package.get_pathways()[0].get_nodes()[0]
+        assert node.get_depth() == 0
+        assert node.get_smiles() == 'CCO'
+
+    def test_writes_fail(self, eP):
+        package = Package(eP.requester, id=PACKAGE_ID)
+        with pytest.raises(SnapshotReadOnlyError):
+            package.add_compound('CCC')
+        with pytest.raises(SnapshotReadOnlyError):
+            Compound(eP.requester, id=PACKAGE_ID + '/compound/c1').delete()
+        with pytest.raises(SnapshotError):
+            eP.get_users()
+        with pytest.raises(SnapshotReadOnlyError):
+            eP.login('user', 'secret')
+
+    def test_no_connection(self, eP):
+        assert isinstance(eP.requester, BaseRequester)
+        assert not hasattr(eP.requester, 'session')
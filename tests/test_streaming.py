@@ -0,0 +1,58 @@
+# Copyright 2020 enviPath UG & Co. KG
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import json
+
+import pytest
+
+from enviPath_python.streaming import iter_array_items, iter_json_array_items
+
+EXPORT = {
+    'id': 'http://localhost:8080/package/p',
+    'name': 'rules',
+    'description': 'tricky "quoted" {braces} [brackets] \\ backslash é',
+    'compounds': [
+        {'id': 'c1', 'name': 'a "b" \\', 'structures': [{'id': 's1', 'smiles': 'C[C@@H](O)[N+](=O)[O-]'}]},
+        {'id': 'c2', 'name': '}]', 'structures': []},
+    ],
+    'settings': {'rules': [{'id': 'not-a-top-level-item'}]},
+    'rules': [{'id': 'r1', 'smirks': '[#6:1]>>[#6:1]'}],
+    'reactions': [],
+    'pathways': [{'id': 'pw1', 'nodes': [{'id': 'n1'}], 'links': []}],
+    'aliases': ['x', 'y'],
+}
+
+
+def chunked(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestStreaming:
+
+    @pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64, 1 << 16])
+    @pytest.mark.parametrize('indent', [None, 2])
+    def test_items_match_json_loads(self, chunk_size, indent):
+        data = json.dumps(EXPORT, indent=indent).encode()
+        items = list(iter_json_array_items(chunked(data, chunk_size), ['compounds', 'rules', 'reactions', 'pathways']))
+        expected = [(k, item) for k in ['compounds', 'rules', 'reactions', 'pathways'] for item in EXPORT[k]]
+        assert items == expected
+
+    def test_all_arrays_and_offsets(self):
+        data = json.dumps(EXPORT).encode()
+        items = list(iter_array_items(chunked(data, 5)))
+        assert [k for k, _, _, _ in items] == ['compounds', 'compounds', 'rules', 'pathways']
+        for _, start, end, raw in items:
+            assert data[start:end] == raw
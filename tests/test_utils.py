@@ -0,0 +1,165 @@
+# Copyright 2020 enviPath UG & Co. KG
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import pytest
+from requests import HTTPError
+
+from enviPath_python.enviPath import enviPath
+from enviPath_python.graph import PathwayGraph
+from enviPath_python.objects import Package, Setting
+from enviPath_python.retry import RetryPolicy
+from enviPath_python.utils import MultiGenUtils
+from tests.test_requester import INSTANCE_HOST, PACKAGE_ID, FakeServer
+
+PREDICTION_PACKAGE_ID = INSTANCE_HOST + 'package/predictions'
+
+
+def graph(prefix: str, nodes: list, links: list) -> PathwayGraph:
+    """
+    Builds a graph from (smiles, depth) node tuples and (start smiles, end smiles) links.
+    """
+    return PathwayGraph.from_json(
+        [{'id': '{}n{}'.format(prefix, i), 'depth': depth, 'smiles': smiles} for i, (smiles, depth) in
+         enumerate(nodes)],
+        [{'id': '{}e{}'.format(prefix, i), 'startNodes': ['{}n{}'.format(prefix, [s for s, _ in nodes].index(start))],
+          'endNodes': ['{}n{}'.format(prefix, [s for s, _ in nodes].index(end))]} for i, (start, end) in
+         enumerate(links)],
+    )
+
+
+DATA = graph('d', [('CCO', 0), ('CC=O', 1), ('CC(=O)O', 2), ('C=O', 1)],
+             [('CCO', 'CC=O'), ('CC=O', 'CC(=O)O'), ('CCO', 'C=O')])
+
+
+class TestMultiGenUtils:
+
+    def test_identical(self):
+        pred = graph('p', [('CCO', 0), ('CC=O', 1), ('CC(=O)O', 2), ('C=O', 1)],
+                     [('CCO', 'CC=O'), ('CC=O', 'CC(=O)O'), ('CCO', 'C=O')])
+        res = MultiGenUtils.compare_pathways(pred, DATA)
+        assert res.precision == 1.0
+        assert res.recall == 1.0
+        assert res.fp == 0 and res.fn == 0
+        assert res.correct_nodes == {'dn1', 'dn2', 'dn3'}
+        assert res.correct_edges == {'de0', 'de1', 'de2'}
+        assert not res.incorrect_nodes and not res.incorrect_edges and not res.false_positive_nodes
+
+    def test_depth_weighted(self):
+        # CC(=O)O is predicted with a wrong predecessor, CO is not part of the data
+        pred = graph('p', [('CCO', 0), ('CC=O', 1), ('C=O', 1), ('CC(=O)O', 2), ('CO', 1)],
+                     [('CCO', 'CC=O'), ('CCO', 'C=O'), ('C=O', 'CC(=O)O'), ('CCO', 'CO')])
+        res = MultiGenUtils.compare_pathways(pred, DATA)
+        assert res.tp_data == pytest.approx(0.5 + 0.5)
+        assert res.fn == pytest.approx(0.25)
+        assert res.tp_pred == pytest.approx(0.5 + 0.5)
+        assert res.fp == pytest.approx(0.25 + 0.5)
+        assert res.recall == pytest.approx(1.0 / 1.25)
+        assert res.precision == pytest.approx(1.0 / 1.75)
+        assert res.correct_nodes == {'dn1', 'dn3'}
+        assert res.incorrect_nodes == {'dn2'}
+        assert res.false_positive_nodes == {'pn3', 'pn4'}
+        assert res.correct_edges == {'de0', 'de2'}
+        assert res.incorrect_edges == {'de1'}
+
+    def test_inchi_preferred(self):
+        nodes = [{'id': 'a', 'depth': 0, 'smiles': 'OCC', 'InChI': 'InChI=1S/C2H6O'},
+                 {'id': 'b', 'depth': 1, 'smiles': 'O=CC', 'InChI': 'InChI=1S/C2H4O'}]
+        pred = PathwayGraph.from_json(nodes, [{'id': 'e', 'startNodes': ['a'], 'endNodes': ['b']}])
+        res = MultiGenUtils.compare_pathways(pred, DATA.subgraph([0, 1]))
+        assert res.recall == 0.0
+        res = MultiGenUtils.compare_pathways(pred, DATA.subgraph([0, 1]), key=lambda g, i: g.smiles[i])
+        assert res.recall == 0.0
+        data = PathwayGraph.from_json([dict(n, smiles='x') for n in nodes],
+                                      [{'id': 'e', 'startNodes': ['a'], 'endNodes': ['b']}])
+        assert MultiGenUtils.compare_pathways(pred, data).recall == 1.0
+
+    def test_empty_prediction(self):
+        pred = graph('p', [('CCO', 0)], [])
+        res = MultiGenUtils.compare_pathways(pred, DATA)
+        assert res.precision == 0.0 and res.recall == 0.0
+        assert res.incorrect_nodes == {'dn1', 'dn2', 'dn3'}
+
+    def test_upstream_and_weights(self):
+        upstream = MultiGenUtils.assemble_upstream(DATA)
+        assert upstream['CC(=O)O'] == {'CC=O'}
+        assert upstream['CCO'] == set()
+        with pytest.deprecated_call():
+            assert MultiGenUtils.assemble_upsream(DATA) == upstream
+        assert list(MultiGenUtils.assemble_eval_weights(DATA)) == [1.0, 0.5, 0.25, 0.5]
+
+    def test_averages(self):
+        pred = graph('p', [('CCO', 0), ('CC=O', 1), ('C=O', 1), ('CC(=O)O', 2), ('CO', 1)],
+                     [('CCO', 'CC=O'), ('CCO', 'C=O'), ('C=O', 'CC(=O)O'), ('CCO', 'CO')])
+        results = [
+            [MultiGenUtils.compare_pathways(DATA, DATA)] * 2,
+            [MultiGenUtils.compare_pathways(pred, DATA)] * 2,
+        ]
+        micro = MultiGenUtils.micro_average(results, [1, 2])
+        macro = MultiGenUtils.macro_average(results, [1, 2])
+        assert micro.precision[0] == pytest.approx(2.25 / (2.25 + 0.75))
+        assert micro.recall[0] == pytest.approx(2.25 / 2.5)
+        assert macro.precision[0] == pytest.approx((1 + 1 / 1.75) / 2)
+        assert macro.recall[1] == pytest.approx((1 + 1 / 1.25) / 2)
+        assert MultiGenUtils.micro_average([], [1]).precision == [0.0]
+        assert MultiGenUtils.macro_average([], [1]).recall == [0.0]
+
+    @pytest.mark.parametrize('processes', [0, 2])
+    def test_evaluate_package(self, processes):
+        nodes = [{'id': 'n{}'.format(i), 'depth': d, 'smiles': s} for i, (s, d) in
+                 enumerate([('CCO', 0), ('CC=O', 1), ('CC(=O)O', 2)])]
+        links = [{'id': 'e0', 'startNodes': ['n0'], 'endNodes': ['n1']},
+                 {'id': 'e1', 'startNodes': ['n1'], 'endNodes': ['n2']}]
+        reference = PACKAGE_ID + '/pathway/1'
+        no_root = PACKAGE_ID + '/pathway/2'
+        unavailable = PACKAGE_ID + '/pathway/3'
+        prediction = PREDICTION_PACKAGE_ID + '/pathway/1'
+        polls = []
+
+        def predicted(method, url, params, headers):
+            polls.append(url)
+            if len(polls) == 1:
+                return 200, {'id': url, 'completed': 'false', 'nodes': [], 'links': []}, {}
+            # Only the first generation is predicted correctly
+            return 200, {'id': url, 'completed': 'true', 'nodes': nodes[:2], 'links': links[:1]}, {}
+
+        server = FakeServer({
+            PACKAGE_ID + '/pathway': (200, {'pathway': [{'id': reference, 'name': 'p1'},
+                                                        {'id': no_root, 'name': 'p2'},
+                                                        {'id': unavailable, 'name': 'p3'}]}),
+            reference: (200, {'id': reference, 'nodes': nodes, 'links': links}),
+            no_root: (200, {'id': no_root, 'nodes': [], 'links': []}),
+            PREDICTION_PACKAGE_ID + '/pathway': lambda method, url, params, headers: (
+                201, {}, {'Location': prediction}),
+            prediction: predicted,
+        })
+        eP = enviPath(INSTANCE_HOST, retry=RetryPolicy(total=0))
+        eP.requester.session.request = server
+
+        res = MultiGenUtils.evaluate_package(Package(eP.requester, id=PACKAGE_ID),
+                                             Setting(eP.requester, id=INSTANCE_HOST + 'setting/s'),
+                                             Package(eP.requester, id=PREDICTION_PACKAGE_ID),
+                                             max_workers=2, processes=processes, poll_interval=0)
+
+        assert set(res.failed) == {no_root, unavailable}
+        assert isinstance(res.failed[no_root], ValueError)
+        assert isinstance(res.failed[unavailable], HTTPError)
+        assert len(polls) == 2
+        assert res.micro.thresholds == [1, 2]
+        assert res.micro.precision == [1.0, 1.0]
+        assert res.micro.recall == [1.0, pytest.approx(0.5 / 0.75)]
+        assert res.macro == res.micro
+        assert res.results[reference][1].incorrect_nodes == {'n2'}
+        assert set(res.predictions[reference].node_ids) == {'n0', 'n1'}